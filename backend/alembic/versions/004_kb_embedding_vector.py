@@ -0,0 +1,59 @@
+"""Native pgvector column for KB document embeddings
+
+Revision ID: 004_kb_embedding_vector
+Revises: 003_add_indexes
+Create Date: 2024-01-04 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_kb_embedding_vector'
+down_revision = '003_add_indexes'
+branch_labels = None
+depends_on = None
+
+EMBEDDING_DIMENSIONS = 1536
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    # Adding a nullable column without default is a catalog-only change (no table rewrite)
+    op.execute(f"ALTER TABLE kb_documents ADD COLUMN IF NOT EXISTS embedding_vector vector({EMBEDDING_DIMENSIONS})")
+
+    # The HNSW index from 003 targets the float8[] column and can never serve `<=>` queries
+    op.execute("DROP INDEX IF EXISTS idx_kb_documents_embedding")
+
+    # Online backfill: copy existing arrays in small batches, each committed on its own,
+    # so row locks are short-lived and the API keeps serving during the migration
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        while True:
+            result = bind.execute(sa.text(f"""
+                UPDATE kb_documents
+                SET embedding_vector = embedding::vector({EMBEDDING_DIMENSIONS})
+                WHERE id IN (
+                    SELECT id FROM kb_documents
+                    WHERE embedding_vector IS NULL
+                    AND embedding IS NOT NULL
+                    AND array_length(embedding, 1) = {EMBEDDING_DIMENSIONS}
+                    LIMIT {BACKFILL_BATCH_SIZE}
+                    FOR UPDATE SKIP LOCKED
+                )
+            """))
+            if result.rowcount == 0:
+                break
+
+        # Build the ANN index without blocking writes
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_kb_documents_embedding_vector
+            ON kb_documents
+            USING hnsw (embedding_vector vector_cosine_ops)
+            WITH (m = 16, ef_construction = 64)
+        """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_kb_documents_embedding_vector")
+    op.execute("ALTER TABLE kb_documents DROP COLUMN IF EXISTS embedding_vector")
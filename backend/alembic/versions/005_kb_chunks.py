@@ -0,0 +1,58 @@
+"""Chunked knowledge base: kb_chunks table
+
+Revision ID: 005_kb_chunks
+Revises: 004_kb_embedding_vector
+Create Date: 2024-01-05 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '005_kb_chunks'
+down_revision = '004_kb_embedding_vector'
+branch_labels = None
+depends_on = None
+
+EMBEDDING_DIMENSIONS = 1536
+
+
+def upgrade() -> None:
+    op.create_table(
+        'kb_chunks',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('document_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('kb_documents.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('chunk_index', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('token_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+    op.execute(f"ALTER TABLE kb_chunks ADD COLUMN embedding vector({EMBEDDING_DIMENSIONS})")
+    op.execute("""
+        ALTER TABLE kb_chunks
+        ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
+    """)
+    
+    op.create_index('idx_kb_chunks_document_chunk', 'kb_chunks', ['document_id', 'chunk_index'], unique=True)
+    op.execute("""
+        CREATE INDEX idx_kb_chunks_embedding
+        ON kb_chunks
+        USING hnsw (embedding vector_cosine_ops)
+        WITH (m = 16, ef_construction = 64)
+    """)
+    op.execute("CREATE INDEX idx_kb_chunks_search_vector ON kb_chunks USING GIN (search_vector)")
+    
+    # Seed one chunk per already-embedded document so search keeps working
+    # until the document is re-indexed into proper passages
+    op.execute("""
+        INSERT INTO kb_chunks (id, document_id, chunk_index, content, token_count, embedding)
+        SELECT gen_random_uuid(), id, 0, content, 0, embedding_vector
+        FROM kb_documents
+        WHERE embedding_vector IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('kb_chunks')
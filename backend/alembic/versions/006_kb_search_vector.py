@@ -0,0 +1,70 @@
+"""Language-aware stored tsvector column for chunk keyword search
+
+Revision ID: 006_kb_search_vector
+Revises: 005_kb_chunks
+Create Date: 2024-01-06 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006_kb_search_vector'
+down_revision = '005_kb_chunks'
+branch_labels = None
+depends_on = None
+
+# Backfill approximation of app.services.language.detect_language: only its Turkish-letter
+# signal (the Python detector also counts stopwords); documents ingested later use the full detector
+DETECT_CONFIG_SQL = "CASE WHEN content ~ '[çğıöşüÇĞİÖŞÜ]' THEN 'turkish' ELSE 'english' END::regconfig"
+
+
+def upgrade() -> None:
+    # Documents: language + text search configuration detected at ingest
+    op.add_column('kb_documents', sa.Column('language', sa.String(10), nullable=True))
+    op.execute("ALTER TABLE kb_documents ADD COLUMN search_config regconfig NOT NULL DEFAULT 'simple'")
+    op.execute(f"""
+        UPDATE kb_documents
+        SET search_config = {DETECT_CONFIG_SQL},
+            language = CASE WHEN content ~ '[çğıöşüÇĞİÖŞÜ]' THEN 'tr' ELSE 'en' END
+    """)
+    
+    # English expression index from 003 only matched one exact query expression
+    op.execute("DROP INDEX IF EXISTS idx_kb_documents_content_fts")
+    
+    # Chunks: inherit the document's configuration, rebuild the generated column
+    op.execute("ALTER TABLE kb_chunks ADD COLUMN search_config regconfig NOT NULL DEFAULT 'simple'")
+    op.execute("""
+        UPDATE kb_chunks c
+        SET search_config = d.search_config
+        FROM kb_documents d
+        WHERE d.id = c.document_id
+    """)
+    op.execute("DROP INDEX IF EXISTS idx_kb_chunks_search_vector")
+    op.execute("ALTER TABLE kb_chunks DROP COLUMN search_vector")
+    op.execute("""
+        ALTER TABLE kb_chunks
+        ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector(search_config, content)) STORED
+    """)
+    op.execute("CREATE INDEX idx_kb_chunks_search_vector ON kb_chunks USING GIN (search_vector)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_kb_chunks_search_vector")
+    op.execute("ALTER TABLE kb_chunks DROP COLUMN search_vector")
+    op.execute("ALTER TABLE kb_chunks DROP COLUMN search_config")
+    op.execute("""
+        ALTER TABLE kb_chunks
+        ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
+    """)
+    op.execute("CREATE INDEX idx_kb_chunks_search_vector ON kb_chunks USING GIN (search_vector)")
+    
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_kb_documents_content_fts
+        ON kb_documents
+        USING GIN (to_tsvector('english', COALESCE(content, '')))
+    """)
+    op.execute("ALTER TABLE kb_documents DROP COLUMN search_config")
+    op.drop_column('kb_documents', 'language')
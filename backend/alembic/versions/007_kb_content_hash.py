@@ -0,0 +1,68 @@
+"""Content-hash deduplication: hashes, embedding store, (source, name) upsert key
+
+Revision ID: 007_kb_content_hash
+Revises: 006_kb_search_vector
+Create Date: 2024-01-07 00:00:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007_kb_content_hash'
+down_revision = '006_kb_search_vector'
+branch_labels = None
+depends_on = None
+
+EMBEDDING_DIMENSIONS = 1536
+
+# Model existing chunks were embedded with (kb_chunks.embedding_model only arrives in 008)
+CURRENT_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-3-small")
+
+# Mirrors app.services.chunking.content_hash (sha256 of whitespace-normalized text)
+HASH_SQL = "encode(sha256(convert_to(regexp_replace(btrim({column}), '\\s+', ' ', 'g'), 'UTF8')), 'hex')"
+
+
+def upgrade() -> None:
+    op.add_column('kb_documents', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.add_column('kb_chunks', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.execute(f"UPDATE kb_documents SET content_hash = {HASH_SQL.format(column='content')}")
+    op.execute(f"UPDATE kb_chunks SET content_hash = {HASH_SQL.format(column='content')}")
+    
+    # Embedding store keyed by (content hash, model)
+    op.create_table(
+        'kb_embeddings',
+        sa.Column('content_hash', sa.String(64), primary_key=True),
+        sa.Column('model', sa.String(100), primary_key=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+    op.execute(f"ALTER TABLE kb_embeddings ADD COLUMN embedding vector({EMBEDDING_DIMENSIONS}) NOT NULL")
+    # Seed the store from existing chunk vectors so re-indexing them is a cache hit
+    op.execute(
+        sa.text("""
+            INSERT INTO kb_embeddings (content_hash, model, embedding)
+            SELECT DISTINCT ON (content_hash) content_hash, :model, embedding
+            FROM kb_chunks
+            WHERE content_hash IS NOT NULL AND embedding IS NOT NULL
+            ON CONFLICT DO NOTHING
+        """).bindparams(model=CURRENT_MODEL)
+    )
+    
+    # Upsert key: keep only the most recently updated row per (source, name)
+    op.execute("""
+        DELETE FROM kb_documents d
+        USING kb_documents newer
+        WHERE d.source = newer.source
+        AND d.name = newer.name
+        AND (d.updated_at, d.id) < (newer.updated_at, newer.id)
+    """)
+    op.create_index('uq_kb_documents_source_name', 'kb_documents', ['source', 'name'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_kb_documents_source_name', table_name='kb_documents')
+    op.drop_table('kb_embeddings')
+    op.drop_column('kb_chunks', 'content_hash')
+    op.drop_column('kb_documents', 'content_hash')
@@ -0,0 +1,64 @@
+"""Versioned embeddings: kb_chunks.embedding_model and kb_embedding_versions
+
+Revision ID: 008_kb_embedding_versions
+Revises: 007_kb_content_hash
+Create Date: 2024-01-08 00:00:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008_kb_embedding_versions'
+down_revision = '007_kb_content_hash'
+branch_labels = None
+depends_on = None
+
+# Model existing chunks were embedded with
+CURRENT_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-3-small")
+
+
+def upgrade() -> None:
+    op.create_table(
+        'kb_embedding_versions',
+        sa.Column('model', sa.String(100), primary_key=True),
+        sa.Column('status', sa.String(20), nullable=False, server_default='building'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('activated_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    # At most one active version
+    op.create_index(
+        'uq_kb_embedding_versions_active', 'kb_embedding_versions', ['status'],
+        unique=True, postgresql_where=sa.text("status = 'active'")
+    )
+    op.execute(
+        sa.text("INSERT INTO kb_embedding_versions (model, status, activated_at) VALUES (:model, 'active', now())")
+        .bindparams(model=CURRENT_MODEL)
+    )
+
+    op.add_column('kb_chunks', sa.Column('embedding_model', sa.String(100), nullable=True))
+    op.execute(
+        sa.text("UPDATE kb_chunks SET embedding_model = :model").bindparams(model=CURRENT_MODEL)
+    )
+    op.alter_column('kb_chunks', 'embedding_model', nullable=False)
+
+    # A document has one set of chunks per embedding version
+    op.drop_index('idx_kb_chunks_document_chunk', table_name='kb_chunks')
+    op.create_index(
+        'idx_kb_chunks_document_chunk', 'kb_chunks', ['document_id', 'embedding_model', 'chunk_index'], unique=True
+    )
+
+
+def downgrade() -> None:
+    # Keep only the active version's chunks
+    op.execute("""
+        DELETE FROM kb_chunks
+        WHERE embedding_model <> (SELECT model FROM kb_embedding_versions WHERE status = 'active')
+    """)
+    op.drop_index('idx_kb_chunks_document_chunk', table_name='kb_chunks')
+    op.create_index('idx_kb_chunks_document_chunk', 'kb_chunks', ['document_id', 'chunk_index'], unique=True)
+    op.drop_column('kb_chunks', 'embedding_model')
+    op.drop_index('uq_kb_embedding_versions_active', table_name='kb_embedding_versions')
+    op.drop_table('kb_embedding_versions')
@@ -0,0 +1,25 @@
+"""Per-tenant LLM cost budgets: llm_usage.tenant
+
+Revision ID: 009_llm_usage_tenant
+Revises: 008_kb_embedding_versions
+Create Date: 2024-01-09 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009_llm_usage_tenant'
+down_revision = '008_kb_embedding_versions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('llm_usage', sa.Column('tenant', sa.String(100), nullable=True))
+    op.create_index('idx_llm_usage_tenant_created', 'llm_usage', ['tenant', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_llm_usage_tenant_created', table_name='llm_usage')
+    op.drop_column('llm_usage', 'tenant')
@@ -0,0 +1,48 @@
+"""Semantic answer cache: llm_semantic_cache
+
+Revision ID: 010_llm_semantic_cache
+Revises: 009_llm_usage_tenant
+Create Date: 2024-01-10 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '010_llm_semantic_cache'
+down_revision = '009_llm_usage_tenant'
+branch_labels = None
+depends_on = None
+
+EMBEDDING_DIMENSIONS = 1536
+
+
+def upgrade() -> None:
+    op.create_table(
+        'llm_semantic_cache',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('tenant', sa.String(100), nullable=False),
+        sa.Column('query', sa.Text(), nullable=False),
+        sa.Column('embedding_model', sa.String(100), nullable=False),
+        sa.Column('kb_version', sa.String(32), nullable=False),
+        sa.Column('answer', sa.Text(), nullable=False),
+        sa.Column('sources', sa.JSON(), nullable=True),
+        sa.Column('hit_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_hit_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.execute(f"ALTER TABLE llm_semantic_cache ADD COLUMN embedding vector({EMBEDDING_DIMENSIONS}) NOT NULL")
+    op.execute("""
+        CREATE INDEX idx_llm_semantic_cache_embedding
+        ON llm_semantic_cache
+        USING hnsw (embedding vector_cosine_ops)
+        WITH (m = 16, ef_construction = 64)
+    """)
+    op.create_index('idx_llm_semantic_cache_tenant', 'llm_semantic_cache', ['tenant', 'last_hit_at'])
+    op.create_index('idx_llm_semantic_cache_expires_at', 'llm_semantic_cache', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_table('llm_semantic_cache')
@@ -0,0 +1,23 @@
+"""Model routing: llm_usage.route
+
+Revision ID: 011_llm_usage_route
+Revises: 010_llm_semantic_cache
+Create Date: 2024-01-11 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011_llm_usage_route'
+down_revision = '010_llm_semantic_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('llm_usage', sa.Column('route', sa.String(20), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('llm_usage', 'route')
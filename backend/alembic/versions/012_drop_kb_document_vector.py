@@ -0,0 +1,42 @@
+"""Drop the whole-document vector: search runs on kb_chunks
+
+Revision ID: 012_drop_kb_document_vector
+Revises: 011_llm_usage_route
+Create Date: 2024-01-12 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '012_drop_kb_document_vector'
+down_revision = '011_llm_usage_route'
+branch_labels = None
+depends_on = None
+
+EMBEDDING_DIMENSIONS = 1536
+
+
+def upgrade() -> None:
+    # kb_chunks were seeded from embedding_vector in 005; nothing reads it since.
+    # Dropping the HNSW index first avoids index maintenance while the column goes.
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_kb_documents_embedding_vector")
+    op.execute("ALTER TABLE kb_documents DROP COLUMN IF EXISTS embedding_vector")
+
+
+def downgrade() -> None:
+    # Restored from the legacy float8[] column only (as in 004)
+    op.execute(f"ALTER TABLE kb_documents ADD COLUMN IF NOT EXISTS embedding_vector vector({EMBEDDING_DIMENSIONS})")
+    op.execute(sa.text(f"""
+        UPDATE kb_documents
+        SET embedding_vector = embedding::vector({EMBEDDING_DIMENSIONS})
+        WHERE embedding IS NOT NULL AND array_length(embedding, 1) = {EMBEDDING_DIMENSIONS}
+    """))
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_kb_documents_embedding_vector
+            ON kb_documents
+            USING hnsw (embedding_vector vector_cosine_ops)
+            WITH (m = 16, ef_construction = 64)
+        """)
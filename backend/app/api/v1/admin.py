@@ -94,7 +94,7 @@ async def get_dashboard_stats(
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
-        logger.error("Error getting dashboard stats", error=str(e), exc_info=True)
+        logger.error(f"Error getting dashboard stats: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to get dashboard stats")
 
 
@@ -155,7 +155,7 @@ async def list_chats(
         
         return chat_list
     except Exception as e:
-        logger.error("Error listing chats", error=str(e), exc_info=True)
+        logger.error(f"Error listing chats: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to list chats")
 
 
@@ -201,7 +201,7 @@ async def get_chat_messages(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error("Error getting chat messages", chat_id=str(chat_id), error=str(e), exc_info=True)
+        logger.error(f"Error getting chat messages (chat_id={chat_id}): {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to get chat messages")
 
 
@@ -271,10 +271,10 @@ async def get_rag_metrics(
                     day_hit_rate = float(day_result.scalar() or 0.0) * 100
                     daily_hit_rates.append(day_hit_rate)
                 except Exception as e:
-                    logger.warning(f"Error calculating daily hit rate for day {i}", error=str(e))
+                    logger.warning(f"Error calculating daily hit rate for day {i}: {e}")
                     daily_hit_rates.append(0.0)
         except Exception as e:
-            logger.error("Error calculating daily hit rates", error=str(e))
+            logger.error(f"Error calculating daily hit rates: {e}")
             # Fill with zeros if calculation fails
             daily_hit_rates = [0.0] * days
         
@@ -301,7 +301,7 @@ async def get_rag_metrics(
             "total_queries": len(metrics)
         }
     except Exception as e:
-        logger.error("Error getting RAG metrics", error=str(e), exc_info=True)
+        logger.error(f"Error getting RAG metrics: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to get RAG metrics")
 
 
@@ -379,6 +379,6 @@ async def get_llm_metrics(
             }
         }
     except Exception as e:
-        logger.error("Error getting LLM metrics", error=str(e), exc_info=True)
+        logger.error(f"Error getting LLM metrics: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to get LLM metrics")
 
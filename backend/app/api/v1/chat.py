@@ -1,18 +1,23 @@
 """Chat API Routes"""
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from typing import AsyncGenerator, List, Optional
 from uuid import UUID
 import html
+import json
 import re
+import time
 
-from app.core.database import get_db
+from app.core.database import get_db, AsyncSessionLocal
 from app.core.security import get_current_user
 from app.core.logging import get_logger
 from app.models.chat import Chat, ChatStatus
 from app.models.message import Message, MessageRole
 from app.services.orchestrator import OrchestratorService
+from app.services.streaming import coalesce_deltas
+from app.monitoring.prometheus import chat_time_to_first_token
 from app.config import settings
 
 router = APIRouter()
@@ -67,10 +72,10 @@ async def create_chat(chat: ChatCreate, db: AsyncSession = Depends(get_db)):
         db.add(new_chat)
         await db.commit()
         await db.refresh(new_chat)
-        logger.info("Chat created", chat_id=str(new_chat.id), tenant=chat.tenant)
+        logger.info(f"Chat created (chat_id={new_chat.id}, tenant={chat.tenant})")
         return {"id": str(new_chat.id), "status": new_chat.status.value}
     except Exception as e:
-        logger.error("Error creating chat", error=str(e), exc_info=True)
+        logger.error(f"Error creating chat: {e}", exc_info=True)
         await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -117,13 +122,81 @@ async def get_messages(chat_id: UUID, limit: int = 50, db: AsyncSession = Depend
     ]
 
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_reply(chat_id: UUID, text: str, room_key: str, received_at: float) -> AsyncGenerator[str, None]:
+    """
+    Stream the assistant reply as Server-Sent Events and persist it once complete
+        event: start  {sources, context}
+        event: delta  {text}
+        event: done   {message: {id, role, text, sources}}
+        event: error  {detail}
+    """
+    # Own session: the request-scoped one is not guaranteed to outlive the handler
+    async with AsyncSessionLocal() as db:
+        source = "unknown"
+        first_delta = True
+        response = None
+        frames = coalesce_deltas(
+            orchestrator.stream_message(text=text, room_key=room_key, db=db, chat_id=str(chat_id)),
+            settings.SSE_STREAM_FLUSH_MS
+        )
+        try:
+            async for event in frames:
+                if event["type"] == "start":
+                    source = event["data"]["context"].get("source", "unknown")
+                    yield sse_event("start", event["data"])
+                elif event["type"] == "delta":
+                    if first_delta:
+                        first_delta = False
+                        chat_time_to_first_token.labels(channel="sse", source=source).observe(time.perf_counter() - received_at)
+                    yield sse_event("delta", {"text": event["data"]})
+                elif event["type"] == "done":
+                    # The orchestrator keeps using the session after `done` (semantic
+                    # cache, context turn): persist only once the stream is drained
+                    response = event["data"]
+            
+            if response is not None:
+                assistant_message = Message(
+                    chat_id=chat_id,
+                    role=MessageRole.ASSISTANT,
+                    text=response.get("text", ""),
+                    context=response.get("context", {})
+                )
+                db.add(assistant_message)
+                await db.commit()
+                logger.info(f"Assistant message created (message_id={assistant_message.id}, chat_id={chat_id})")
+                yield sse_event("done", {
+                    "message": {
+                        "id": str(assistant_message.id),
+                        "role": assistant_message.role.value,
+                        "text": assistant_message.text,
+                        "sources": response.get("sources", [])
+                    }
+                })
+        except Exception as e:
+            logger.error(f"Error streaming message (chat_id={chat_id}): {e}", exc_info=True)
+            await db.rollback()
+            yield sse_event("error", {"detail": "Failed to process message"})
+        finally:
+            await frames.aclose()
+
+
 @router.post("/chats/{chat_id}/messages")
 async def create_message(
     chat_id: UUID,
     message: MessageCreate,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
-    """Create a new message"""
+    """
+    Create a new message
+    With `Accept: text/event-stream` the reply is streamed as Server-Sent Events
+    """
+    received_at = time.perf_counter()
     try:
         # Verify chat exists
         from sqlalchemy import select
@@ -141,13 +214,24 @@ async def create_message(
         )
         db.add(user_message)
         await db.commit()
-        logger.info("User message created", message_id=str(user_message.id), chat_id=str(chat_id))
+        logger.info(f"User message created (message_id={user_message.id}, chat_id={chat_id})")
+        
+        if "text/event-stream" in request.headers.get("accept", ""):
+            return StreamingResponse(
+                stream_reply(chat_id, message.text, chat.tenant, received_at),
+                media_type="text/event-stream",
+                headers={
+                    "Cache-Control": "no-cache",
+                    "X-Accel-Buffering": "no"  # Disable proxy (nginx) buffering
+                }
+            )
         
         # Process through orchestrator
         response = await orchestrator.process_message(
             text=message.text,
             room_key=chat.tenant,
-            db=db
+            db=db,
+            chat_id=str(chat_id)
         )
         
         # Create assistant message
@@ -159,7 +243,7 @@ async def create_message(
         )
         db.add(assistant_message)
         await db.commit()
-        logger.info("Assistant message created", message_id=str(assistant_message.id), chat_id=str(chat_id))
+        logger.info(f"Assistant message created (message_id={assistant_message.id}, chat_id={chat_id})")
         
         return {
             "message": {
@@ -172,7 +256,7 @@ async def create_message(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error("Error creating message", error=str(e), chat_id=str(chat_id), exc_info=True)
+        logger.error(f"Error creating message (chat_id={chat_id}): {e}", exc_info=True)
         await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -86,7 +86,7 @@ async def upload_file(
         if not result:
             raise HTTPException(status_code=500, detail="Failed to process file")
         
-        logger.info("File uploaded successfully", file_name=file_name, size=file_size, chat_id=chat_id)
+        logger.info(f"File uploaded successfully (file_name={file_name}, size={file_size}, chat_id={chat_id})")
         
         return {
             "success": True,
@@ -105,7 +105,7 @@ async def upload_file(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error("Error uploading file", error=str(e), exc_info=True)
+        logger.error(f"Error uploading file: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to upload file")
 
 
@@ -152,7 +152,7 @@ async def upload_voice(
             content_type=file.content_type or "audio/mpeg"
         )
         
-        logger.info("Voice transcribed successfully", language=transcription.get("language"))
+        logger.info(f"Voice transcribed successfully (language={transcription.get('language')})")
         
         return {
             "success": True,
@@ -167,7 +167,7 @@ async def upload_voice(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error("Error processing voice", error=str(e), exc_info=True)
+        logger.error(f"Error processing voice: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to process voice")
 
 
@@ -204,7 +204,7 @@ async def upload_image(
         if not result:
             raise HTTPException(status_code=500, detail="Failed to process image")
         
-        logger.info("Image uploaded successfully", file_name=file_name, dimensions=(result.get("width"), result.get("height")))
+        logger.info(f"Image uploaded successfully (file_name={file_name}, dimensions={result.get('width')}x{result.get('height')})")
         
         return {
             "success": True,
@@ -222,7 +222,7 @@ async def upload_image(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error("Error uploading image", error=str(e), exc_info=True)
+        logger.error(f"Error uploading image: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to upload image")
 
 
@@ -244,14 +244,14 @@ async def delete_file(
         if not success:
             raise HTTPException(status_code=404, detail="File not found")
         
-        logger.info("File deleted successfully", file_key=file_key)
+        logger.info(f"File deleted successfully (file_key={file_key})")
         
         return {"success": True, "message": "File deleted successfully"}
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error("Error deleting file", file_key=file_key, error=str(e), exc_info=True)
+        logger.error(f"Error deleting file (file_key={file_key}): {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to delete file")
 
 
@@ -274,6 +274,6 @@ async def get_file_url(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error("Error getting file URL", file_key=file_key, error=str(e), exc_info=True)
+        logger.error(f"Error getting file URL (file_key={file_key}): {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to get file URL")
 
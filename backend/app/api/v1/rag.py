@@ -1,14 +1,19 @@
 """RAG API Routes"""
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, status as http_status
 from sqlalchemy.ext.asyncio import AsyncSession
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Optional
 from uuid import UUID
+from sqlalchemy import and_, case, func, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.core.database import get_db
 from app.core.security import get_current_user, require_role
 from app.core.logging import get_logger
 from app.services.rag_service import rag_service
+from app.services.language import detect_language, get_text_search_config
+from app.services.chunking import content_hash
+from app.services.bulk_ingest import BulkIngest, JOB_ID_HEADER, iter_ndjson, get_ingest_job, valid_job_id
 from app.models.kb_document import KBDocument, DocumentStatus
 
 router = APIRouter()
@@ -34,37 +39,141 @@ async def create_document(
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
     try:
-        new_doc = KBDocument(
+        # Upsert on (source, name): re-importing unchanged content keeps the
+        # existing embeddings; changed content goes back to PENDING
+        language = detect_language(document.content)
+        table = KBDocument.__table__
+        stmt = pg_insert(table).values(
             name=document.name,
             source=document.source,
             content=document.content,
+            content_hash=content_hash(document.content),
+            size=len(document.content),
+            language=language,
+            search_config=get_text_search_config(language),
             status=DocumentStatus.PENDING,
             metadata=document.metadata
         )
-        db.add(new_doc)
+        unchanged = and_(
+            table.c.content_hash == stmt.excluded.content_hash,
+            table.c.status == DocumentStatus.INDEXED
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.source, table.c.name],
+            set_={
+                "content": stmt.excluded.content,
+                "content_hash": stmt.excluded.content_hash,
+                "size": stmt.excluded.size,
+                "language": stmt.excluded.language,
+                "search_config": stmt.excluded.search_config,
+                "metadata": stmt.excluded.metadata,
+                "status": case((unchanged, table.c.status), else_=stmt.excluded.status),
+                "updated_at": func.now()
+            }
+        ).returning(table.c.id, table.c.name, table.c.status, literal_column("xmax = 0").label("inserted"))
+        
+        result = await db.execute(stmt)
+        doc = result.one()
         await db.commit()
-        await db.refresh(new_doc)
+        doc_id = str(doc.id)
         
-        # Trigger indexing job in background
-        try:
-            from app.workers.indexer import enqueue_document
-            enqueue_document(str(new_doc.id))
-            logger.info("Document enqueued for indexing", doc_id=str(new_doc.id))
-        except Exception as e:
-            logger.error("Error enqueueing document", doc_id=str(new_doc.id), error=str(e), exc_info=True)
-            # Don't fail the request if enqueueing fails
+        # Trigger indexing job in background (unchanged documents are not re-embedded)
+        if doc.status == DocumentStatus.PENDING:
+            try:
+                from app.workers.indexer import enqueue_document
+                enqueue_document(doc_id)
+                logger.info(f"Document enqueued for indexing (doc_id={doc_id})")
+            except Exception as e:
+                logger.error(f"Error enqueueing document (doc_id={doc_id}): {e}", exc_info=True)
+                # Don't fail the request if enqueueing fails
+        else:
+            logger.info(f"Document content unchanged, skipping re-indexing (doc_id={doc_id})")
         
         return {
-            "id": str(new_doc.id),
-            "name": new_doc.name,
-            "status": new_doc.status.value
+            "id": doc_id,
+            "name": doc.name,
+            "status": doc.status.value,
+            "created": bool(doc.inserted),
+            "unchanged": doc.status != DocumentStatus.PENDING
         }
     except Exception as e:
-        logger.error("Error creating document", error=str(e), exc_info=True)
+        logger.error(f"Error creating document: {e}", exc_info=True)
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to create document")
 
 
+@router.post("/documents/bulk", status_code=http_status.HTTP_202_ACCEPTED)
+async def bulk_create_documents(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Bulk import knowledge base documents from an NDJSON / JSONL body
+    
+    One {name, source, content, metadata} object per line. The body is
+    streamed and validated line by line, inserted with COPY in chunks and
+    indexed by batched background jobs. Poll GET /documents/bulk/{job_id}
+    for progress; to poll while the body is still uploading, choose the job
+    id yourself and send it in the X-Ingest-Job-Id header (8-64 letters,
+    digits, "-" or "_").
+    """
+    # Check role
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    job_id = request.headers.get(JOB_ID_HEADER)
+    if job_id is not None and not valid_job_id(job_id):
+        raise HTTPException(status_code=400, detail=f"Invalid {JOB_ID_HEADER} header")
+    
+    from app.workers.indexer import enqueue_documents
+    
+    ingest = BulkIngest(db, enqueue_documents, job_id=job_id)
+    if not await ingest.start():
+        raise HTTPException(status_code=409, detail=f"Bulk import job {job_id} already exists")
+    try:
+        async for line_no, record, error in iter_ndjson(request.stream()):
+            if error:
+                ingest.reject(line_no, error)
+                continue
+            try:
+                document = DocumentCreate(**record)
+            except ValidationError as e:
+                ingest.reject(line_no, "; ".join(
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+                ))
+                continue
+            await ingest.add(document.model_dump())
+        
+        return await ingest.finish()
+    except Exception as e:
+        logger.error(f"Error in bulk document import (job_id={ingest.job_id}): {e}", exc_info=True)
+        await db.rollback()
+        await ingest.finish(status="failed")
+        raise HTTPException(status_code=500, detail=f"Bulk import failed (job {ingest.job_id})")
+
+
+@router.get("/documents/bulk/{job_id}")
+async def get_bulk_import(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get bulk import progress counters"""
+    # Check role
+    if current_user.get("role") not in ["admin", "supervisor"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    try:
+        job = await get_ingest_job(job_id)
+    except Exception as e:
+        logger.error(f"Error getting bulk import job (job_id={job_id}): {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to get bulk import job")
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail="Bulk import job not found")
+    return job
+
+
 @router.get("/documents")
 async def list_documents(
     status: Optional[str] = None,
@@ -104,7 +213,7 @@ async def list_documents(
             for doc in documents
         ]
     except Exception as e:
-        logger.error("Error listing documents", error=str(e), exc_info=True)
+        logger.error(f"Error listing documents: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to list documents")
 
 
@@ -124,6 +233,6 @@ async def search_rag(
             "count": len(documents) if documents else 0
         }
     except Exception as e:
-        logger.error("Error searching RAG", query=query[:100], error=str(e), exc_info=True)
+        logger.error(f"Error searching RAG (query={query[:100]}): {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to search RAG system")
 
@@ -39,7 +39,7 @@ async def telegram_webhook(request: Request, db: AsyncSession = Depends(get_db))
         return {"status": "ok"}
     except Exception as e:
         # Log error but return 200 to Telegram (to avoid retries)
-        logger.error("Telegram webhook error", error=str(e), exc_info=True)
+        logger.error(f"Telegram webhook error: {e}", exc_info=True)
         return {"status": "error", "message": str(e)}
 
 
@@ -43,8 +43,77 @@ class Settings(BaseSettings):
     OPENAI_BASE_URL: Optional[str] = os.getenv("OPENAI_BASE_URL", None)
     MODEL: str = os.getenv("MODEL", "gpt-4-turbo")
     LLM_DAILY_COST_LIMIT: float = float(os.getenv("LLM_DAILY_COST_LIMIT", "50.0"))
+    LLM_TENANT_DAILY_COST_LIMIT: float = float(os.getenv("LLM_TENANT_DAILY_COST_LIMIT", "0"))  # 0 = no per-tenant limit
+    # Soft limit: past this share of a daily limit, calls are downgraded to LLM_COST_SOFT_LIMIT_MODEL
+    # instead of refused (empty model disables the soft limit)
+    LLM_COST_SOFT_LIMIT_RATIO: float = float(os.getenv("LLM_COST_SOFT_LIMIT_RATIO", "0.8"))
+    LLM_COST_SOFT_LIMIT_MODEL: str = os.getenv("LLM_COST_SOFT_LIMIT_MODEL", "gpt-3.5-turbo")
+    LLM_COST_RECONCILE_INTERVAL: int = int(os.getenv("LLM_COST_RECONCILE_INTERVAL", "300"))
     LLM_MAX_TOKENS_PER_REQUEST: int = int(os.getenv("LLM_MAX_TOKENS_PER_REQUEST", "512"))
+    # Hedged requests: if a streamed call has no output after LLM_HEDGE_DEADLINE_MS, a second
+    # request is sent (to LLM_HEDGE_BASE_URL / LLM_HEDGE_MODEL if set) and the first to stream wins.
+    # The hedge endpoint is also the fallback when the primary fails before streaming.
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "False").lower() == "true"
+    LLM_HEDGE_DEADLINE_MS: float = float(os.getenv("LLM_HEDGE_DEADLINE_MS", "2000"))
+    LLM_HEDGE_BASE_URL: Optional[str] = os.getenv("LLM_HEDGE_BASE_URL", None)
+    LLM_HEDGE_API_KEY: str = os.getenv("LLM_HEDGE_API_KEY", "")
+    LLM_HEDGE_MODEL: str = os.getenv("LLM_HEDGE_MODEL", "")  # Empty = same model as the primary
+    # Circuit breakers (LLM per model/endpoint, embeddings, Whisper), shared by workers through Redis:
+    # open when at least CIRCUIT_BREAKER_MIN_REQUESTS calls in the last CIRCUIT_BREAKER_WINDOW_SECONDS
+    # failed at CIRCUIT_BREAKER_FAILURE_RATE or more; after CIRCUIT_BREAKER_RECOVERY_TIMEOUT seconds
+    # up to CIRCUIT_BREAKER_HALF_OPEN_PROBES probe calls are let through at a time
+    CIRCUIT_BREAKER_WINDOW_SECONDS: int = int(os.getenv("CIRCUIT_BREAKER_WINDOW_SECONDS", "60"))
+    CIRCUIT_BREAKER_MIN_REQUESTS: int = int(os.getenv("CIRCUIT_BREAKER_MIN_REQUESTS", "10"))
+    CIRCUIT_BREAKER_FAILURE_RATE: float = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", "0.5"))
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT: int = int(os.getenv("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", "60"))
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES: int = int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_PROBES", "2"))
+    # Telemetry (llm_usage / rag_metrics rows): write-behind queue size, and a COPY batch is
+    # written every TELEMETRY_FLUSH_INTERVAL_MS or once TELEMETRY_FLUSH_ROWS rows are queued
+    TELEMETRY_QUEUE_SIZE: int = int(os.getenv("TELEMETRY_QUEUE_SIZE", "10000"))
+    TELEMETRY_FLUSH_INTERVAL_MS: float = float(os.getenv("TELEMETRY_FLUSH_INTERVAL_MS", "500"))
+    TELEMETRY_FLUSH_ROWS: int = int(os.getenv("TELEMETRY_FLUSH_ROWS", "500"))
+    # Model routing: simple turns go to LLM_ROUTE_FAST_MODEL, hard ones to MODEL
+    LLM_ROUTING_ENABLED: bool = os.getenv("LLM_ROUTING_ENABLED", "True").lower() == "true"
+    LLM_ROUTE_FAST_MODEL: str = os.getenv("LLM_ROUTE_FAST_MODEL", "gpt-3.5-turbo")
+    LLM_ROUTE_RAG_SCORE: float = float(os.getenv("LLM_ROUTE_RAG_SCORE", "0.8"))  # Confident RAG hit
+    LLM_ROUTE_RULE_CONFIDENCE: float = float(os.getenv("LLM_ROUTE_RULE_CONFIDENCE", "0.8"))  # Near rule match
+    LLM_ROUTE_SHORT_QUERY_TOKENS: int = int(os.getenv("LLM_ROUTE_SHORT_QUERY_TOKENS", "12"))
+    LLM_ROUTE_LONG_QUERY_TOKENS: int = int(os.getenv("LLM_ROUTE_LONG_QUERY_TOKENS", "150"))
+    # Tenants that always get the premium model (comma-separated)
+    _premium_tenants_str = os.getenv("LLM_PREMIUM_TENANTS", "")
+    LLM_PREMIUM_TENANTS: List[str] = [t.strip() for t in _premium_tenants_str.split(",") if t.strip()]
+    # Price per 1M tokens by model, JSON {"model": {"prompt": .., "completion": ..}} merged over the defaults
+    _model_pricing_str = os.getenv("LLM_MODEL_PRICING", "{}")
+    try:
+        LLM_MODEL_PRICING: Dict[str, Dict[str, float]] = json.loads(_model_pricing_str)
+    except Exception:
+        LLM_MODEL_PRICING: Dict[str, Dict[str, float]] = {}
+    # Prompts above this many tokens are rejected before the API call; user messages
+    # above LLM_MAX_INPUT_TOKENS are truncated
+    LLM_MAX_PROMPT_TOKENS: int = int(os.getenv("LLM_MAX_PROMPT_TOKENS", "8000"))
+    LLM_MAX_INPUT_TOKENS: int = int(os.getenv("LLM_MAX_INPUT_TOKENS", "1000"))
     LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", "86400"))
+    # LLM response cache: in-process LRU entries in front of Redis, and the
+    # delta size (characters) cached answers are replayed in on streamed calls
+    LLM_CACHE_LOCAL_SIZE: int = int(os.getenv("LLM_CACHE_LOCAL_SIZE", "256"))
+    LLM_CACHE_REPLAY_CHUNK_CHARS: int = int(os.getenv("LLM_CACHE_REPLAY_CHUNK_CHARS", "32"))
+    # Coalesce identical concurrent LLM calls (one upstream call per cache key, across workers)
+    LLM_SINGLEFLIGHT_ENABLED: bool = os.getenv("LLM_SINGLEFLIGHT_ENABLED", "True").lower() == "true"
+    LLM_SINGLEFLIGHT_LOCK_TTL: int = int(os.getenv("LLM_SINGLEFLIGHT_LOCK_TTL", "120"))
+    # Seconds a follower waits for the leading worker's next event before calling upstream itself
+    LLM_SINGLEFLIGHT_IDLE_TIMEOUT: float = float(os.getenv("LLM_SINGLEFLIGHT_IDLE_TIMEOUT", "15"))
+    # How often a leading worker checks whether other workers follow its flight (seconds)
+    LLM_SINGLEFLIGHT_POLL_INTERVAL: float = float(os.getenv("LLM_SINGLEFLIGHT_POLL_INTERVAL", "0.1"))
+    # Semantic answer cache for RAG answers: minimum cosine similarity to reuse an answer,
+    # entry TTL (seconds), max entries per tenant and eviction interval (seconds)
+    LLM_SEMANTIC_CACHE_ENABLED: bool = os.getenv("LLM_SEMANTIC_CACHE_ENABLED", "True").lower() == "true"
+    LLM_SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    LLM_SEMANTIC_CACHE_TTL: int = int(os.getenv("LLM_SEMANTIC_CACHE_TTL", "86400"))
+    LLM_SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+    LLM_SEMANTIC_CACHE_EVICT_INTERVAL: int = int(os.getenv("LLM_SEMANTIC_CACHE_EVICT_INTERVAL", "600"))
+    # HNSW candidates per lookup; iterative scans (pgvector >= 0.8) keep searching until a row passes the filters
+    LLM_SEMANTIC_CACHE_EF_SEARCH: int = int(os.getenv("LLM_SEMANTIC_CACHE_EF_SEARCH", "100"))
+    LLM_SEMANTIC_CACHE_ITERATIVE_SCAN: bool = os.getenv("LLM_SEMANTIC_CACHE_ITERATIVE_SCAN", "True").lower() == "true"
     
     # RAG
     RAG_MIN_SIMILARITY: float = float(os.getenv("RAG_MIN_SIMILARITY", "0.7"))
@@ -56,7 +125,50 @@ class Settings(BaseSettings):
         RAG_HYBRID_WEIGHTS: Dict[str, float] = json.loads(_rag_weights_str)
     except Exception:
         RAG_HYBRID_WEIGHTS: Dict[str, float] = {"semantic": 0.7, "keyword": 0.3}
+    # Retrieval mode: "fused" (one SQL round-trip, reciprocal-rank fusion) or
+    # "sequential" (separate semantic/keyword queries, weighted score fusion in Python)
+    RAG_RETRIEVAL_MODE: str = os.getenv("RAG_RETRIEVAL_MODE", "fused")
+    RAG_RRF_K: int = int(os.getenv("RAG_RRF_K", "60"))
+    RAG_FUSION_CANDIDATES: int = int(os.getenv("RAG_FUSION_CANDIDATES", "30"))
+    RAG_SNIPPET_CHARS: int = int(os.getenv("RAG_SNIPPET_CHARS", "2000"))
+    # Token budget for retrieved documents in the LLM prompt
+    RAG_CONTEXT_MAX_TOKENS: int = int(os.getenv("RAG_CONTEXT_MAX_TOKENS", "1500"))
     RAG_EMBEDDING_MODEL: str = os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-3-small")
+    RAG_EMBEDDING_DIMENSIONS: int = int(os.getenv("RAG_EMBEDDING_DIMENSIONS", "1536"))
+    # Seconds a process may keep serving a cached active embedding version after a flip
+    RAG_EMBEDDING_VERSION_REFRESH: float = float(os.getenv("RAG_EMBEDDING_VERSION_REFRESH", "30"))
+    # Query embedding cache: in-process LRU entries + Redis TTL (seconds)
+    RAG_EMBEDDING_CACHE_SIZE: int = int(os.getenv("RAG_EMBEDDING_CACHE_SIZE", "1024"))
+    RAG_EMBEDDING_CACHE_TTL: int = int(os.getenv("RAG_EMBEDDING_CACHE_TTL", "604800"))
+    # Micro-batching of concurrent query embeddings (window 0 disables batching)
+    RAG_EMBEDDING_BATCH_WINDOW_MS: float = float(os.getenv("RAG_EMBEDDING_BATCH_WINDOW_MS", "5"))
+    RAG_EMBEDDING_BATCH_MAX_SIZE: int = int(os.getenv("RAG_EMBEDDING_BATCH_MAX_SIZE", "64"))
+    # Chunking: documents are split into overlapping passages before embedding
+    RAG_CHUNK_TOKENS: int = int(os.getenv("RAG_CHUNK_TOKENS", "400"))
+    RAG_CHUNK_OVERLAP_TOKENS: int = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "60"))
+    RAG_MAX_CHUNKS_PER_DOCUMENT: int = int(os.getenv("RAG_MAX_CHUNKS_PER_DOCUMENT", "3"))
+    # Full-text search: language detected at ingest -> PostgreSQL text search configuration
+    RAG_DEFAULT_LANGUAGE: str = os.getenv("RAG_DEFAULT_LANGUAGE", "tr")
+    _rag_ts_configs_str = os.getenv("RAG_TEXT_SEARCH_CONFIGS", '{"tr": "turkish", "en": "english"}')
+    try:
+        RAG_TEXT_SEARCH_CONFIGS: Dict[str, str] = json.loads(_rag_ts_configs_str)
+    except Exception:
+        RAG_TEXT_SEARCH_CONFIGS: Dict[str, str] = {"tr": "turkish", "en": "english"}
+    
+    # Indexer (batch mode: python -m app.workers.indexer --batch)
+    INDEXER_BATCH_SIZE: int = int(os.getenv("INDEXER_BATCH_SIZE", "64"))
+    INDEXER_CONCURRENCY: int = int(os.getenv("INDEXER_CONCURRENCY", "4"))
+    INDEXER_MAX_BATCH_TOKENS: int = int(os.getenv("INDEXER_MAX_BATCH_TOKENS", "100000"))
+    INDEXER_POLL_INTERVAL: float = float(os.getenv("INDEXER_POLL_INTERVAL", "5"))
+    # A document that fails on its own this many times is given up on (indexer: FAILED, re-embed: skipped)
+    INDEXER_MAX_ATTEMPTS: int = int(os.getenv("INDEXER_MAX_ATTEMPTS", "3"))
+    # Seconds before a failed bulk indexing job is retried (needs the RQ scheduler)
+    INDEXER_RETRY_INTERVAL: int = int(os.getenv("INDEXER_RETRY_INTERVAL", "30"))
+    # Bulk ingest: records per COPY/upsert chunk, document ids per indexing job
+    RAG_BULK_INGEST_CHUNK_SIZE: int = int(os.getenv("RAG_BULK_INGEST_CHUNK_SIZE", "1000"))
+    RAG_BULK_INGEST_ENQUEUE_BATCH: int = int(os.getenv("RAG_BULK_INGEST_ENQUEUE_BATCH", "100"))
+    RAG_BULK_INGEST_MAX_LINE_BYTES: int = int(os.getenv("RAG_BULK_INGEST_MAX_LINE_BYTES", "10485760"))
+    RAG_BULK_INGEST_JOB_TTL: int = int(os.getenv("RAG_BULK_INGEST_JOB_TTL", "604800"))
     
     # Security
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", SECRET_KEY)
@@ -84,10 +196,24 @@ class Settings(BaseSettings):
     WS_HEARTBEAT_INTERVAL: int = 30000  # 30 seconds
     WS_SESSION_TIMEOUT: int = 1800  # 30 minutes
     WS_IDLE_WARNING: int = 1500  # 25 minutes
+    # Streamed replies: token deltas are coalesced into at most one frame per interval
+    WS_STREAM_FLUSH_MS: float = float(os.getenv("WS_STREAM_FLUSH_MS", "50"))
+    SSE_STREAM_FLUSH_MS: float = float(os.getenv("SSE_STREAM_FLUSH_MS", "50"))
+    
+    # Rules are matched from an in-memory compiled set, reloaded on a Redis "rules changed" message;
+    # the rules version counter is also checked every RULES_VERSION_CHECK_INTERVAL seconds
+    RULES_VERSION_CHECK_INTERVAL: float = float(os.getenv("RULES_VERSION_CHECK_INTERVAL", "30"))
+    
+    # Orchestrator: start the query embedding (and keyword search in sequential retrieval mode)
+    # alongside rule matching instead of after it
+    ORCHESTRATOR_CONCURRENT_STAGES: bool = os.getenv("ORCHESTRATOR_CONCURRENT_STAGES", "True").lower() == "true"
     
-    # Context
-    CONTEXT_WINDOW_SIZE: int = 10
-    MAX_CONTEXT_TOKENS: int = 2000
+    # Context: conversation history sent to the LLM (messages, tokens); older turns are
+    # folded into a rolling summary generated with CONTEXT_SUMMARY_MODEL
+    CONTEXT_WINDOW_SIZE: int = int(os.getenv("CONTEXT_WINDOW_SIZE", "10"))
+    MAX_CONTEXT_TOKENS: int = int(os.getenv("MAX_CONTEXT_TOKENS", "2000"))
+    CONTEXT_SUMMARY_MODEL: str = os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-3.5-turbo")
+    CONTEXT_CACHE_TTL: int = int(os.getenv("CONTEXT_CACHE_TTL", "86400"))
     
     # Media Storage
     S3_ENDPOINT_URL: Optional[str] = os.getenv("S3_ENDPOINT_URL", None)
@@ -103,6 +229,8 @@ class Settings(BaseSettings):
     # Monitoring
     OTEL_EXPORTER_OTLP_ENDPOINT: Optional[str] = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", None)
     ENABLE_METRICS: bool = os.getenv("ENABLE_METRICS", "True").lower() == "true"
+    # Distinct tenant label values on Prometheus metrics before further tenants are reported as "other"
+    METRICS_MAX_TENANT_LABELS: int = int(os.getenv("METRICS_MAX_TENANT_LABELS", "50"))
     
     class Config:
         env_file = ".env"
@@ -52,7 +52,7 @@ async def get_db() -> AsyncSession:
 async def init_db():
     """Initialize database (create tables, extensions)"""
     # Import all models to ensure they are registered with SQLAlchemy
-    from app.models import User, Chat, Message, RAGMetrics, LLMUsage, Rule, KBDocument
+    from app.models import User, Chat, Message, RAGMetrics, LLMUsage, Rule, KBDocument, KBChunk, KBEmbedding, KBEmbeddingVersion, SemanticCacheEntry
     
     try:
         async with engine.begin() as conn:
@@ -63,7 +63,7 @@ async def init_db():
         
         logger.info("Database initialized successfully")
     except Exception as e:
-        logger.error("Database initialization failed", error=str(e), exc_info=True)
+        logger.error(f"Database initialization failed: {e}", exc_info=True)
         raise
 
 
@@ -0,0 +1,80 @@
+"""
+Token Counting Utilities
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional
+import re
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Lossless approximation of BPE pieces (~4 characters per token) used when
+# tiktoken or its encoding files are not available
+_APPROX_TOKEN_PATTERN = re.compile(r"\s*\w{1,4}|\s*[^\w\s]|\s+")
+
+
+class ApproximateEncoding:
+    """Fallback encoding with the same encode/decode interface as tiktoken"""
+
+    name = "approximate"
+
+    def encode(self, text: str) -> List[str]:
+        return _APPROX_TOKEN_PATTERN.findall(text)
+
+    def decode(self, tokens: List[str]) -> str:
+        return "".join(tokens)
+
+
+@lru_cache(maxsize=16)
+def get_encoding(model: Optional[str] = None):
+    """Get (cached) encoding for a model, falling back to an approximation"""
+    if tiktoken is not None:
+        try:
+            if model:
+                try:
+                    return tiktoken.encoding_for_model(model)
+                except KeyError:
+                    pass
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+        except Exception as e:
+            # tiktoken downloads encoding files on first use; offline hosts end up here
+            logger.warning(f"tiktoken encoding unavailable, using approximate token counts: {e}")
+    return ApproximateEncoding()
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens in text"""
+    if not text:
+        return 0
+    return len(get_encoding(model).encode(text))
+
+
+def split_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> List[str]:
+    """Hard-split text into consecutive pieces of at most max_tokens tokens"""
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text)
+    return [
+        encoding.decode(tokens[i:i + max_tokens])
+        for i in range(0, len(tokens), max_tokens)
+    ]
+
+
+# Chat format overhead: every message carries ~3 tokens of role/separator
+# framing and every reply is primed with 3 more
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: Optional[str] = None) -> int:
+    """Count prompt tokens of chat messages, including the chat format overhead"""
+    return sum(
+        TOKENS_PER_MESSAGE + count_tokens(message.get("content") or "", model)
+        for message in messages
+    ) + TOKENS_PER_REPLY
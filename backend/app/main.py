@@ -4,8 +4,8 @@ Production-ready AI Chatbot Backend
 """
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 import os
 import json
@@ -15,9 +15,15 @@ from app.core.security import get_current_user
 from app.core.logging import setup_logging
 from app.api.v1 import router as api_router
 from app.websocket.manager import WebSocketManager
-from app.core.database import init_db, close_db
+from app.core.database import init_db, close_db, AsyncSessionLocal
+from app.services.cost_budget import cost_budget
+from app.services.semantic_cache import semantic_cache
+from app.services.telemetry import telemetry_writer
+from app.services.rule_service import rule_engine
+from app.services.rag_service import rag_service
 from app.monitoring.prometheus import router as prometheus_router
 from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.gzip import GZipMiddleware
 
 # OpenTelemetry setup
 if settings.ENABLE_METRICS and settings.OTEL_EXPORTER_OTLP_ENDPOINT:
@@ -29,10 +35,10 @@ if settings.ENABLE_METRICS and settings.OTEL_EXPORTER_OTLP_ENDPOINT:
             service_name="chatbot-backend",
             otlp_endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT
         )
-        logger.info("OpenTelemetry tracing enabled", endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT)
+        logger.info(f"OpenTelemetry tracing enabled (endpoint={settings.OTEL_EXPORTER_OTLP_ENDPOINT})")
     except Exception as e:
         logger = get_logger(__name__)
-        logger.warning("OpenTelemetry setup failed", error=str(e))
+        logger.warning(f"OpenTelemetry setup failed: {e}")
 
 
 @asynccontextmanager
@@ -40,8 +46,20 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     await init_db()
+    # Keep Redis LLM cost counters in line with llm_usage
+    reconciler = asyncio.create_task(cost_budget.run_reconciler(AsyncSessionLocal))
+    evictor = asyncio.create_task(semantic_cache.run_evictor(AsyncSessionLocal))
+    # Write-behind writer for llm_usage / rag_metrics rows
+    telemetry_writer.start(AsyncSessionLocal)
+    # Compiled rule set, reloaded when rules change
+    rules_listener = asyncio.create_task(rule_engine.run_listener())
     yield
     # Shutdown
+    reconciler.cancel()
+    evictor.cancel()
+    rules_listener.cancel()
+    await telemetry_writer.stop()
+    await rag_service.embedding_batcher.close()
     await close_db()
 
 
@@ -109,7 +127,7 @@ if settings.ENABLE_METRICS and settings.OTEL_EXPORTER_OTLP_ENDPOINT:
         logger.info("OpenTelemetry instrumentation enabled")
     except Exception as e:
         logger = get_logger(__name__)
-        logger.warning("OpenTelemetry instrumentation failed", error=str(e))
+        logger.warning(f"OpenTelemetry instrumentation failed: {e}")
 
 
 @app.get("/health")
@@ -133,7 +151,7 @@ async def health_check():
     except Exception as e:
         health_status["services"]["database"] = f"error: {str(e)[:50]}"
         health_status["status"] = "degraded"
-        logger.warning("Database health check failed", error=str(e))
+        logger.warning(f"Database health check failed: {e}")
     
     # Check Redis connection
     try:
@@ -143,7 +161,7 @@ async def health_check():
     except Exception as e:
         health_status["services"]["redis"] = f"error: {str(e)[:50]}"
         health_status["status"] = "degraded"
-        logger.warning("Redis health check failed", error=str(e))
+        logger.warning(f"Redis health check failed: {e}")
     
     # Vector DB uses same database, so it's included in database check
     health_status["services"]["vector_db"] = health_status["services"].get("database", "unknown")
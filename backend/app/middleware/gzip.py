@@ -0,0 +1,19 @@
+"""
+GZip Middleware that leaves event streams alone
+"""
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware as StarletteGZipMiddleware
+from starlette.types import Receive, Scope, Send
+
+
+class GZipMiddleware(StarletteGZipMiddleware):
+    """
+    GZip compression, except for Server-Sent Event requests: the compressor
+    holds small writes back until its buffer fills, which would delay tokens
+    """
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "text/event-stream" in Headers(scope=scope).get("accept", ""):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
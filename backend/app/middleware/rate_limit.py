@@ -1,12 +1,13 @@
 """
 Rate Limiting Middleware
 """
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from fastapi import Request, status
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import redis.asyncio as redis
 import time
-from typing import Callable, Optional
+from typing import Optional
 
 from app.config import settings
 from app.core.logging import get_logger
@@ -25,18 +26,30 @@ async def get_redis_rate_limit():
     return _redis_rate_limit
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Rate limiting middleware"""
+class RateLimitMiddleware:
+    """
+    Rate limiting middleware
     
-    def __init__(self, app, calls: int = 100, period: int = 60):
-        super().__init__(app)
+    Pure ASGI (not BaseHTTPMiddleware) so response bodies, including
+    Server-Sent Event streams, pass through untouched as they are sent.
+    """
+    
+    def __init__(self, app: ASGIApp, calls: int = 100, period: int = 60):
+        self.app = app
         self.calls = calls
         self.period = period
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request = Request(scope)
+        
         # Skip rate limiting for health and metrics endpoints
         if request.url.path in ["/health", "/metrics", "/docs", "/openapi.json"]:
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
         
         # Get client identifier (IP address or user ID from token)
         client_id = self.get_client_id(request)
@@ -50,29 +63,38 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             
             if current == 1:
                 await redis_client.expire(key, self.period)
-            
-            if current > self.calls:
-                logger.warning("Rate limit exceeded", client_id=client_id, current=current, limit=self.calls)
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail=f"Rate limit exceeded: {self.calls} requests per {self.period} seconds"
-                )
-        except HTTPException:
-            raise
         except Exception as e:
-            logger.error("Rate limit check error", error=str(e), exc_info=True)
+            logger.error(f"Rate limit check error: {e}", exc_info=True)
             # Continue if Redis fails (graceful degradation)
             current = 0
         
-        # Process request
-        response = await call_next(request)
+        reset = str(int(time.time() / self.period) * self.period + self.period)
+        
+        if current > self.calls:
+            logger.warning(f"Rate limit exceeded (client_id={client_id}, current={current}, limit={self.calls})")
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": f"Rate limit exceeded: {self.calls} requests per {self.period} seconds"},
+                headers={
+                    "X-RateLimit-Limit": str(self.calls),
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset": reset,
+                    "Retry-After": str(self.period)
+                }
+            )
+            await response(scope, receive, send)
+            return
         
-        # Add rate limit headers
-        response.headers["X-RateLimit-Limit"] = str(self.calls)
-        response.headers["X-RateLimit-Remaining"] = str(max(0, self.calls - current))
-        response.headers["X-RateLimit-Reset"] = str(int(time.time() / self.period) * self.period + self.period)
+        async def send_with_headers(message: Message) -> None:
+            # Add rate limit headers
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(self.calls)
+                headers["X-RateLimit-Remaining"] = str(max(0, self.calls - current))
+                headers["X-RateLimit-Reset"] = reset
+            await send(message)
         
-        return response
+        await self.app(scope, receive, send_with_headers)
     
     def get_client_id(self, request: Request) -> str:
         """Get client identifier from request"""
@@ -6,5 +6,9 @@ from app.models.rag_metrics import RAGMetrics
 from app.models.llm_usage import LLMUsage
 from app.models.rule import Rule
 from app.models.kb_document import KBDocument
+from app.models.kb_chunk import KBChunk
+from app.models.kb_embedding import KBEmbedding
+from app.models.kb_embedding_version import KBEmbeddingVersion
+from app.models.semantic_cache import SemanticCacheEntry
 
-__all__ = ["User", "UserRole", "Chat", "ChatStatus", "Message", "MessageRole", "RAGMetrics", "LLMUsage", "Rule", "KBDocument"]
+__all__ = ["User", "UserRole", "Chat", "ChatStatus", "Message", "MessageRole", "RAGMetrics", "LLMUsage", "Rule", "KBDocument", "KBChunk", "KBEmbedding", "KBEmbeddingVersion", "SemanticCacheEntry"]
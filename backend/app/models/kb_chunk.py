@@ -0,0 +1,31 @@
+"""Knowledge Base Chunk Model"""
+from sqlalchemy import Column, String, DateTime, Text, Integer, ForeignKey, Computed, Index
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR, REGCONFIG
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
+import uuid
+
+from app.config import settings
+from app.core.database import Base
+
+
+class KBChunk(Base):
+    """Embedded passage of a KBDocument; the unit semantic/keyword search runs on"""
+    __tablename__ = "kb_chunks"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("kb_documents.id", ondelete="CASCADE"), nullable=False)
+    chunk_index = Column(Integer, nullable=False, default=0)
+    content = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=False, default=0)
+    content_hash = Column(String(64), nullable=True)  # Key into kb_embeddings
+    embedding = Column(Vector(settings.RAG_EMBEDDING_DIMENSIONS), nullable=True)
+    embedding_model = Column(String(100), nullable=False)  # kb_embedding_versions.model the vector belongs to
+    search_config = Column(REGCONFIG, nullable=False, server_default="simple")  # Copied from the document
+    search_vector = Column(TSVECTOR, Computed("to_tsvector(search_config, content)", persisted=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index("idx_kb_chunks_document_chunk", "document_id", "embedding_model", "chunk_index", unique=True),
+        {"schema": "public"}
+    )
@@ -1,6 +1,6 @@
 """Knowledge Base Document Model"""
-from sqlalchemy import Column, String, DateTime, Text, Enum, Integer, JSON
-from sqlalchemy.dialects.postgresql import UUID, Vector
+from sqlalchemy import Column, String, DateTime, Text, Enum, Integer, JSON, Float, Index
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, REGCONFIG
 from sqlalchemy.sql import func
 import uuid
 import enum
@@ -21,17 +21,19 @@ class KBDocument(Base):
     name = Column(String(500), nullable=False)
     source = Column(String(1000), nullable=False)  # URL or file path
     content = Column(Text, nullable=False)
-    embedding = Column(ARRAY(Float), nullable=True)  # OpenAI embedding dimension (1536)
+    content_hash = Column(String(64), nullable=True)  # sha256 of whitespace-normalized content
+    embedding = Column(ARRAY(Float), nullable=True)  # Legacy float8[] copy; vectors live in kb_chunks
     size = Column(Integer, nullable=False, default=0)
+    language = Column(String(10), nullable=True)  # Detected at ingest (tr, en, ...)
+    search_config = Column(REGCONFIG, nullable=False, server_default="simple")  # Text search configuration for language
     status = Column(Enum(DocumentStatus), default=DocumentStatus.PENDING, nullable=False)
-    metadata = Column(JSON, nullable=True)
+    meta_data = Column("metadata", JSON, nullable=True)  # "metadata" is reserved by the Declarative API
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
     __table_args__ = (
-        {"schema": "public"},
-        {"indexes": [
-            {"name": "idx_kb_documents_status", "columns": ["status"]}
-        ]}
+        Index("uq_kb_documents_source_name", "source", "name", unique=True),
+        Index("idx_kb_documents_status", "status"),
+        {"schema": "public"}
     )
 
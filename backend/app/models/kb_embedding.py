@@ -0,0 +1,21 @@
+"""Knowledge Base Embedding Store Model"""
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
+
+from app.config import settings
+from app.core.database import Base
+
+
+class KBEmbedding(Base):
+    """Embeddings keyed by (content hash, model) so unchanged text is never re-embedded"""
+    __tablename__ = "kb_embeddings"
+    
+    content_hash = Column(String(64), primary_key=True)
+    model = Column(String(100), primary_key=True)
+    embedding = Column(Vector(settings.RAG_EMBEDDING_DIMENSIONS), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        {"schema": "public"}
+    )
@@ -0,0 +1,25 @@
+"""Knowledge Base Embedding Version Model"""
+from sqlalchemy import Column, String, DateTime, Index, text
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class KBEmbeddingVersion(Base):
+    """
+    Embedding model versions of the knowledge base
+    
+    Exactly one version is active (serves queries); a building version is being
+    re-embedded in the background; retired versions' chunks are cleaned up.
+    """
+    __tablename__ = "kb_embedding_versions"
+    
+    model = Column(String(100), primary_key=True)
+    status = Column(String(20), nullable=False, server_default="building")  # building, active, retired
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    activated_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("uq_kb_embedding_versions_active", "status", unique=True, postgresql_where=text("status = 'active'")),
+        {"schema": "public"}
+    )
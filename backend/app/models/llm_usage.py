@@ -12,6 +12,8 @@ class LLMUsage(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     model = Column(String(100), nullable=False)
+    route = Column(String(20), nullable=True)  # Model router decision (fast / premium)
+    tenant = Column(String(100), nullable=True)  # Chat tenant / room the call was made for (per-tenant budgets)
     prompt_tokens = Column(Integer, nullable=False, default=0)
     completion_tokens = Column(Integer, nullable=False, default=0)
     total_tokens = Column(Integer, nullable=False, default=0)
@@ -1,5 +1,5 @@
 """Message Model"""
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Enum, JSON
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Enum, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -31,9 +31,7 @@ class Message(Base):
     chat = relationship("Chat", back_populates="messages", lazy="selectin")
     
     __table_args__ = (
-        {"schema": "public"},
-        {"indexes": [
-            {"name": "idx_messages_chat_created", "columns": ["chat_id", "created_at"], "postgresql_ops": {"created_at": "DESC"}}
-        ]}
+        Index("idx_messages_chat_created", "chat_id", "created_at"),
+        {"schema": "public"}
     )
 
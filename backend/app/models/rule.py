@@ -1,5 +1,5 @@
 """Rule Model"""
-from sqlalchemy import Column, String, DateTime, Text, Integer, JSON
+from sqlalchemy import Column, String, DateTime, Text, Integer, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -15,14 +15,12 @@ class Rule(Base):
     action = Column(String(50), nullable=False)  # reply|route|rag|macro
     value = Column(Text, nullable=False)  # action value (JSON or string)
     order = Column(Integer, nullable=False, default=0)
-    metadata = Column(JSON, nullable=True)
+    meta_data = Column("metadata", JSON, nullable=True)  # "metadata" is reserved by the Declarative API
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
     __table_args__ = (
-        {"schema": "public"},
-        {"indexes": [
-            {"name": "idx_rules_order", "columns": ["order"]}
-        ]}
+        Index("idx_rules_order", "order"),
+        {"schema": "public"}
     )
 
@@ -0,0 +1,44 @@
+"""Semantic Answer Cache Model"""
+from sqlalchemy import Column, String, DateTime, Text, Integer, JSON, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
+import uuid
+
+from app.config import settings
+from app.core.database import Base
+
+
+class SemanticCacheEntry(Base):
+    """
+    RAG answers keyed by query embedding
+
+    A new query whose embedding is close enough to an entry of the same tenant,
+    embedding model and knowledge base version gets the stored answer.
+    """
+    __tablename__ = "llm_semantic_cache"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant = Column(String(100), nullable=False)
+    query = Column(Text, nullable=False)  # PII-redacted query text
+    embedding = Column(Vector(settings.RAG_EMBEDDING_DIMENSIONS), nullable=False)
+    embedding_model = Column(String(100), nullable=False)
+    kb_version = Column(String(32), nullable=False)  # Knowledge base version the answer was generated from
+    answer = Column(Text, nullable=False)
+    sources = Column(JSON, nullable=True)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_hit_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index(
+            "idx_llm_semantic_cache_embedding", "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"}
+        ),
+        Index("idx_llm_semantic_cache_tenant", "tenant", "last_hit_at"),
+        Index("idx_llm_semantic_cache_expires_at", "expires_at"),
+        {"schema": "public"}
+    )
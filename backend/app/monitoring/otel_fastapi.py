@@ -52,9 +52,9 @@ def setup_tracing(service_name: str = "chatbot-backend", otlp_endpoint: str = No
         RedisInstrumentor().instrument()
         SQLAlchemyInstrumentor().instrument()
         OpenAIInstrumentor().instrument()
-        logger.info("OpenTelemetry instrumentation enabled", endpoint=otlp_endpoint)
+        logger.info(f"OpenTelemetry instrumentation enabled (endpoint={otlp_endpoint})")
     except Exception as e:
-        logger.warning("OpenTelemetry instrumentation error", error=str(e), exc_info=True)
+        logger.warning(f"OpenTelemetry instrumentation error: {e}", exc_info=True)
     
     return tracer_provider
 
@@ -1,10 +1,13 @@
 """
 Prometheus Metrics Endpoint
 """
+from typing import Dict, Optional, Set
 from fastapi import APIRouter
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 from fastapi.responses import Response
 
+from app.config import settings
+
 router = APIRouter()
 
 # Metrics
@@ -59,10 +62,219 @@ database_connections = Gauge(
     'Number of active database connections'
 )
 
+embedding_cache_lookups_total = Counter(
+    'embedding_cache_lookups_total',
+    'Query embedding cache lookups',
+    ['result']  # local_hit, redis_hit, miss
+)
+
+llm_cache_lookups_total = Counter(
+    'llm_cache_lookups_total',
+    'LLM response cache lookups',
+    ['result']  # local_hit, redis_hit, miss
+)
+
+llm_cache_hit_ratio = Gauge(
+    'llm_cache_hit_ratio',
+    'LLM response cache hit ratio in this process (0-1)'
+)
+
+llm_cache_bytes_saved_total = Counter(
+    'llm_cache_bytes_saved_total',
+    'Bytes saved by the LLM response cache',
+    ['kind']  # served: response bytes not generated by the API, compression: Redis payload reduction
+)
+
+llm_coalesced_requests_total = Counter(
+    'llm_coalesced_requests_total',
+    'LLM requests served by another identical in-flight request',
+    ['scope']  # local: same process, remote: led by another worker
+)
+
+semantic_cache_lookups_total = Counter(
+    'semantic_cache_lookups_total',
+    'Semantic answer cache lookups',
+    ['result']  # hit, miss
+)
+
+context_prompt_tokens_total = Counter(
+    'context_prompt_tokens_total',
+    'Conversation history prompt tokens',
+    ['kind']  # assembled: window + summary actually sent, naive: full history
+)
+
+llm_route_total = Counter(
+    'llm_route_total',
+    'LLM model routing decisions',
+    ['route', 'reason']
+)
+
+llm_hedge_requests_total = Counter(
+    'llm_hedge_requests_total',
+    'Hedged LLM requests',
+    ['result']  # fired: primary slow, fallback: primary failed, won: hedge streamed first
+)
+
+llm_hedge_wasted_cost_usd = Counter(
+    'llm_hedge_wasted_cost_usd_total',
+    'Estimated prompt cost of cancelled hedge race losers in USD'
+)
+
+circuit_breaker_state = Gauge(
+    'circuit_breaker_state',
+    'Circuit breaker state as last seen by this worker (0 closed, 1 half-open, 2 open)',
+    ['breaker']
+)
+
+circuit_breaker_transitions_total = Counter(
+    'circuit_breaker_transitions_total',
+    'Circuit breaker state transitions',
+    ['breaker', 'from_state', 'to_state']
+)
+
+circuit_breaker_rejections_total = Counter(
+    'circuit_breaker_rejections_total',
+    'Calls rejected because the circuit was open (or half-open probes were taken)',
+    ['breaker']
+)
+
+telemetry_rows_total = Counter(
+    'telemetry_rows_total',
+    'Telemetry rows by outcome (written, dropped on a full queue, failed flush)',
+    ['table', 'result']
+)
+
+telemetry_flush_duration = Histogram(
+    'telemetry_flush_duration_seconds',
+    'Time to COPY one telemetry batch',
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+)
+
+embedding_batch_size = Histogram(
+    'embedding_batch_size',
+    'Number of inputs per batched embeddings API call',
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128]
+)
+
+embedding_queue_wait = Histogram(
+    'embedding_queue_wait_seconds',
+    'Time an embedding request waited for its batch to be dispatched',
+    buckets=[0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1]
+)
+
+
+llm_time_to_first_token = Histogram(
+    'llm_time_to_first_token_seconds',
+    'Time from LLM request to the first streamed content delta',
+    ['model'],
+    buckets=[0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0]
+)
+
+chat_time_to_first_token = Histogram(
+    'chat_time_to_first_token_seconds',
+    'Time from receiving a user message to sending the first reply text to the client',
+    ['channel', 'source'],
+    buckets=[0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0]
+)
+
+# Sub-millisecond to multi-second: rule matching, cache lookups, SQL, embedding calls
+STAGE_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+orchestrator_stage_duration = Histogram(
+    'orchestrator_stage_duration_seconds',
+    'Duration of one orchestrator stage (first_token / total: since the message was received)',
+    ['stage', 'path'],  # path: rule, semantic_cache, rag, llm_fallback, error
+    buckets=STAGE_BUCKETS
+)
+
+orchestrator_requests_total = Counter(
+    'orchestrator_requests_total',
+    'Messages answered by the orchestrator',
+    ['path', 'tenant']
+)
+
+orchestrator_request_duration = Histogram(
+    'orchestrator_request_duration_seconds',
+    'Time from receiving a message to its complete reply',
+    ['path', 'tenant'],
+    buckets=STAGE_BUCKETS
+)
+
+llm_request_duration = Histogram(
+    'llm_request_duration_seconds',
+    'Time from LLM request to the complete response',
+    ['model'],
+    buckets=[0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0]
+)
+
+rule_matches_total = Counter(
+    'rule_matches_total',
+    'Rule engine lookups',
+    ['result']  # matched, no_match
+)
+
+rule_engine_reloads_total = Counter(
+    'rule_engine_reloads_total',
+    'Compiled rule set reloads',
+    ['trigger']  # startup, pubsub, version
+)
+
+rule_engine_rules = Gauge(
+    'rule_engine_rules',
+    'Rules in the compiled in-memory rule set'
+)
+
+# Tenants get their own label value up to METRICS_MAX_TENANT_LABELS, the rest share "other"
+_tenant_labels: Set[str] = set()
+
+# Labelled children by (metric, label values); every label set used here is bounded
+_children: Dict[tuple, object] = {}
+
+
+def labelled(metric, *values: str):
+    """metric.labels(*values), memoized: labels() validates and locks on every call"""
+    key = (metric, values)
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(*values)
+    return child
+
+
+def tenant_label(tenant: Optional[str]) -> str:
+    """Bounded-cardinality tenant label value"""
+    if not tenant:
+        return "none"
+    if tenant in _tenant_labels:
+        return tenant
+    if len(_tenant_labels) < settings.METRICS_MAX_TENANT_LABELS:
+        _tenant_labels.add(tenant)
+        return tenant
+    return "other"
+
+
+def observe_stage_timings(timings: Dict[str, float], path: str, tenant: Optional[str]):
+    """Record an orchestrator reply: per-stage durations (milliseconds) and the request totals"""
+    for stage, ms in timings.items():
+        labelled(orchestrator_stage_duration, stage, path).observe(ms / 1000)
+    tenant = tenant_label(tenant)
+    labelled(orchestrator_requests_total, path, tenant).inc()
+    if "total" in timings:
+        labelled(orchestrator_request_duration, path, tenant).observe(timings["total"] / 1000)
+
+
+def update_pool_metrics():
+    """Checked-out database connections of this process (sampled at scrape time)"""
+    try:
+        from app.core.database import engine
+        database_connections.set(engine.pool.checkedout())
+    except Exception:
+        pass
+
 
 @router.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint"""
+    update_pool_metrics()
     return Response(
         content=generate_latest(),
         media_type=CONTENT_TYPE_LATEST
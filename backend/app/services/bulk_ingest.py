@@ -0,0 +1,306 @@
+"""
+Bulk Ingest Service - Stream NDJSON documents into the knowledge base with COPY
+"""
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+import json
+import re
+import uuid
+import redis.asyncio as redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.logging import get_logger
+from app.services.chunking import content_hash
+from app.services.language import detect_language, get_text_search_config
+
+logger = get_logger(__name__)
+
+# Redis client for job progress
+_redis_ingest: Optional[redis.Redis] = None
+
+# Counters kept per job in the kb:ingest:{job_id} hash
+COUNTERS = ("received", "inserted", "updated", "unchanged", "invalid", "enqueued", "indexed", "failed")
+
+# Errors kept in the job report (the rest are only counted)
+MAX_REPORTED_ERRORS = 100
+
+# Clients may choose the job id (request header) so they can poll while still uploading
+JOB_ID_HEADER = "X-Ingest-Job-Id"
+JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+STAGING_COLUMNS = [
+    "seq", "id", "name", "source", "content", "content_hash",
+    "size", "language", "search_config", "metadata"
+]
+
+CREATE_STAGING = """
+    CREATE TEMP TABLE IF NOT EXISTS kb_ingest_staging (
+        seq bigint,
+        id uuid,
+        name text,
+        source text,
+        content text,
+        content_hash text,
+        size integer,
+        language text,
+        search_config text,
+        metadata json
+    ) ON COMMIT DELETE ROWS
+"""
+
+# Last record wins for duplicate (source, name) within a chunk; unchanged indexed
+# documents keep their status so they are not re-embedded (same rule as POST /documents)
+UPSERT_FROM_STAGING = """
+    INSERT INTO kb_documents (id, name, source, content, content_hash, size, language, search_config, status, metadata)
+    SELECT DISTINCT ON (source, name)
+        id, name, source, content, content_hash, size, language,
+        CAST(search_config AS regconfig), 'PENDING', metadata
+    FROM kb_ingest_staging
+    ORDER BY source, name, seq DESC
+    ON CONFLICT (source, name) DO UPDATE SET
+        content = EXCLUDED.content,
+        content_hash = EXCLUDED.content_hash,
+        size = EXCLUDED.size,
+        language = EXCLUDED.language,
+        search_config = EXCLUDED.search_config,
+        metadata = EXCLUDED.metadata,
+        status = CASE
+            WHEN kb_documents.content_hash = EXCLUDED.content_hash AND kb_documents.status = 'INDEXED'
+            THEN kb_documents.status
+            ELSE EXCLUDED.status
+        END,
+        updated_at = now()
+    RETURNING id, CAST(status AS text) AS status, (xmax = 0) AS inserted
+"""
+
+
+async def get_redis_ingest():
+    """Get Redis client for bulk ingest progress"""
+    global _redis_ingest
+    if _redis_ingest is None:
+        _redis_ingest = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_ingest
+
+
+def job_key(job_id: str) -> str:
+    return f"kb:ingest:{job_id}"
+
+
+def valid_job_id(job_id: str) -> bool:
+    return bool(JOB_ID_PATTERN.match(job_id))
+
+
+def record_ingest_progress(redis_client, job_id: str, **counters: int):
+    """Increment job counters (sync client, used by indexing workers)"""
+    try:
+        pipe = redis_client.pipeline()
+        for name, value in counters.items():
+            if value:
+                pipe.hincrby(job_key(job_id), name, value)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to record ingest progress for job {job_id}: {e}")
+
+
+async def get_ingest_job(job_id: str) -> Optional[Dict]:
+    """Get job state and counters, or None if unknown / expired"""
+    redis_client = await get_redis_ingest()
+    data = await redis_client.hgetall(job_key(job_id))
+    if not data:
+        return None
+    job = {"job_id": job_id}
+    for name, value in data.items():
+        if name in COUNTERS:
+            job[name] = int(value)
+        elif name == "errors":
+            job[name] = json.loads(value)
+        else:
+            job[name] = value
+    for name in COUNTERS:
+        job.setdefault(name, 0)
+    return job
+
+
+async def iter_ndjson(
+    chunks: AsyncIterator[bytes],
+    max_line_bytes: Optional[int] = None
+) -> AsyncIterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """
+    Parse an NDJSON byte stream incrementally
+    Yields (line number, record, error) for each non-blank line; only the
+    current partial line is buffered.
+    """
+    max_line_bytes = max_line_bytes or settings.RAG_BULK_INGEST_MAX_LINE_BYTES
+    buffer = b""
+    line_no = 0
+    skipping = False  # Inside an oversized line, discard until the next newline
+
+    def parse(line: bytes) -> Tuple[Optional[Dict], Optional[str]]:
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            return None, f"Invalid JSON: {e}"
+        if not isinstance(record, dict):
+            return None, "Record must be a JSON object"
+        return record, None
+
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line, buffer = buffer[:newline], buffer[newline + 1:]
+            if skipping:
+                skipping = False
+                continue
+            line_no += 1
+            if line.strip():
+                yield (line_no, *parse(line))
+        if len(buffer) > max_line_bytes and not skipping:
+            line_no += 1
+            yield line_no, None, f"Line exceeds {max_line_bytes} bytes"
+            skipping = True
+        if skipping:
+            buffer = b""
+
+    if buffer.strip() and not skipping:
+        yield (line_no + 1, *parse(buffer))
+
+
+class BulkIngest:
+    """
+    One bulk ingest job
+
+    Validated records are buffered up to chunk_size, COPYed into a temporary
+    staging table and upserted into kb_documents with one statement per chunk
+    (committed per chunk). Documents that need (re-)indexing are enqueued in
+    batches of enqueue_batch_size ids per indexing job. Counters are mirrored
+    to Redis after every chunk so clients can poll progress.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        enqueue: Callable[[List[str], str], str],
+        job_id: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        enqueue_batch_size: Optional[int] = None
+    ):
+        self.db = db
+        self.enqueue = enqueue
+        self.job_id = job_id or uuid.uuid4().hex
+        self.chunk_size = chunk_size or settings.RAG_BULK_INGEST_CHUNK_SIZE
+        self.enqueue_batch_size = enqueue_batch_size or settings.RAG_BULK_INGEST_ENQUEUE_BATCH
+        self.counters: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self.errors: List[Dict] = []
+        self._records: List[Dict] = []
+        self._pending_ids: List[str] = []
+
+    async def start(self) -> bool:
+        """Register the job as running; False if a job with this id already exists"""
+        try:
+            redis_client = await get_redis_ingest()
+            if not await redis_client.hsetnx(job_key(self.job_id), "status", "running"):
+                return False
+        except Exception as e:
+            logger.warning(f"Failed to register ingest job {self.job_id}: {e}")
+        await self._save(status="running", started_at=datetime.utcnow().isoformat())
+        return True
+
+    def reject(self, line_no: int, error: str):
+        """Count an invalid record"""
+        self.counters["invalid"] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": error[:500]})
+
+    async def add(self, record: Dict):
+        """Buffer a validated record ({name, source, content, metadata})"""
+        self.counters["received"] += 1
+        self._records.append(record)
+        if len(self._records) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self):
+        """COPY buffered records into staging and upsert them into kb_documents"""
+        records, self._records = self._records, []
+        if records:
+            rows = []
+            for seq, record in enumerate(records):
+                language = detect_language(record["content"])
+                rows.append((
+                    seq,
+                    uuid.uuid4(),
+                    record["name"],
+                    record["source"],
+                    record["content"],
+                    content_hash(record["content"]),
+                    len(record["content"]),
+                    language,
+                    get_text_search_config(language),
+                    json.dumps(record["metadata"]) if record.get("metadata") is not None else None
+                ))
+
+            # Each chunk is its own transaction and may run on another pooled connection
+            connection = await self.db.connection()
+            await connection.execute(text(CREATE_STAGING))
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                "kb_ingest_staging", records=rows, columns=STAGING_COLUMNS
+            )
+            result = await connection.execute(text(UPSERT_FROM_STAGING))
+            upserted = result.all()
+            await self.db.commit()
+
+            for row in upserted:
+                if row.inserted:
+                    self.counters["inserted"] += 1
+                elif row.status == "PENDING":
+                    self.counters["updated"] += 1
+                else:
+                    self.counters["unchanged"] += 1
+                if row.status == "PENDING":
+                    self._pending_ids.append(str(row.id))
+
+        while len(self._pending_ids) >= self.enqueue_batch_size:
+            self._enqueue(self.enqueue_batch_size)
+        await self._save()
+
+    async def finish(self, status: str = "completed") -> Dict:
+        """Flush remaining records, enqueue the last partial batch and close the job"""
+        if status == "completed":
+            await self.flush()
+            if self._pending_ids:
+                self._enqueue(len(self._pending_ids))
+        await self._save(status=status, finished_at=datetime.utcnow().isoformat())
+        logger.info(f"Bulk ingest {self.job_id} {status}: {self.counters}")
+        return self.summary(status)
+
+    def summary(self, status: str) -> Dict:
+        return {"job_id": self.job_id, "status": status, **self.counters, "errors": self.errors}
+
+    def _enqueue(self, count: int):
+        doc_ids, self._pending_ids = self._pending_ids[:count], self._pending_ids[count:]
+        try:
+            self.enqueue(doc_ids, self.job_id)
+            self.counters["enqueued"] += len(doc_ids)
+        except Exception as e:
+            # Documents stay PENDING; the batch indexer picks them up
+            logger.error(f"Error enqueueing bulk ingest batch ({len(doc_ids)} documents): {e}")
+
+    async def _save(self, **fields: str):
+        """Mirror counters to Redis (indexed/failed are incremented by the workers)"""
+        try:
+            redis_client = await get_redis_ingest()
+            mapping = {name: value for name, value in self.counters.items() if name not in ("indexed", "failed")}
+            mapping["errors"] = json.dumps(self.errors)
+            mapping.update(fields)
+            key = job_key(self.job_id)
+            pipe = redis_client.pipeline()
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, settings.RAG_BULK_INGEST_JOB_TTL)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to save ingest progress for job {self.job_id}: {e}")
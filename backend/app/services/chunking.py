@@ -0,0 +1,87 @@
+"""
+Chunking Service - Split KB documents into overlapping, token-bounded passages
+"""
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import re
+
+from app.config import settings
+from app.core.tokens import count_tokens, split_tokens
+
+# Paragraph breaks and sentence ends are preferred chunk boundaries
+_SEGMENT_PATTERN = re.compile(r"\n\s*\n|(?<=[.!?…])\s+")
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of content (whitespace-normalized) used for deduplication"""
+    return hashlib.sha256(" ".join((text or "").split()).encode("utf-8")).hexdigest()
+
+
+def _segments(text: str, max_tokens: int, model: Optional[str]) -> List[Tuple[str, int]]:
+    """Split text into sentence-like segments no longer than max_tokens"""
+    segments = []
+    for piece in _SEGMENT_PATTERN.split(text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        tokens = count_tokens(piece, model)
+        if tokens <= max_tokens:
+            segments.append((piece, tokens))
+            continue
+        # A single sentence longer than the budget is hard-split on token boundaries
+        for part in split_tokens(piece, max_tokens, model):
+            part = part.strip()
+            if part:
+                segments.append((part, count_tokens(part, model)))
+    return segments
+
+
+def split_text(
+    text: str,
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+    model: Optional[str] = None
+) -> List[Dict]:
+    """
+    Split text into overlapping chunks of at most max_tokens tokens
+    Returns: [{index, content, token_count, content_hash}, ...]
+    """
+    max_tokens = max_tokens or settings.RAG_CHUNK_TOKENS
+    overlap_tokens = settings.RAG_CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    model = model or settings.RAG_EMBEDDING_MODEL
+
+    chunks: List[Dict] = []
+    current: List[Tuple[str, int]] = []
+    current_tokens = 0
+
+    def flush():
+        content = " ".join(segment for segment, _ in current)
+        chunks.append({
+            "index": len(chunks),
+            "content": content,
+            "token_count": current_tokens,
+            "content_hash": content_hash(content)
+        })
+
+    for segment, tokens in _segments(text or "", max_tokens, model):
+        if current and current_tokens + tokens > max_tokens:
+            flush()
+            # Carry trailing segments over as overlap with the next chunk
+            carried: List[Tuple[str, int]] = []
+            carried_tokens = 0
+            for prev_segment, prev_tokens in reversed(current):
+                if carried_tokens + prev_tokens > overlap_tokens:
+                    break
+                carried.insert(0, (prev_segment, prev_tokens))
+                carried_tokens += prev_tokens
+            current, current_tokens = carried, carried_tokens
+            while current and current_tokens + tokens > max_tokens:
+                current_tokens -= current.pop(0)[1]
+        current.append((segment, tokens))
+        current_tokens += tokens
+
+    if current:
+        flush()
+
+    return chunks
@@ -0,0 +1,273 @@
+"""
+Circuit Breaker - Per-dependency breaker state shared by all workers through Redis
+"""
+from typing import Dict, Optional
+import time
+import uuid
+import openai
+import redis.asyncio as redis
+
+from app.config import settings
+from app.core.logging import get_logger
+from app.monitoring.prometheus import (
+    circuit_breaker_state,
+    circuit_breaker_transitions_total,
+    circuit_breaker_rejections_total,
+)
+
+logger = get_logger(__name__)
+
+# Redis client for breaker state
+_redis_circuit: Optional[redis.Redis] = None
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Outcomes reported after a call; RELEASE returns a probe slot without a verdict (cancelled call)
+SUCCESS = "success"
+FAILURE = "failure"
+RELEASE = "release"
+
+# Errors that say the dependency is unhealthy; anything else (bad request, auth,
+# not found, validation) is the caller's problem and is not held against it
+TRANSIENT_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+# Admit a call. Returns {state, admitted (0 no / 1 yes / 2 as half-open probe), opened_at, previous state}.
+# An OPEN breaker past its recovery timeout moves to HALF_OPEN, which admits at most
+# ARGV[3] probes at a time; probe slots left by a dead worker are freed after the timeout.
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local recovery = tonumber(ARGV[2])
+local state = redis.call('HGET', KEYS[1], 'state') or 'CLOSED'
+local opened_at = tonumber(redis.call('HGET', KEYS[1], 'opened_at') or '0')
+local previous = ''
+if state == 'OPEN' then
+    if now - opened_at < recovery then
+        return {state, 0, tostring(opened_at), previous}
+    end
+    redis.call('HSET', KEYS[1], 'state', 'HALF_OPEN', 'probes', 0, 'probe_successes', 0, 'probe_at', ARGV[1])
+    state = 'HALF_OPEN'
+    previous = 'OPEN'
+end
+if state == 'HALF_OPEN' then
+    if now - tonumber(redis.call('HGET', KEYS[1], 'probe_at') or '0') >= recovery then
+        redis.call('HSET', KEYS[1], 'probes', 0)
+    end
+    if tonumber(redis.call('HGET', KEYS[1], 'probes') or '0') >= tonumber(ARGV[3]) then
+        return {state, 0, tostring(opened_at), previous}
+    end
+    redis.call('HINCRBY', KEYS[1], 'probes', 1)
+    redis.call('HSET', KEYS[1], 'probe_at', ARGV[1])
+    return {state, 2, tostring(opened_at), previous}
+end
+return {state, 1, tostring(opened_at), previous}
+"""
+
+# Record a call outcome. Returns {state, previous state if this call changed it}.
+# CLOSED: outcomes go into sliding-window sorted sets (all calls / failures); the breaker
+# opens when the window has at least ARGV[6] calls and the failure share reaches ARGV[7].
+# HALF_OPEN (probe calls): one failure reopens, ARGV[8] successes close it.
+RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local outcome = ARGV[3]
+local state = redis.call('HGET', KEYS[1], 'state') or 'CLOSED'
+if ARGV[4] == '1' then
+    if state ~= 'HALF_OPEN' then
+        return {state, ''}
+    end
+    redis.call('HINCRBY', KEYS[1], 'probes', -1)
+    if outcome == 'failure' then
+        redis.call('HSET', KEYS[1], 'state', 'OPEN', 'opened_at', ARGV[1])
+        return {'OPEN', state}
+    end
+    if outcome == 'success'
+        and redis.call('HINCRBY', KEYS[1], 'probe_successes', 1) >= tonumber(ARGV[8]) then
+        redis.call('HSET', KEYS[1], 'state', 'CLOSED')
+        redis.call('DEL', KEYS[2], KEYS[3])
+        return {'CLOSED', state}
+    end
+    return {state, ''}
+end
+-- Late results of calls admitted before the breaker tripped do not count
+if state ~= 'CLOSED' or outcome == 'release' then
+    return {state, ''}
+end
+local since = now - tonumber(ARGV[2])
+redis.call('ZADD', KEYS[2], now, ARGV[5])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', since)
+redis.call('EXPIRE', KEYS[2], ARGV[9])
+if outcome == 'failure' then
+    redis.call('ZADD', KEYS[3], now, ARGV[5])
+    redis.call('EXPIRE', KEYS[3], ARGV[9])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', since)
+local total = redis.call('ZCARD', KEYS[2])
+local failures = redis.call('ZCARD', KEYS[3])
+if total >= tonumber(ARGV[6]) and failures / total >= tonumber(ARGV[7]) then
+    redis.call('HSET', KEYS[1], 'state', 'OPEN', 'opened_at', ARGV[1])
+    return {'OPEN', state}
+end
+return {state, ''}
+"""
+
+
+async def get_redis_circuit():
+    """Get Redis client for circuit breaker state"""
+    global _redis_circuit
+    if _redis_circuit is None:
+        _redis_circuit = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_circuit
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+
+class CircuitBreaker:
+    """In-process circuit breaker (fallback while Redis is unreachable)"""
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: int = 60):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.state = CLOSED
+        self.last_failure_time = None
+
+    async def call(self, func, *args, **kwargs):
+        """Execute function with circuit breaker"""
+        if self.state == OPEN:
+            if time.time() - self.last_failure_time > self.recovery_timeout:
+                self.state = HALF_OPEN
+            else:
+                raise CircuitOpenError("Circuit breaker is OPEN")
+
+        try:
+            result = await func(*args, **kwargs)
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.failures = 0
+            return result
+        except TRANSIENT_ERRORS:
+            self.failures += 1
+            self.last_failure_time = time.time()
+            if self.failures >= self.failure_threshold:
+                self.state = OPEN
+            raise
+
+
+class DistributedCircuitBreaker:
+    """
+    Circuit breaker for one dependency (model / endpoint), shared by all workers
+
+    State lives in Redis (circuit:{name} hash plus sliding-window sorted sets of
+    calls and failures), and every transition is made atomically in a Lua
+    script, so one worker discovering an outage opens the circuit for all of
+    them. CLOSED opens on the failure rate over the last window_seconds (with a
+    minimum number of calls); OPEN rejects with CircuitOpenError until
+    recovery_timeout has passed; HALF_OPEN lets at most half_open_probes calls
+    through at a time and closes after that many succeed, or reopens on the
+    first failure. Only TRANSIENT_ERRORS count as failures. Workers remember when an open circuit may recover, so
+    rejections while OPEN do not touch Redis. If Redis is unavailable, calls go
+    through an in-process CircuitBreaker instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: int = None,
+        min_requests: int = None,
+        failure_rate: float = None,
+        recovery_timeout: int = None,
+        half_open_probes: int = None
+    ):
+        self.name = name
+        self.window_seconds = window_seconds or settings.CIRCUIT_BREAKER_WINDOW_SECONDS
+        self.min_requests = min_requests or settings.CIRCUIT_BREAKER_MIN_REQUESTS
+        self.failure_rate = failure_rate or settings.CIRCUIT_BREAKER_FAILURE_RATE
+        self.recovery_timeout = recovery_timeout or settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT
+        self.half_open_probes = half_open_probes or settings.CIRCUIT_BREAKER_HALF_OPEN_PROBES
+        self.key = f"circuit:{{{name}}}"
+        self.local = CircuitBreaker(recovery_timeout=self.recovery_timeout)
+        self._open_until = 0.0
+
+    def _observe(self, state: str, previous: str):
+        circuit_breaker_state.labels(breaker=self.name).set(STATE_VALUES.get(state, 0))
+        if previous and previous != state:
+            circuit_breaker_transitions_total.labels(
+                breaker=self.name, from_state=previous, to_state=state
+            ).inc()
+            logger.warning(f"Circuit breaker {self.name}: {previous} -> {state}")
+
+    def _reject(self):
+        circuit_breaker_rejections_total.labels(breaker=self.name).inc()
+        raise CircuitOpenError(f"Circuit breaker {self.name} is OPEN")
+
+    async def _acquire(self) -> bool:
+        """Admit a call; returns whether it is a half-open probe"""
+        redis_client = await get_redis_circuit()
+        now = time.time()
+        state, admitted, opened_at, previous = await redis_client.eval(
+            ACQUIRE_SCRIPT, 1, self.key, now, self.recovery_timeout, self.half_open_probes
+        )
+        self._observe(state, previous)
+        if int(admitted) == 0:
+            if state == OPEN:
+                self._open_until = float(opened_at) + self.recovery_timeout
+            self._reject()
+        return int(admitted) == 2
+
+    async def _record(self, outcome: str, probe: bool):
+        try:
+            redis_client = await get_redis_circuit()
+            now = time.time()
+            state, previous = await redis_client.eval(
+                RECORD_SCRIPT, 3, self.key, f"{self.key}:calls", f"{self.key}:failures",
+                now, self.window_seconds, outcome, int(probe), f"{now}:{uuid.uuid4().hex[:8]}",
+                self.min_requests, self.failure_rate, self.half_open_probes, self.window_seconds * 2
+            )
+            self._observe(state, previous)
+            if state == OPEN:
+                self._open_until = now + self.recovery_timeout
+        except Exception as e:
+            logger.warning(f"Failed to record circuit breaker {self.name} outcome: {e}")
+
+    async def call(self, func, *args, **kwargs):
+        """Execute function with circuit breaker"""
+        if time.time() < self._open_until:
+            self._reject()
+        try:
+            probe = await self._acquire()
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.warning(f"Circuit breaker {self.name} state unavailable, using local state: {e}")
+            return await self.local.call(func, *args, **kwargs)
+
+        try:
+            result = await func(*args, **kwargs)
+        except TRANSIENT_ERRORS:
+            await self._record(FAILURE, probe)
+            raise
+        except BaseException:
+            # Cancelled (e.g. a hedge race loser) or rejected request: no verdict on the dependency
+            await self._record(RELEASE, probe)
+            raise
+        await self._record(SUCCESS, probe)
+        return result
+
+
+_circuit_breakers: Dict[str, DistributedCircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str) -> DistributedCircuitBreaker:
+    """Breaker for a dependency, e.g. "llm:gpt-4-turbo" or "embedding:text-embedding-3-small" """
+    if name not in _circuit_breakers:
+        _circuit_breakers[name] = DistributedCircuitBreaker(name)
+    return _circuit_breakers[name]
@@ -0,0 +1,239 @@
+"""
+Context Assembler - Conversation history window with token budget and rolling summary
+"""
+from typing import Dict, List, Optional, Set
+import asyncio
+import json
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.logging import get_logger
+from app.core.security import PIIRedactor
+from app.core.tokens import count_tokens, TOKENS_PER_MESSAGE
+from app.models.message import Message, MessageRole
+from app.monitoring.prometheus import context_prompt_tokens_total
+
+logger = get_logger(__name__)
+
+# Redis client for per-chat context state
+_redis_context: Optional[redis.Redis] = None
+
+SUMMARY_PROMPT = """Aşağıdaki destek konuşmasını, önceki özeti de dikkate alarak kısa bir özet halinde güncelle.
+Kullanıcının sorunu, verilen bilgiler, kararlar ve açık kalan sorular korunmalı. Yalnızca özeti yaz."""
+
+
+async def get_redis_context():
+    """Get Redis client for conversation context"""
+    global _redis_context
+    if _redis_context is None:
+        _redis_context = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_context
+
+
+def context_key(chat_id: str) -> str:
+    return f"chat:context:{chat_id}"
+
+
+def turn(role: str, content: str) -> Dict:
+    """History entry with its token count (chat format overhead included)"""
+    return {"role": role, "content": content, "tokens": TOKENS_PER_MESSAGE + count_tokens(content, settings.MODEL)}
+
+
+def history_tokens(state: Dict) -> int:
+    """Tokens the summary and recent turns add to the prompt"""
+    summary = state.get("summary") or ""
+    summary_tokens = TOKENS_PER_MESSAGE + count_tokens(summary, settings.MODEL) if summary else 0
+    return summary_tokens + sum(t["tokens"] for t in state["turns"])
+
+
+def turns_to_fold(state: Dict, window: int, max_tokens: int) -> int:
+    """
+    Number of oldest turns to fold into the summary: none while the history is
+    within the window and token budget, otherwise enough to get back under half
+    of both so summaries are not regenerated on every turn
+    """
+    turns = state["turns"]
+    if len(turns) <= window and history_tokens(state) <= max_tokens:
+        return 0
+    keep_turns = window // 2
+    keep_tokens = max_tokens // 2
+    kept, tokens = 0, 0
+    for entry in reversed(turns):
+        if kept >= keep_turns or tokens + entry["tokens"] > keep_tokens:
+            break
+        kept += 1
+        tokens += entry["tokens"]
+    return len(turns) - kept
+
+
+class ContextAssembler:
+    """
+    Builds the conversation part of the LLM prompt for a chat
+
+    Per-chat state ({summary, turns, naive_tokens}) lives in Redis and is
+    loaded from the messages table on a miss. The prompt gets the summary of
+    older turns plus the most recent turns, within CONTEXT_WINDOW_SIZE messages
+    and MAX_CONTEXT_TOKENS tokens. After each reply, turns beyond the window or
+    budget are folded into the summary in the background (one summary call
+    covers many turns). naive_tokens tracks what sending the full history
+    would have cost, for the prompt-token savings metric.
+    """
+
+    def __init__(self, window: int = None, max_tokens: int = None, ttl: int = None):
+        self.window = window or settings.CONTEXT_WINDOW_SIZE
+        self.max_tokens = max_tokens or settings.MAX_CONTEXT_TOKENS
+        self.ttl = ttl or settings.CONTEXT_CACHE_TTL
+        self._folding: Set[str] = set()
+        # The event loop only keeps weak references to tasks
+        self._fold_tasks: Set[asyncio.Task] = set()
+
+    async def _load_state(self, chat_id: str, db: Optional[AsyncSession]) -> Dict:
+        try:
+            redis_client = await get_redis_context()
+            cached = await redis_client.get(context_key(chat_id))
+            if cached:
+                return json.loads(cached)
+        except Exception as e:
+            logger.warning(f"Context cache error for chat {chat_id}: {e}")
+
+        state = {"summary": "", "turns": [], "naive_tokens": 0}
+        if db is None:
+            return state
+        result = await db.execute(
+            select(Message.role, Message.text)
+            .where(Message.chat_id == chat_id, Message.role != MessageRole.SYSTEM)
+            .order_by(Message.created_at.desc())
+            .limit(self.window)
+        )
+        for role, text in reversed(result.all()):
+            # Operator (admin) replies are part of the assistant side of the conversation
+            entry = turn("user" if role == MessageRole.USER else "assistant", PIIRedactor.redact_text(text))
+            state["turns"].append(entry)
+            state["naive_tokens"] += entry["tokens"]
+        return state
+
+    async def _save_state(self, chat_id: str, state: Dict):
+        try:
+            redis_client = await get_redis_context()
+            await redis_client.setex(context_key(chat_id), self.ttl, json.dumps(state, ensure_ascii=False))
+        except Exception as e:
+            logger.warning(f"Failed to save context for chat {chat_id}: {e}")
+
+    async def assemble(
+        self,
+        chat_id: Optional[str],
+        current_text: str,
+        db: Optional[AsyncSession] = None
+    ) -> List[Dict[str, str]]:
+        """
+        History messages to put between the system prompt and the current
+        user message (empty for chats without history)
+        """
+        if not chat_id:
+            return []
+        state = await self._load_state(chat_id, db)
+        turns = list(state["turns"])
+        naive_tokens = state.get("naive_tokens", 0)
+        # The current message may already be persisted (REST path); it is sent separately
+        if turns and turns[-1]["role"] == "user" and turns[-1]["content"] == current_text:
+            naive_tokens -= turns.pop()["tokens"]
+
+        # Newest turns first until the window or budget is full (covers a failed or pending fold)
+        summary = state.get("summary") or ""
+        summary_tokens = TOKENS_PER_MESSAGE + count_tokens(summary, settings.MODEL) if summary else 0
+        budget = self.max_tokens - summary_tokens
+        selected: List[Dict] = []
+        for entry in reversed(turns):
+            if len(selected) >= self.window or entry["tokens"] > budget:
+                break
+            selected.append(entry)
+            budget -= entry["tokens"]
+        selected.reverse()
+
+        messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"Önceki konuşmanın özeti:\n{summary}"})
+        messages.extend({"role": entry["role"], "content": entry["content"]} for entry in selected)
+
+        assembled = summary_tokens + sum(entry["tokens"] for entry in selected)
+        context_prompt_tokens_total.labels(kind="assembled").inc(assembled)
+        context_prompt_tokens_total.labels(kind="naive").inc(naive_tokens)
+        return messages
+
+    async def record_turn(
+        self,
+        chat_id: Optional[str],
+        user_text: str,
+        assistant_text: str,
+        tenant: Optional[str] = None,
+        db: Optional[AsyncSession] = None
+    ):
+        """Append a completed exchange and fold old turns into the summary if needed"""
+        if not chat_id:
+            return
+        state = await self._load_state(chat_id, db)
+        turns = state["turns"]
+        if turns and turns[-1]["role"] == "user" and turns[-1]["content"] == user_text:
+            turns.pop()
+            state["naive_tokens"] -= TOKENS_PER_MESSAGE + count_tokens(user_text, settings.MODEL)
+        for entry in (turn("user", user_text), turn("assistant", assistant_text)):
+            turns.append(entry)
+            state["naive_tokens"] += entry["tokens"]
+        await self._save_state(chat_id, state)
+
+        if turns_to_fold(state, self.window, self.max_tokens) and chat_id not in self._folding:
+            self._folding.add(chat_id)
+            task = asyncio.create_task(self._fold(chat_id, tenant))
+            self._fold_tasks.add(task)
+            task.add_done_callback(self._fold_tasks.discard)
+
+    async def _fold(self, chat_id: str, tenant: Optional[str]):
+        """Summarize the oldest turns together with the previous summary"""
+        try:
+            state = await self._load_state(chat_id, None)
+            count = turns_to_fold(state, self.window, self.max_tokens)
+            if not count:
+                return
+            folded = state["turns"][:count]
+            transcript = "\n".join(
+                f"{'Kullanıcı' if entry['role'] == 'user' else 'Asistan'}: {entry['content']}" for entry in folded
+            )
+            summary = await self._summarize(state.get("summary") or "", transcript, tenant)
+            if summary is None:
+                return
+
+            # Turns may have been appended meanwhile; drop exactly the folded ones
+            latest = await self._load_state(chat_id, None)
+            latest["turns"] = latest["turns"][count:] if latest["turns"][:count] == folded else latest["turns"]
+            latest["summary"] = summary
+            await self._save_state(chat_id, latest)
+            logger.info(f"Folded {count} turns of chat {chat_id} into the summary")
+        except Exception as e:
+            logger.warning(f"Context summary failed for chat {chat_id}: {e}")
+        finally:
+            self._folding.discard(chat_id)
+
+    async def _summarize(self, previous_summary: str, transcript: str, tenant: Optional[str]) -> Optional[str]:
+        from app.services.llm_service import llm_service
+
+        content = f"Önceki özet:\n{previous_summary}\n\nKonuşma:\n{transcript}" if previous_summary else f"Konuşma:\n{transcript}"
+        summary = ""
+        async for chunk in llm_service.call_llm(
+            messages=[{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": content}],
+            temperature=0.0,
+            stream=False,
+            use_cache=False,
+            tenant=tenant,
+            model=settings.CONTEXT_SUMMARY_MODEL
+        ):
+            if chunk.get("type") == "text":
+                summary += chunk.get("data", "")
+            elif chunk.get("type") == "error":
+                logger.warning(f"Summary LLM error: {chunk.get('data', {}).get('message')}")
+                return None
+        return summary.strip() or None
+
+
+context_assembler = ContextAssembler()
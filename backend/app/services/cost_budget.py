@@ -0,0 +1,155 @@
+"""
+Cost Budget - Real-time daily LLM spend counters in Redis
+"""
+from typing import Dict, Optional
+from datetime import datetime, timedelta, timezone
+import asyncio
+import redis.asyncio as redis
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.logging import get_logger
+from app.models.llm_usage import LLMUsage
+
+logger = get_logger(__name__)
+
+# Redis client for cost counters
+_redis_cost: Optional[redis.Redis] = None
+
+# Counters outlive their day so late reads (and reconciliation) still see them
+COUNTER_TTL = 2 * 86400
+
+# Raise a counter to the reconciled value, never lower it: usage rows are
+# written behind the counter increment, so the database can only lag
+RAISE_TO_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > current then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return redis.call('GET', KEYS[1])
+"""
+
+OK = "ok"
+SOFT_LIMIT = "soft_limit"
+HARD_LIMIT = "hard_limit"
+
+
+async def get_redis_cost():
+    """Get Redis client for cost counters"""
+    global _redis_cost
+    if _redis_cost is None:
+        _redis_cost = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_cost
+
+
+def today_start() -> datetime:
+    """Start of the current UTC day (budgets reset at 00:00 UTC)"""
+    now = datetime.now(timezone.utc)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class CostBudget:
+    """
+    Daily LLM cost budget, global and per tenant
+
+    Spend is kept in Redis counters (INCRBYFLOAT when usage is recorded), so
+    checking the budget is a single GET instead of aggregating llm_usage.
+    The counters are reconciled from llm_usage periodically (and at startup),
+    which repairs them after a Redis flush.
+    """
+
+    def __init__(self):
+        self.daily_limit = settings.LLM_DAILY_COST_LIMIT
+        self.tenant_daily_limit = settings.LLM_TENANT_DAILY_COST_LIMIT
+        self.soft_limit_ratio = settings.LLM_COST_SOFT_LIMIT_RATIO
+        self.soft_limit_model = settings.LLM_COST_SOFT_LIMIT_MODEL
+
+    @staticmethod
+    def _key(day: datetime, tenant: Optional[str] = None) -> str:
+        key = f"llm:cost:{day.strftime('%Y-%m-%d')}"
+        return f"{key}:tenant:{tenant}" if tenant else key
+
+    async def record(self, cost: float, tenant: Optional[str] = None):
+        """Add spend to today's counters"""
+        if cost <= 0:
+            return
+        try:
+            redis_client = await get_redis_cost()
+            day = today_start()
+            pipe = redis_client.pipeline()
+            for key in [self._key(day)] + ([self._key(day, tenant)] if tenant else []):
+                pipe.incrbyfloat(key, cost)
+                pipe.expire(key, COUNTER_TTL)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record LLM cost: {e}")
+
+    async def get_spend(self, tenant: Optional[str] = None) -> Dict[str, float]:
+        """Today's spend: {"total": ..., "tenant": ...}"""
+        redis_client = await get_redis_cost()
+        day = today_start()
+        keys = [self._key(day)] + ([self._key(day, tenant)] if tenant else [])
+        values = await redis_client.mget(keys)
+        spend = {"total": float(values[0] or 0.0)}
+        if tenant:
+            spend["tenant"] = float(values[1] or 0.0)
+        return spend
+
+    async def check(self, tenant: Optional[str] = None) -> str:
+        """
+        Budget state for the next call: OK, SOFT_LIMIT (downgrade to the
+        cheaper model) or HARD_LIMIT (refuse). Fails open if Redis is down.
+        """
+        try:
+            spend = await self.get_spend(tenant)
+        except Exception as e:
+            logger.warning(f"Cost budget check failed, allowing request: {e}")
+            return OK
+
+        usage = spend["total"] / self.daily_limit if self.daily_limit > 0 else 0.0
+        if tenant and self.tenant_daily_limit > 0:
+            usage = max(usage, spend["tenant"] / self.tenant_daily_limit)
+
+        if usage >= 1.0:
+            return HARD_LIMIT
+        if self.soft_limit_model and usage >= self.soft_limit_ratio:
+            return SOFT_LIMIT
+        return OK
+
+    async def reconcile(self, db: AsyncSession):
+        """Raise today's counters to the spend recorded in llm_usage"""
+        day = today_start()
+        # Range predicate on created_at so idx_llm_usage_created_at is used
+        result = await db.execute(
+            select(LLMUsage.tenant, func.sum(LLMUsage.cost_usd))
+            .where(LLMUsage.created_at >= day, LLMUsage.created_at < day + timedelta(days=1))
+            .group_by(LLMUsage.tenant)
+        )
+        per_tenant = {tenant: float(cost or 0.0) for tenant, cost in result.all()}
+
+        redis_client = await get_redis_cost()
+        raise_to = redis_client.register_script(RAISE_TO_SCRIPT)
+        await raise_to(keys=[self._key(day)], args=[sum(per_tenant.values()), COUNTER_TTL])
+        for tenant, cost in per_tenant.items():
+            if tenant:
+                await raise_to(keys=[self._key(day, tenant)], args=[cost, COUNTER_TTL])
+        logger.info(f"Reconciled LLM cost counters: ${sum(per_tenant.values()):.4f} across {len(per_tenant)} tenants")
+
+    async def run_reconciler(self, session_factory, interval: Optional[float] = None):
+        """Reconcile now and then every interval seconds (one worker per interval)"""
+        interval = interval or settings.LLM_COST_RECONCILE_INTERVAL
+        while True:
+            try:
+                redis_client = await get_redis_cost()
+                # Only one process reconciles per interval
+                if await redis_client.set("llm:cost:reconcile:lock", "1", nx=True, ex=max(1, int(interval) - 1)):
+                    async with session_factory() as db:
+                        await self.reconcile(db)
+            except Exception as e:
+                logger.warning(f"LLM cost reconciliation failed: {e}")
+            await asyncio.sleep(interval)
+
+
+cost_budget = CostBudget()
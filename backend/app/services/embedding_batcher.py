@@ -0,0 +1,99 @@
+"""
+Embedding Batcher - Micro-batch concurrent embedding requests into one API call
+"""
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import time
+
+from app.config import settings
+from app.core.logging import get_logger
+from app.monitoring.prometheus import embedding_batch_size, embedding_queue_wait
+
+logger = get_logger(__name__)
+
+# (texts, model) -> embeddings in input order
+EmbedMany = Callable[[List[str], str], Awaitable[List[List[float]]]]
+
+
+class EmbeddingBatcher:
+    """
+    Collects embedding requests for up to window_ms (or until max_batch_size
+    requests are queued) and sends them as a single batched `input=[...]` call.
+    Each caller awaits a future resolved with its own vector.
+    """
+
+    def __init__(
+        self,
+        embed_many: EmbedMany,
+        window_ms: Optional[float] = None,
+        max_batch_size: Optional[int] = None
+    ):
+        self.embed_many = embed_many
+        self.window_ms = settings.RAG_EMBEDDING_BATCH_WINDOW_MS if window_ms is None else window_ms
+        self.max_batch_size = max_batch_size or settings.RAG_EMBEDDING_BATCH_MAX_SIZE
+        self._pending: List[Tuple[str, str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Batches being dispatched (the event loop only keeps weak references to tasks)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str, model: str) -> List[float]:
+        """Queue text for the next batch and wait for its embedding"""
+        if self.window_ms <= 0:
+            return (await self.embed_many([text], model))[0]
+
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Futures and timers are bound to one event loop (workers may run several)
+            self._loop, self._pending, self._timer, self._tasks = loop, [], None, set()
+
+        future = loop.create_future()
+        self._pending.append((text, model, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self._loop.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """Send the queued requests and wait for the batches in flight"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _dispatch(self, batch: List[Tuple[str, str, asyncio.Future, float]]):
+        now = time.perf_counter()
+        by_model: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        for text, model, future, enqueued_at in batch:
+            embedding_queue_wait.observe(now - enqueued_at)
+            by_model.setdefault(model, []).append((text, future))
+
+        for model, requests in by_model.items():
+            # Identical texts in one window are embedded once
+            texts = list(dict.fromkeys(text for text, _ in requests))
+            embedding_batch_size.observe(len(texts))
+            try:
+                embeddings = await self.embed_many(texts, model)
+                by_text = dict(zip(texts, embeddings))
+                for text, future in requests:
+                    if not future.done():
+                        future.set_result(by_text[text])
+            except Exception as e:
+                logger.error(f"Batched embedding request failed ({len(texts)} inputs): {e}")
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
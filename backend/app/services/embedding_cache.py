@@ -0,0 +1,133 @@
+"""
+Embedding Cache - Two-tier (in-process LRU + Redis) cache for query embeddings
+"""
+from typing import Dict, List, Optional
+from collections import OrderedDict
+from array import array
+import hashlib
+import redis.asyncio as redis
+
+from app.config import settings
+from app.core.logging import get_logger
+from app.monitoring.prometheus import embedding_cache_lookups_total
+
+logger = get_logger(__name__)
+
+# Redis client for the shared tier (binary values, no decoding)
+_redis_embeddings: Optional[redis.Redis] = None
+
+
+async def get_redis_embeddings():
+    """Get Redis client for embedding cache"""
+    global _redis_embeddings
+    if _redis_embeddings is None:
+        _redis_embeddings = redis.from_url(settings.REDIS_URL, decode_responses=False)
+    return _redis_embeddings
+
+
+def pack_embedding(embedding: List[float]) -> bytes:
+    """Pack embedding as float32 bytes (6 KB for 1536 dims vs ~30 KB as JSON)"""
+    return array("f", embedding).tobytes()
+
+
+def unpack_embedding(data: bytes) -> List[float]:
+    """Unpack float32 bytes into an embedding"""
+    values = array("f")
+    values.frombytes(data)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """
+    Query embedding cache keyed by (embedding model, normalized text)
+
+    Lookups go to a bounded in-process LRU first, then Redis. Keys include the
+    embedding model, and the local tier is dropped when the model changes, so
+    vectors from a previous model are never served.
+    """
+
+    def __init__(self, max_size: int = None, ttl: int = None, use_redis: bool = True):
+        self.max_size = max_size or settings.RAG_EMBEDDING_CACHE_SIZE
+        self.ttl = ttl or settings.RAG_EMBEDDING_CACHE_TTL
+        self.use_redis = use_redis
+        self._local: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._model: Optional[str] = None
+        self.stats: Dict[str, int] = {"local_hit": 0, "redis_hit": 0, "miss": 0}
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize query text: case-fold and collapse whitespace"""
+        return " ".join(text.casefold().split())
+
+    def _key(self, text: str, model: str) -> str:
+        digest = hashlib.sha1(self.normalize(text).encode()).hexdigest()
+        return f"emb:cache:{model}:{digest}"
+
+    def _check_model(self, model: str):
+        """Drop the local tier when the embedding model setting changes"""
+        if model != self._model:
+            if self._model is not None:
+                logger.info(f"Embedding model changed ({self._model} -> {model}), clearing local embedding cache")
+            self._local.clear()
+            self._model = model
+
+    def _remember(self, key: str, embedding: List[float]):
+        self._local[key] = embedding
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    def _count(self, result: str):
+        self.stats[result] += 1
+        embedding_cache_lookups_total.labels(result=result).inc()
+
+    async def get(self, text: str, model: str = None) -> Optional[List[float]]:
+        """Get cached embedding or None"""
+        model = model or settings.RAG_EMBEDDING_MODEL
+        self._check_model(model)
+        key = self._key(text, model)
+
+        embedding = self._local.get(key)
+        if embedding is not None:
+            self._local.move_to_end(key)
+            self._count("local_hit")
+            return embedding
+
+        if self.use_redis:
+            try:
+                redis_cache = await get_redis_embeddings()
+                data = await redis_cache.get(key)
+                if data:
+                    embedding = unpack_embedding(data)
+                    self._remember(key, embedding)
+                    self._count("redis_hit")
+                    return embedding
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis error: {e}")
+
+        self._count("miss")
+        return None
+
+    async def set(self, text: str, embedding: List[float], model: str = None):
+        """Store embedding in both tiers"""
+        if not embedding:
+            return
+        model = model or settings.RAG_EMBEDDING_MODEL
+        self._check_model(model)
+        key = self._key(text, model)
+        self._remember(key, embedding)
+
+        if self.use_redis:
+            try:
+                redis_cache = await get_redis_embeddings()
+                await redis_cache.setex(key, self.ttl, pack_embedding(embedding))
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis set error: {e}")
+
+    def hit_ratio(self) -> float:
+        """Share of lookups served from either tier"""
+        total = sum(self.stats.values())
+        return (self.stats["local_hit"] + self.stats["redis_hit"]) / total if total else 0.0
+
+
+embedding_cache = EmbeddingCache()
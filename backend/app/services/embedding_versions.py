@@ -0,0 +1,61 @@
+"""
+Embedding Versions - Which embedding model serves queries and which are being built
+"""
+from typing import List, Optional
+import time
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.logging import get_logger
+from app.models.kb_embedding_version import KBEmbeddingVersion
+
+logger = get_logger(__name__)
+
+ACTIVE = "active"
+BUILDING = "building"
+RETIRED = "retired"
+
+# Process-local copy of the active model, refreshed every RAG_EMBEDDING_VERSION_REFRESH seconds
+_active_model: Optional[str] = None
+_active_checked_at = 0.0
+
+
+async def get_active_embedding_model(db: AsyncSession) -> str:
+    """
+    Get the embedding model queries must use (and filter chunks by)
+    Falls back to RAG_EMBEDDING_MODEL when no version is registered yet
+    """
+    global _active_model, _active_checked_at
+    now = time.monotonic()
+    if _active_model is not None and now - _active_checked_at < settings.RAG_EMBEDDING_VERSION_REFRESH:
+        return _active_model
+
+    try:
+        result = await db.execute(
+            select(KBEmbeddingVersion.model).where(KBEmbeddingVersion.status == ACTIVE)
+        )
+        model = result.scalar_one_or_none()
+    except Exception as e:
+        logger.warning(f"Failed to load active embedding version: {e}")
+        model = None
+
+    model = model or settings.RAG_EMBEDDING_MODEL
+    if _active_model is not None and model != _active_model:
+        logger.info(f"Active embedding model changed: {_active_model} -> {model}")
+    _active_model, _active_checked_at = model, now
+    return model
+
+
+async def get_indexing_models(db: AsyncSession) -> List[str]:
+    """
+    Get the models new and changed documents are embedded with: the active
+    version plus any version being built, so a re-embedding run never misses them
+    """
+    result = await db.execute(
+        select(KBEmbeddingVersion.model, KBEmbeddingVersion.status)
+        .where(KBEmbeddingVersion.status.in_([ACTIVE, BUILDING]))
+    )
+    rows = result.all()
+    active = [row.model for row in rows if row.status == ACTIVE] or [settings.RAG_EMBEDDING_MODEL]
+    return active + [row.model for row in rows if row.status == BUILDING and row.model not in active]
@@ -0,0 +1,95 @@
+"""
+Hedging - Race a backup LLM stream against a slow primary and keep whichever streams first
+"""
+from typing import Awaitable, Callable, List, Optional, Tuple
+import asyncio
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def has_output(chunk) -> bool:
+    """Whether a streamed chunk carries generated content or a tool call"""
+    if not chunk.choices or not chunk.choices[0].delta:
+        return False
+    delta = chunk.choices[0].delta
+    return bool(delta.content or delta.tool_calls)
+
+
+async def close_stream(stream):
+    """Close an OpenAI stream (and its HTTP response) that will not be read"""
+    try:
+        await stream.response.aclose()
+    except Exception as e:
+        logger.debug(f"Error closing abandoned LLM stream: {e}")
+
+
+async def open_stream(create: Callable[[], Awaitable]) -> Tuple[object, List]:
+    """
+    Start a streamed completion and read up to its first output chunk
+    Returns (stream, chunks read so far); the caller continues reading the stream.
+    """
+    stream = await create()
+    first_chunks = []
+    try:
+        async for chunk in stream:
+            first_chunks.append(chunk)
+            if has_output(chunk):
+                break
+    except BaseException:
+        await close_stream(stream)
+        raise
+    return stream, first_chunks
+
+
+async def race_streams(
+    primary: Callable[[], Awaitable],
+    hedge: Optional[Callable[[], Awaitable]],
+    deadline: float,
+    on_hedge: Optional[Callable[[str], None]] = None
+) -> Tuple[int, object, List, List[int]]:
+    """
+    Open the primary stream; if it has no output within `deadline` seconds,
+    or fails before that, open the hedge stream too. The first one to produce
+    output wins and the other is cancelled and closed.
+
+    on_hedge is called with "fired" (primary slow) or "fallback" (primary failed).
+    Returns (winner index: 0 primary / 1 hedge, stream, first chunks, loser indexes).
+    Raises the last error if every attempt fails.
+    """
+    tasks = {asyncio.create_task(open_stream(primary)): 0}
+    hedged = False
+    last_error: Optional[BaseException] = None
+
+    try:
+        while tasks:
+            timeout = None if hedged or hedge is None else deadline
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                index = tasks.pop(task)
+                if task.exception() is None:
+                    stream, first_chunks = task.result()
+                    losers = list(tasks.values())
+                    return index, stream, first_chunks, losers
+                last_error = task.exception()
+                logger.warning(f"LLM stream attempt {index} failed: {last_error}")
+
+            if not hedged and hedge is not None:
+                hedged = True
+                if on_hedge:
+                    on_hedge("fallback" if last_error is not None else "fired")
+                tasks[asyncio.create_task(open_stream(hedge))] = 1
+
+        raise last_error or RuntimeError("No LLM stream attempt succeeded")
+    finally:
+        # Losers (or everything, if we were cancelled)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                stream, _ = await task
+                await close_stream(stream)
+            except BaseException:
+                pass
@@ -0,0 +1,48 @@
+"""
+Language Detection - Lightweight Turkish/English detection for text search configs
+"""
+from typing import Optional
+import re
+
+from app.config import settings
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+_TURKISH_CHARS = set("çğıöşüÇĞİÖŞÜ")
+
+_STOPWORDS = {
+    "tr": {
+        "ve", "bir", "bu", "şu", "için", "ile", "da", "de", "mi", "mı", "ne", "nasıl",
+        "nerede", "neden", "çok", "daha", "ama", "gibi", "olarak", "var", "yok", "ben",
+        "sen", "biz", "siz", "değil", "ise", "veya", "kadar", "sonra", "önce", "her",
+    },
+    "en": {
+        "the", "and", "is", "are", "to", "of", "in", "for", "with", "how", "what",
+        "where", "why", "my", "you", "it", "on", "this", "that", "can", "not", "or",
+        "be", "was", "have", "has", "do", "does", "from", "at", "by", "an",
+    },
+}
+
+
+def detect_language(text: str, default: Optional[str] = None) -> str:
+    """
+    Detect document language ("tr" or "en")
+    Falls back to default (RAG_DEFAULT_LANGUAGE) when the signal is too weak
+    """
+    default = default or settings.RAG_DEFAULT_LANGUAGE
+    words = _WORD_PATTERN.findall((text or "")[:5000].lower())
+    if not words:
+        return default
+    
+    scores = {language: sum(1 for word in words if word in stopwords) for language, stopwords in _STOPWORDS.items()}
+    # Words spelled with Turkish-only letters are a strong signal
+    scores["tr"] += sum(1 for word in words if _TURKISH_CHARS.intersection(word))
+    
+    best = max(scores, key=scores.get)
+    if scores[best] == 0 or list(scores.values()).count(scores[best]) > 1:
+        return default
+    return best
+
+
+def get_text_search_config(language: Optional[str]) -> str:
+    """Map language code to a PostgreSQL text search configuration"""
+    return settings.RAG_TEXT_SEARCH_CONFIGS.get(language or "", "simple")
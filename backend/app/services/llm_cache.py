@@ -0,0 +1,133 @@
+"""
+LLM Cache - Two-tier (in-process LRU + Redis) cache for LLM responses
+"""
+from typing import Dict, List, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import zlib
+import redis.asyncio as redis
+
+from app.config import settings
+from app.core.logging import get_logger
+from app.monitoring.prometheus import llm_cache_lookups_total, llm_cache_hit_ratio, llm_cache_bytes_saved_total
+
+logger = get_logger(__name__)
+
+# Redis client for the shared tier (compressed binary values, no decoding)
+_redis_llm_cache: Optional[redis.Redis] = None
+
+COMPRESSION_LEVEL = 6
+
+
+async def get_redis_llm_cache():
+    """Get Redis client for LLM response cache"""
+    global _redis_llm_cache
+    if _redis_llm_cache is None:
+        _redis_llm_cache = redis.from_url(settings.REDIS_URL, decode_responses=False)
+    return _redis_llm_cache
+
+
+def unpack_response(data: bytes) -> Dict:
+    """Decompress and deserialize a cached response"""
+    return json.loads(zlib.decompress(data))
+
+
+def replay_chunks(content: str, chunk_chars: int = None) -> List[str]:
+    """Split cached content into stream deltas, breaking after whitespace where possible"""
+    chunk_chars = chunk_chars or settings.LLM_CACHE_REPLAY_CHUNK_CHARS
+    chunks = []
+    start = 0
+    while start < len(content):
+        end = min(start + chunk_chars, len(content))
+        if end < len(content):
+            space = content.rfind(" ", start + 1, end)
+            if space > start:
+                end = space + 1
+        chunks.append(content[start:end])
+        start = end
+    return chunks
+
+
+class LLMResponseCache:
+    """
+    LLM response cache keyed by (model, max tokens, temperature, messages)
+
+    Lookups go to a bounded in-process LRU first, then Redis. Redis values are
+    zlib-compressed JSON; the local tier keeps decoded responses.
+    """
+
+    def __init__(self, max_size: int = None, ttl: int = None, use_redis: bool = True):
+        self.max_size = max_size or settings.LLM_CACHE_LOCAL_SIZE
+        self.ttl = ttl or settings.LLM_CACHE_TTL
+        self.use_redis = use_redis
+        self._local: "OrderedDict[str, Dict]" = OrderedDict()
+        self.stats: Dict[str, int] = {"local_hit": 0, "redis_hit": 0, "miss": 0}
+
+    @staticmethod
+    def key(messages: List[Dict[str, str]], temperature: float, model: str, max_tokens: int) -> str:
+        """Cache key; every request parameter that changes the answer is part of it"""
+        cache_data = json.dumps(
+            {"messages": messages, "temperature": temperature, "model": model, "max_tokens": max_tokens},
+            sort_keys=True, ensure_ascii=False
+        )
+        cache_hash = hashlib.sha256(cache_data.encode()).hexdigest()
+        return f"llm:cache:v2:{cache_hash}"
+
+    def _remember(self, key: str, response: Dict):
+        self._local[key] = response
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    def _count(self, result: str, response: Optional[Dict] = None):
+        self.stats[result] += 1
+        llm_cache_lookups_total.labels(result=result).inc()
+        llm_cache_hit_ratio.set(self.hit_ratio())
+        if response is not None:
+            llm_cache_bytes_saved_total.labels(kind="served").inc(len(response.get("content", "").encode()))
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Get cached response ({"content", "data"}) or None"""
+        response = self._local.get(key)
+        if response is not None:
+            self._local.move_to_end(key)
+            self._count("local_hit", response)
+            return response
+
+        if self.use_redis:
+            try:
+                redis_cache = await get_redis_llm_cache()
+                data = await redis_cache.get(key)
+                if data:
+                    response = unpack_response(data)
+                    self._remember(key, response)
+                    self._count("redis_hit", response)
+                    return response
+            except Exception as e:
+                logger.warning(f"LLM cache Redis error: {e}")
+
+        self._count("miss")
+        return None
+
+    async def set(self, key: str, response: Dict):
+        """Store response in both tiers"""
+        self._remember(key, response)
+
+        if self.use_redis:
+            try:
+                raw = json.dumps(response, ensure_ascii=False).encode()
+                data = zlib.compress(raw, COMPRESSION_LEVEL)
+                redis_cache = await get_redis_llm_cache()
+                await redis_cache.setex(key, self.ttl, data)
+                llm_cache_bytes_saved_total.labels(kind="compression").inc(max(0, len(raw) - len(data)))
+            except Exception as e:
+                logger.warning(f"LLM cache Redis set error: {e}")
+
+    def hit_ratio(self) -> float:
+        """Share of lookups served from either tier"""
+        total = sum(self.stats.values())
+        return (self.stats["local_hit"] + self.stats["redis_hit"]) / total if total else 0.0
+
+
+llm_cache = LLMResponseCache()
@@ -2,65 +2,37 @@
 LLM Service - GPT-4 Turbo Integration with Cost Tracking
 """
 from typing import List, Dict, Optional, AsyncGenerator
-from datetime import datetime, timedelta
+from datetime import timedelta
+import asyncio
 import time
-import json
-import hashlib
 from openai import AsyncOpenAI
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-import redis.asyncio as redis
-
 from app.config import settings
 from app.models.llm_usage import LLMUsage
 from app.core.database import get_db
 from app.core.logging import get_logger
+from app.monitoring.prometheus import (
+    llm_time_to_first_token,
+    llm_hedge_requests_total,
+    llm_hedge_wasted_cost_usd,
+    llm_requests_total,
+    llm_cost_usd,
+    llm_tokens_total,
+    llm_request_duration,
+    labelled,
+)
+from app.services.cost_budget import cost_budget, today_start, HARD_LIMIT, SOFT_LIMIT
+from app.services.llm_cache import llm_cache, replay_chunks
+from app.services.singleflight import singleflight
+from app.core.tokens import count_tokens, count_message_tokens
+from app.services.model_router import model_pricing
+from app.services.hedging import race_streams
+from app.services.circuit_breaker import get_circuit_breaker
+from app.services.telemetry import telemetry_writer
 
 logger = get_logger(__name__)
 
-# Redis client for caching
-_redis_cache: Optional[redis.Redis] = None
-
-
-async def get_redis_cache():
-    """Get Redis client for caching"""
-    global _redis_cache
-    if _redis_cache is None:
-        _redis_cache = redis.from_url(settings.REDIS_URL, decode_responses=False)
-    return _redis_cache
-
-
-class CircuitBreaker:
-    """Circuit breaker for LLM calls"""
-    
-    def __init__(self, failure_threshold: int = 5, recovery_timeout: int = 60):
-        self.failure_threshold = failure_threshold
-        self.recovery_timeout = recovery_timeout
-        self.failures = 0
-        self.state = "CLOSED"  # CLOSED, OPEN, HALF_OPEN
-        self.last_failure_time = None
-    
-    async def call(self, func, *args, **kwargs):
-        """Execute function with circuit breaker"""
-        if self.state == "OPEN":
-            if time.time() - self.last_failure_time > self.recovery_timeout:
-                self.state = "HALF_OPEN"
-            else:
-                raise Exception("Circuit breaker is OPEN")
-        
-        try:
-            result = await func(*args, **kwargs)
-            if self.state == "HALF_OPEN":
-                self.state = "CLOSED"
-                self.failures = 0
-            return result
-        except Exception as e:
-            self.failures += 1
-            self.last_failure_time = time.time()
-            if self.failures >= self.failure_threshold:
-                self.state = "OPEN"
-            raise
-
 
 class LLMService:
     """LLM Service with GPT-4 Turbo"""
@@ -71,10 +43,19 @@ class LLMService:
             base_url=settings.OPENAI_BASE_URL
         )
         self.model = settings.MODEL
-        self.circuit_breaker = CircuitBreaker()
+        # Hedge / fallback endpoint (the primary endpoint unless LLM_HEDGE_BASE_URL is set)
+        self.hedge_client = AsyncOpenAI(
+            api_key=settings.LLM_HEDGE_API_KEY or settings.OPENAI_API_KEY,
+            base_url=settings.LLM_HEDGE_BASE_URL
+        ) if settings.LLM_HEDGE_BASE_URL else self.client
         self.daily_cost_limit = settings.LLM_DAILY_COST_LIMIT
         self.max_tokens = settings.LLM_MAX_TOKENS_PER_REQUEST
     
+    def circuit_breaker(self, model: str, hedge: bool = False):
+        """Shared breaker for a model on the primary (or separate hedge) endpoint"""
+        endpoint = "llm-hedge" if hedge and self.hedge_client is not self.client else "llm"
+        return get_circuit_breaker(f"{endpoint}:{model}")
+    
     def calculate_cost(
         self,
         prompt_tokens: int,
@@ -82,73 +63,29 @@ class LLMService:
         model: str = None
     ) -> float:
         """Calculate cost based on token usage"""
-        model = model or self.model
-        
-        # Pricing per 1M tokens (as of 2024)
-        pricing = {
-            "gpt-4-turbo": {"prompt": 10.0, "completion": 30.0},
-            "gpt-4": {"prompt": 30.0, "completion": 60.0},
-            "gpt-3.5-turbo": {"prompt": 0.5, "completion": 1.5},
-        }
-        
-        if model not in pricing:
-            # Default to gpt-4-turbo pricing
-            model = "gpt-4-turbo"
-        
+        pricing = model_pricing(model or self.model)
         cost = (
-            (prompt_tokens / 1_000_000) * pricing[model]["prompt"] +
-            (completion_tokens / 1_000_000) * pricing[model]["completion"]
+            (prompt_tokens / 1_000_000) * pricing["prompt"] +
+            (completion_tokens / 1_000_000) * pricing["completion"]
         )
         return cost
     
     async def get_daily_cost(self, db: AsyncSession) -> float:
-        """Get today's total cost"""
-        today = datetime.utcnow().date()
+        """Get today's total cost from llm_usage (UTC day, index-friendly range)"""
+        day = today_start()
         result = await db.execute(
             select(func.sum(LLMUsage.cost_usd)).where(
-                func.date(LLMUsage.created_at) == today
+                LLMUsage.created_at >= day,
+                LLMUsage.created_at < day + timedelta(days=1)
             )
         )
         total = result.scalar() or 0.0
         return total
     
-    async def check_cost_limit(self, db: AsyncSession) -> bool:
-        """Check if daily cost limit is reached"""
-        daily_cost = await self.get_daily_cost(db)
-        return daily_cost < self.daily_cost_limit
+    async def check_cost_limit(self, db: AsyncSession = None, tenant: Optional[str] = None) -> bool:
+        """Check if daily cost limit is reached (Redis counters, no database query)"""
+        return await cost_budget.check(tenant) != HARD_LIMIT
     
-    async def _get_cache_key(self, messages: List[Dict[str, str]], temperature: float) -> str:
-        """Generate cache key from messages and temperature"""
-        cache_data = json.dumps({"messages": messages, "temperature": temperature}, sort_keys=True)
-        cache_hash = hashlib.md5(cache_data.encode()).hexdigest()
-        return f"llm:cache:{cache_hash}"
-    
-    async def _get_cached_response(self, cache_key: str) -> Optional[Dict]:
-        """Get cached LLM response"""
-        try:
-            redis_cache = await get_redis_cache()
-            cached = await redis_cache.get(cache_key)
-            if cached:
-                logger.info("LLM cache hit", cache_key=cache_key)
-                return json.loads(cached)
-            return None
-        except Exception as e:
-            logger.warning("Redis cache error", error=str(e))
-            return None
-    
-    async def _set_cached_response(self, cache_key: str, response: Dict, ttl: int):
-        """Cache LLM response"""
-        try:
-            redis_cache = await get_redis_cache()
-            await redis_cache.setex(
-                cache_key,
-                ttl,
-                json.dumps(response, ensure_ascii=False)
-            )
-            logger.info("LLM response cached", cache_key=cache_key, ttl=ttl)
-        except Exception as e:
-            logger.warning("Redis cache set error", error=str(e))
-
     async def call_llm(
         self,
         messages: List[Dict[str, str]],
@@ -156,7 +93,10 @@ class LLMService:
         tools: Optional[List[Dict]] = None,
         stream: bool = True,
         db: AsyncSession = None,
-        use_cache: bool = True
+        use_cache: bool = True,
+        tenant: Optional[str] = None,
+        model: Optional[str] = None,
+        route: Optional[str] = None
     ) -> AsyncGenerator[Dict, None]:
         """
         Call LLM with streaming support and caching
@@ -164,35 +104,93 @@ class LLMService:
         """
         start_time = time.time()
         
-        # Check cache if not streaming and tools not used
-        if use_cache and not stream and not tools:
-            cache_key = await self._get_cache_key(messages, temperature)
-            cached_response = await self._get_cached_response(cache_key)
+        # Check cost budget: O(1) Redis counters; past the soft limit use the cheaper model
+        model = model or self.model
+        budget_state = await cost_budget.check(tenant)
+        if budget_state == SOFT_LIMIT:
+            model = settings.LLM_COST_SOFT_LIMIT_MODEL
+        
+        # Check cache (tool calls are never cached); hits are free, so they are served past the limit too
+        cache_key = None
+        if use_cache and not tools:
+            cache_key = llm_cache.key(messages, temperature, model, self.max_tokens)
+            cached_response = await llm_cache.get(cache_key)
             if cached_response:
-                # Yield cached response
-                if "content" in cached_response:
-                    yield {"type": "text", "data": cached_response["content"]}
+                logger.info(f"LLM cache hit (cache_key={cache_key})")
+                labelled(llm_requests_total, model, "cached").inc()
+                content = cached_response.get("content", "")
+                if stream:
+                    # Replay as a fast synthetic stream so consumers see the usual deltas
+                    for delta in replay_chunks(content):
+                        yield {"type": "text", "data": delta}
+                        await asyncio.sleep(0)
+                elif content:
+                    yield {"type": "text", "data": content}
                 yield {
                     "type": "end",
-                    "data": cached_response.get("data", {})
+                    "data": {
+                        **cached_response.get("data", {}),
+                        "latency_ms": (time.time() - start_time) * 1000,
+                        "cost": 0.0,
+                        "cached": True
+                    }
                 }
                 return
         
-        # Check cost limit
-        if db and not await self.check_cost_limit(db):
-            logger.warning("Daily cost limit reached")
+        # Oversized prompts are rejected locally instead of by the API
+        prompt_tokens = count_message_tokens(messages, model)
+        if prompt_tokens > settings.LLM_MAX_PROMPT_TOKENS:
+            logger.warning(f"Prompt exceeds token limit (prompt_tokens={prompt_tokens}, limit={settings.LLM_MAX_PROMPT_TOKENS})")
+            labelled(llm_requests_total, model, "rejected").inc()
+            yield {
+                "type": "error",
+                "data": {"message": "Prompt exceeds token limit"}
+            }
+            return
+        
+        if budget_state == HARD_LIMIT:
+            logger.warning(f"Daily cost limit reached (tenant={tenant})")
+            labelled(llm_requests_total, model, "rejected").inc()
             yield {
                 "type": "error",
                 "data": {"message": "Daily cost limit reached"}
             }
             return
+        if budget_state == SOFT_LIMIT:
+            logger.info(f"Cost soft limit reached, downgrading model (model={model}, tenant={tenant})")
         
+        if cache_key and settings.LLM_SINGLEFLIGHT_ENABLED:
+            # Identical concurrent requests share one upstream call (across workers)
+            flight_key = f"{cache_key}:stream" if stream else cache_key
+            async for event in singleflight.run(
+                flight_key,
+                lambda: self._call_upstream(messages, temperature, tools, stream, db, tenant, model, route, cache_key, start_time)
+            ):
+                yield event
+        else:
+            async for event in self._call_upstream(messages, temperature, tools, stream, db, tenant, model, route, cache_key, start_time):
+                yield event
+    
+    async def _call_upstream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        tools: Optional[List[Dict]],
+        stream: bool,
+        db: Optional[AsyncSession],
+        tenant: Optional[str],
+        model: str,
+        route: Optional[str],
+        cache_key: Optional[str],
+        start_time: float
+    ) -> AsyncGenerator[Dict, None]:
+        """Call the LLM API, record usage and cost, and cache the answer"""
         try:
-            logger.info("Calling LLM", model=self.model, stream=stream, tools=bool(tools))
+            logger.info(f"Calling LLM (model={model}, stream={stream}, tools={bool(tools)})")
             
             # Prepare request
             request_params = {
-                "model": self.model,
+                "model": model,
                 "messages": messages,
                 "temperature": temperature,
                 "max_tokens": self.max_tokens,
@@ -203,11 +201,15 @@ class LLMService:
                 request_params["tools"] = tools
                 request_params["tool_choice"] = "auto"
             
-            # Call LLM with circuit breaker
-            response = await self.circuit_breaker.call(
-                self.client.chat.completions.create,
-                **request_params
-            )
+            # Call LLM with circuit breaker (hedged for streams)
+            first_chunks = []
+            if stream and settings.LLM_HEDGE_ENABLED:
+                response, first_chunks, model = await self._hedged_stream(request_params, messages, tenant)
+            else:
+                response = await self.circuit_breaker(model).call(
+                    self.client.chat.completions.create,
+                    **request_params
+                )
             
             content = ""
             tool_calls = []
@@ -215,12 +217,14 @@ class LLMService:
             completion_tokens = 0
             
             if stream:
-                async for chunk in response:
+                async for chunk in self._chunks(first_chunks, response):
                     if chunk.choices and chunk.choices[0].delta:
                         delta = chunk.choices[0].delta
                         
                         # Content
                         if delta.content:
+                            if not content:
+                                llm_time_to_first_token.labels(model=model).observe(time.time() - start_time)
                             content += delta.content
                             yield {"type": "text", "data": delta.content}
                         
@@ -253,12 +257,22 @@ class LLMService:
                     prompt_tokens = response.usage.prompt_tokens or 0
                     completion_tokens = response.usage.completion_tokens or 0
             
+            # Streamed responses carry no usage: count tokens locally so cost is recorded
+            if not prompt_tokens and not completion_tokens:
+                prompt_tokens = count_message_tokens(messages, model)
+                completion_tokens = count_tokens(content, model) + sum(
+                    count_tokens(call["function"]["arguments"], model)
+                    for call in tool_calls if isinstance(call, dict)
+                )
+            
             # Calculate metrics
             latency_ms = (time.time() - start_time) * 1000
             total_tokens = prompt_tokens + completion_tokens
-            cost = self.calculate_cost(prompt_tokens, completion_tokens)
+            cost = self.calculate_cost(prompt_tokens, completion_tokens, model)
             
             end_data = {
+                "model": model,
+                "route": route,
                 "content": content,
                 "tool_calls": tool_calls,
                 "latency_ms": latency_ms,
@@ -266,32 +280,32 @@ class LLMService:
                 "cost": cost
             }
             
-            # Cache response if not streaming and no tools
-            if use_cache and not stream and not tools:
-                cache_key = await self._get_cache_key(messages, temperature)
-                await self._set_cached_response(
-                    cache_key,
-                    {"content": content, "data": end_data},
-                    settings.LLM_CACHE_TTL
-                )
+            # Cache complete text answers (streamed or not)
+            if cache_key and content and not tool_calls:
+                await llm_cache.set(cache_key, {"content": content, "data": end_data})
+                logger.info(f"LLM response cached (cache_key={cache_key})")
+            
+            # Save usage (written behind, off the request session)
+            telemetry_writer.record(
+                "llm_usage",
+                model=model,
+                route=route,
+                tenant=tenant,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=total_tokens,
+                cost_usd=cost,
+                latency_ms=latency_ms
+            )
+            
+            # Spend is counted right away; the usage row follows with the next telemetry flush
+            await cost_budget.record(cost, tenant)
             
-            # Save usage
-            if db:
-                try:
-                    usage = LLMUsage(
-                        model=self.model,
-                        prompt_tokens=prompt_tokens,
-                        completion_tokens=completion_tokens,
-                        total_tokens=total_tokens,
-                        cost_usd=cost,
-                        latency_ms=latency_ms
-                    )
-                    db.add(usage)
-                    await db.commit()
-                    logger.info("LLM usage saved", tokens=total_tokens, cost=cost, latency_ms=latency_ms)
-                except Exception as e:
-                    logger.error("Error saving LLM usage", error=str(e))
-                    await db.rollback()
+            labelled(llm_requests_total, model, "success").inc()
+            labelled(llm_request_duration, model).observe(latency_ms / 1000)
+            labelled(llm_cost_usd, model).inc(cost)
+            labelled(llm_tokens_total, model, "prompt").inc(prompt_tokens)
+            labelled(llm_tokens_total, model, "completion").inc(completion_tokens)
             
             # Yield end event
             yield {
@@ -300,12 +314,46 @@ class LLMService:
             }
             
         except Exception as e:
-            logger.error("LLM call error", error=str(e), exc_info=True)
+            logger.error(f"LLM call error: {e}", exc_info=True)
+            labelled(llm_requests_total, model, "error").inc()
             yield {
                 "type": "error",
                 "data": {"message": str(e)}
             }
     
+    async def _hedged_stream(self, request_params: Dict, messages: List[Dict[str, str]], tenant: Optional[str]):
+        """
+        Open the stream, racing a hedge request against a slow or failing primary
+        Returns (stream, chunks already read, model of the winning request)
+        """
+        models = [request_params["model"], settings.LLM_HEDGE_MODEL or request_params["model"]]
+        winner, response, first_chunks, losers = await race_streams(
+            lambda: self.circuit_breaker(models[0]).call(self.client.chat.completions.create, **request_params),
+            lambda: self.circuit_breaker(models[1], hedge=True).call(
+                self.hedge_client.chat.completions.create, **{**request_params, "model": models[1]}
+            ),
+            settings.LLM_HEDGE_DEADLINE_MS / 1000,
+            on_hedge=lambda result: llm_hedge_requests_total.labels(result=result).inc()
+        )
+        if winner == 1:
+            llm_hedge_requests_total.labels(result="won").inc()
+        if losers:
+            # The cancelled request was billed for (at least) its prompt
+            wasted = sum(
+                self.calculate_cost(count_message_tokens(messages, models[i]), 0, models[i]) for i in losers
+            )
+            llm_hedge_wasted_cost_usd.inc(wasted)
+            await cost_budget.record(wasted, tenant)
+        return response, first_chunks, models[winner]
+    
+    @staticmethod
+    async def _chunks(first_chunks: List, response):
+        """Chunks already read while opening the stream, then the rest of it"""
+        for chunk in first_chunks:
+            yield chunk
+        async for chunk in response:
+            yield chunk
+    
     def create_system_prompt(self, rag_context: Optional[str] = None) -> str:
         """Create system prompt with RAG context"""
         base_prompt = """Sen kıdemli bir destek asistanı ve teknik çözümleyicisin. 
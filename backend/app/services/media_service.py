@@ -13,6 +13,7 @@ from openai import AsyncOpenAI
 from app.config import settings
 from app.core.logging import get_logger
 from app.services.storage_service import storage_service
+from app.services.circuit_breaker import get_circuit_breaker
 
 logger = get_logger(__name__)
 
@@ -52,7 +53,7 @@ class MediaService:
             # Check file size (25MB limit for Whisper API)
             max_size = 25 * 1024 * 1024  # 25MB
             if len(audio_data) > max_size:
-                logger.warning("Audio file too large", size=len(audio_data), max_size=max_size)
+                logger.warning(f"Audio file too large (size={len(audio_data)}, max_size={max_size})")
                 return None
             
             # Create file-like object
@@ -60,7 +61,8 @@ class MediaService:
             audio_file.name = file_name
             
             # Transcribe using Whisper API
-            transcript = await self.openai_client.audio.transcriptions.create(
+            transcript = await get_circuit_breaker("whisper:whisper-1").call(
+                self.openai_client.audio.transcriptions.create,
                 model="whisper-1",
                 file=audio_file,
                 language=language,  # Optional: specify language (e.g., 'tr' for Turkish, 'en' for English)
@@ -73,11 +75,11 @@ class MediaService:
                 'duration': getattr(transcript, 'duration', None)
             }
             
-            logger.info("Voice transcription completed", language=result['language'], text_length=len(result['text']))
+            logger.info(f"Voice transcription completed (language={result['language']}, text_length={len(result['text'])})")
             return result
         
         except Exception as e:
-            logger.error("Failed to process voice", file_name=file_name, error=str(e), exc_info=True)
+            logger.error(f"Failed to process voice (file_name={file_name}): {e}", exc_info=True)
             return None
     
     async def process_image(
@@ -108,15 +110,16 @@ class MediaService:
             
             # Validate format
             if format_name not in self.supported_image_formats:
-                logger.warning("Unsupported image format", format=format_name, file_name=file_name)
+                logger.warning(f"Unsupported image format (format={format_name}, file_name={file_name})")
                 return None
             
             # Resize if needed
             max_size = max_size or self.max_image_size
             if resize and (width > max_size[0] or height > max_size[1]):
+                original_width, original_height = width, height
                 image.thumbnail(max_size, Image.Resampling.LANCZOS)
                 width, height = image.size
-                logger.info("Image resized", original_size=(width, height), new_size=(width, height))
+                logger.info(f"Image resized from {original_width}x{original_height} to {width}x{height}")
             
             # Convert to RGB if necessary (for JPEG)
             if format_name == 'JPEG' and mode != 'RGB':
@@ -150,11 +153,11 @@ class MediaService:
                 'original_size': len(image_data)
             }
             
-            logger.info("Image processed successfully", file_name=file_name, dimensions=(width, height))
+            logger.info(f"Image processed successfully (file_name={file_name}, dimensions={width}x{height})")
             return result
         
         except Exception as e:
-            logger.error("Failed to process image", file_name=file_name, error=str(e), exc_info=True)
+            logger.error(f"Failed to process image (file_name={file_name}): {e}", exc_info=True)
             return None
     
     async def process_file(
@@ -177,7 +180,7 @@ class MediaService:
             # Validate file size
             max_size = settings.MAX_MEDIA_SIZE_MB * 1024 * 1024
             if len(file_data) > max_size:
-                logger.warning("File too large", size=len(file_data), max_size=max_size, file_name=file_name)
+                logger.warning(f"File too large (size={len(file_data)}, max_size={max_size}, file_name={file_name})")
                 return None
             
             # Determine folder based on content type
@@ -212,11 +215,11 @@ class MediaService:
                 'original_name': file_name
             }
             
-            logger.info("File processed successfully", file_name=file_name, size=len(file_data))
+            logger.info(f"File processed successfully (file_name={file_name}, size={len(file_data)})")
             return result
         
         except Exception as e:
-            logger.error("Failed to process file", file_name=file_name, error=str(e), exc_info=True)
+            logger.error(f"Failed to process file (file_name={file_name}): {e}", exc_info=True)
             return None
     
     def validate_file(self, file_name: str, file_size: int, content_type: Optional[str] = None) -> Tuple[bool, Optional[str]]:
@@ -0,0 +1,79 @@
+"""
+Model Router - Pick the LLM model per request from signals the orchestrator already has
+"""
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+from app.core.tokens import count_tokens
+from app.monitoring.prometheus import llm_route_total
+
+FAST = "fast"
+PREMIUM = "premium"
+
+# Price per 1M tokens (as of 2024); LLM_MODEL_PRICING overrides / extends it
+DEFAULT_PRICING = {
+    "gpt-4-turbo": {"prompt": 10.0, "completion": 30.0},
+    "gpt-4": {"prompt": 30.0, "completion": 60.0},
+    "gpt-4o": {"prompt": 5.0, "completion": 15.0},
+    "gpt-4o-mini": {"prompt": 0.15, "completion": 0.6},
+    "gpt-3.5-turbo": {"prompt": 0.5, "completion": 1.5},
+}
+MODEL_PRICING = {**DEFAULT_PRICING, **settings.LLM_MODEL_PRICING}
+
+
+def model_pricing(model: str) -> Dict[str, float]:
+    """Price per 1M prompt / completion tokens (unknown models are priced as gpt-4-turbo)"""
+    return MODEL_PRICING.get(model, MODEL_PRICING["gpt-4-turbo"])
+
+
+class ModelRouter:
+    """
+    Routes a turn to the fast or the premium model
+
+    Signals: tenant tier, rule confidence (a rule that nearly matched), RAG
+    hit and top score, and query length in tokens. Premium tenants and long
+    queries always get the premium model; greetings / one-liners, confident
+    RAG hits (the answer is in the context) and near rule matches get the
+    fast one; everything else (notably no RAG hit) goes to premium.
+    """
+
+    def __init__(self, fast_model: str = None, premium_model: str = None, enabled: bool = None):
+        self.fast_model = fast_model or settings.LLM_ROUTE_FAST_MODEL
+        self.premium_model = premium_model or settings.MODEL
+        self.enabled = settings.LLM_ROUTING_ENABLED if enabled is None else enabled
+
+    def route(
+        self,
+        query: str,
+        tenant: Optional[str] = None,
+        rule_confidence: float = 0.0,
+        rag_hit: bool = False,
+        top_score: float = 0.0,
+        query_tokens: Optional[int] = None
+    ) -> Tuple[str, str, str]:
+        """Returns (route, model, reason)"""
+        if not self.enabled:
+            return PREMIUM, self.premium_model, "routing_disabled"
+
+        query_tokens = count_tokens(query) if query_tokens is None else query_tokens
+        if tenant and tenant in settings.LLM_PREMIUM_TENANTS:
+            decision = (PREMIUM, "premium_tenant")
+        elif query_tokens > settings.LLM_ROUTE_LONG_QUERY_TOKENS:
+            decision = (PREMIUM, "long_query")
+        elif rag_hit and top_score >= settings.LLM_ROUTE_RAG_SCORE:
+            decision = (FAST, "confident_rag_hit")
+        elif rule_confidence >= settings.LLM_ROUTE_RULE_CONFIDENCE:
+            decision = (FAST, "near_rule_match")
+        elif not rag_hit and query_tokens <= settings.LLM_ROUTE_SHORT_QUERY_TOKENS:
+            decision = (FAST, "short_query")
+        elif rag_hit:
+            decision = (PREMIUM, "weak_rag_hit")
+        else:
+            decision = (PREMIUM, "no_rag_hit")
+
+        route, reason = decision
+        llm_route_total.labels(route=route, reason=reason).inc()
+        return route, self.fast_model if route == FAST else self.premium_model, reason
+
+
+model_router = ModelRouter()
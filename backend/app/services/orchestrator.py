@@ -1,18 +1,46 @@
 """
 Orchestrator Service - Rules → RAG → LLM Fallback
 """
-from typing import Dict, List, Optional
+from typing import AsyncGenerator, Awaitable, Dict, List, Optional
+import asyncio
+import time
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.rag_service import rag_service
 from app.services.llm_service import llm_service
 from app.services.rule_service import RuleService
-from app.core.database import get_db
+from app.services.semantic_cache import semantic_cache, get_kb_version
+from app.services.context_assembler import context_assembler
+from app.services.model_router import model_router
+from app.services.embedding_versions import get_active_embedding_model
+from app.config import settings
+from app.core.database import get_db, AsyncSessionLocal
 from app.core.security import PIIRedactor
+from app.core.tokens import count_tokens, split_tokens
 from app.core.logging import get_logger
+from app.monitoring.prometheus import chat_messages_total, observe_stage_timings, labelled
 
 logger = get_logger(__name__)
 
+# Rule matches at or above this confidence answer the message (and cancel the RAG work)
+RULE_CONFIDENCE_THRESHOLD = 0.9
+
+
+async def timed(timings: Dict[str, float], stage: str, awaitable: Awaitable):
+    """Await and record the stage duration in milliseconds"""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def cancel_tasks(*tasks: Optional[asyncio.Task]):
+    """Cancel speculative stage tasks that are still running"""
+    for task in tasks:
+        if task and not task.done():
+            task.cancel()
+
 
 class OrchestratorService:
     """Main orchestration service"""
@@ -29,135 +57,345 @@ class OrchestratorService:
         websocket=None,
         db: Optional[AsyncSession] = None,
         user_id: Optional[str] = None,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        chat_id: Optional[str] = None
     ) -> Dict:
         """
         Process message through: Rules → RAG → LLM
         Returns: {text: str, sources: List, context: Dict}
         """
         try:
-            # Redact PII
-            redacted_text = PIIRedactor.redact_text(text)
+            response = {"text": "", "sources": [], "context": {}}
+            async for event in self.stream_message(
+                text, room_key, db=db, user_id=user_id, metadata=metadata, chat_id=chat_id
+            ):
+                if event["type"] == "done":
+                    response = event["data"]
+            return response
+        except Exception as e:
+            logger.error(f"Orchestrator process_message error (room_key={room_key}): {e}", exc_info=True)
+            # Final fallback
+            return {
+                "text": "Üzgünüm, şu anda sistemde bir sorun var. Lütfen daha sonra tekrar deneyin veya operatöre başvurun.",
+                "sources": [],
+                "context": {"source": "error_fallback"}
+            }
+    
+    async def stream_message(
+        self,
+        text: str,
+        room_key: str,
+        db: Optional[AsyncSession] = None,
+        user_id: Optional[str] = None,
+        metadata: Optional[Dict] = None,
+        chat_id: Optional[str] = None
+    ) -> AsyncGenerator[Dict, None]:
+        """
+        Stream a reply through: Rules → RAG → LLM
+        With a chat_id, earlier turns of the chat (window + rolling summary) are
+        part of the LLM prompt and the exchange is added to them afterwards.
+        Yields:
+            {"type": "start", "data": {"sources": [...], "context": {...}}}  once, before any text
+            {"type": "delta", "data": str}                                   text as it is generated
+            {"type": "done", "data": {"text": str, "sources": [...], "context": {...}}}
+        """
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        labelled(chat_messages_total, "user").inc()
+        # Redact PII
+        redacted_text = PIIRedactor.redact_text(text)
+        # Oversized messages are cut before they reach embeddings or the LLM
+        if count_tokens(redacted_text) > settings.LLM_MAX_INPUT_TOKENS:
+            redacted_text = split_tokens(redacted_text, settings.LLM_MAX_INPUT_TOKENS)[0]
+            logger.info(f"User message truncated (max_tokens={settings.LLM_MAX_INPUT_TOKENS}, room_key={room_key})")
+        timings["redaction"] = round((time.perf_counter() - start) * 1000, 2)
+        
+        history = []
+        if chat_id:
+            try:
+                history = await timed(timings, "context", context_assembler.assemble(chat_id, redacted_text, db))
+            except Exception as e:
+                logger.warning(f"Context assembly error (chat_id={chat_id}): {e}")
+        
+        done = None
+        async for event in self._stream_reply(redacted_text, room_key, db, history, timings):
+            if event["type"] == "delta" and "first_token" not in timings:
+                timings["first_token"] = round((time.perf_counter() - start) * 1000, 2)
+            elif event["type"] == "done":
+                timings["total"] = round((time.perf_counter() - start) * 1000, 2)
+                event["data"]["context"]["timings"] = timings
+                logger.info(
+                    f"Orchestrator stage timings (room_key={room_key}): "
+                    + ", ".join(f"{stage}={ms}ms" for stage, ms in timings.items())
+                )
+                labelled(chat_messages_total, "assistant").inc()
+                observe_stage_timings(timings, event["data"]["context"].get("source", "unknown"), room_key)
+                done = event["data"]
+            yield event
+        
+        if chat_id and done and done["context"].get("source") != "error":
+            try:
+                await context_assembler.record_turn(chat_id, redacted_text, done["text"], tenant=room_key, db=db)
+            except Exception as e:
+                logger.warning(f"Context update error (chat_id={chat_id}): {e}")
+    
+    async def _stream_reply(
+        self,
+        redacted_text: str,
+        room_key: str,
+        db: Optional[AsyncSession],
+        history: List[Dict[str, str]],
+        timings: Dict[str, float]
+    ) -> AsyncGenerator[Dict, None]:
+        """
+        Events of stream_message for an already redacted message
+        
+        The query embedding (and, in sequential retrieval mode, the keyword
+        search on its own session) start speculatively alongside rule
+        matching; a confident rule match cancels them.
+        """
+        started = False
+        rule_confidence = 0.0
+        embedding_task, keyword_task = None, None
+        try:
+            embedding_model = await get_active_embedding_model(db) if db else settings.RAG_EMBEDDING_MODEL
+            if db and settings.ORCHESTRATOR_CONCURRENT_STAGES:
+                embedding_task = asyncio.create_task(
+                    timed(timings, "embedding", self.rag_service.get_embedding(redacted_text, embedding_model))
+                )
+                if self.rag_service.retrieval_mode != "fused":
+                    keyword_task = asyncio.create_task(
+                        timed(timings, "keyword_search", self._keyword_search(redacted_text, embedding_model))
+                    )
             
             # Step 1: Check rules
             try:
-                rule_result = await self.rule_service.match_rule(redacted_text, db=db)
-                if rule_result and rule_result.get("confidence", 0) >= 0.9:
-                    logger.info("Rule matched", rule_id=rule_result.get("rule_id"), room_key=room_key)
-                    return {
-                        "text": rule_result.get("response", ""),
-                        "sources": [],
-                        "context": {"source": "rule", "rule_id": rule_result.get("rule_id")}
-                    }
+                rule_result = await timed(timings, "rules", self.rule_service.match_rule(redacted_text, db=db))
+                rule_confidence = rule_result.get("confidence", 0) if rule_result else 0.0
+                if rule_result and rule_result.get("confidence", 0) >= RULE_CONFIDENCE_THRESHOLD:
+                    logger.info(f"Rule matched (rule_id={rule_result.get('rule_id')}, room_key={room_key})")
+                    cancel_tasks(embedding_task, keyword_task)
+                    started = True
+                    async for event in self._reply(
+                        rule_result.get("response", ""),
+                        [],
+                        {"source": "rule", "rule_id": rule_result.get("rule_id")}
+                    ):
+                        yield event
+                    return
             except Exception as e:
-                logger.warning("Rule matching error", error=str(e), exc_info=True)
+                if started:
+                    raise
+                logger.warning(f"Rule matching error: {e}", exc_info=True)
                 # Continue to RAG/LLM if rule matching fails
             
-            # Step 2: RAG search
+            # Query embedding (shared by the semantic cache and RAG search)
+            embedding = None
             try:
-                rag_documents, hit_rate = await self.rag_service.search(
+                if embedding_task:
+                    embedding = await embedding_task
+                elif db:
+                    embedding = await timed(
+                        timings, "embedding", self.rag_service.get_embedding(redacted_text, embedding_model)
+                    )
+            except Exception as e:
+                logger.warning(f"Query embedding error: {e}")
+            
+            # Step 2: Semantic answer cache (paraphrases of questions already answered from the KB);
+            # follow-up questions depend on the conversation, so only first messages use it
+            cache_query, cache_hit = None, None
+            if db and settings.LLM_SEMANTIC_CACHE_ENABLED and not history and embedding:
+                try:
+                    cache_query = (embedding, embedding_model, await get_kb_version())
+                    cache_hit = await timed(
+                        timings, "semantic_cache", semantic_cache.lookup(db, room_key, *cache_query)
+                    )
+                except Exception as e:
+                    logger.warning(f"Semantic cache lookup error: {e}")
+            
+            if cache_hit:
+                logger.info(f"Semantic cache hit (similarity={cache_hit['similarity']:.3f}, room_key={room_key})")
+                cancel_tasks(keyword_task)
+                started = True
+                async for event in self._reply(
+                    cache_hit["answer"],
+                    cache_hit["sources"],
+                    {"source": "semantic_cache", "similarity": cache_hit["similarity"]}
+                ):
+                    yield event
+                return
+            
+            # Step 3: RAG search
+            rag_documents, hit_rate = [], False
+            try:
+                keyword_results = None
+                if keyword_task:
+                    try:
+                        keyword_results = await keyword_task
+                    except Exception as e:
+                        logger.warning(f"Speculative keyword search error: {e}")
+                rag_documents, hit_rate = await timed(timings, "rag_search", self.rag_service.search(
                     query=redacted_text,
                     context={"room_key": room_key},
-                    db=db
-                )
-                
-                if hit_rate and rag_documents:
-                    # RAG hit - generate response with context
-                    context_string = await self.rag_service.get_context_string(rag_documents)
-                    system_prompt = self.llm_service.create_system_prompt(context_string)
-                    
-                    messages = [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": redacted_text}
-                    ]
-                    
-                    # Call LLM with RAG context
-                    response_text = ""
-                    error_occurred = False
-                    async for chunk in self.llm_service.call_llm(
-                        messages=messages,
-                        temperature=0.2,
-                        stream=True,
-                        db=db
-                    ):
-                        if chunk.get("type") == "text":
-                            response_text += chunk.get("data", "")
-                        elif chunk.get("type") == "end":
-                            break
-                        elif chunk.get("type") == "error":
-                            error_occurred = True
-                            logger.error("LLM error in RAG context", error=chunk.get("data", {}).get("message"))
-                            break
-                    
-                    if error_occurred or not response_text:
-                        # Fallback message if LLM fails
-                        response_text = "RAG sonuçları bulundu ancak yanıt oluşturulamadı. Lütfen operatöre yönlendiriliyorsunuz."
-                    
-                    logger.info("RAG hit", documents=len(rag_documents), hit_rate=hit_rate, room_key=room_key)
-                    return {
-                        "text": response_text,
-                        "sources": [
-                            {
-                                "title": doc.get("name"),
-                                "url": doc.get("source"),
-                                "score": doc.get("score")
-                            }
-                            for doc in rag_documents
-                        ],
-                        "context": {"source": "rag", "hit_rate": hit_rate}
-                    }
+                    db=db,
+                    query_embedding=embedding,
+                    embedding_model=embedding_model,
+                    keyword_results=keyword_results
+                ))
             except Exception as e:
-                logger.error("RAG search error", error=str(e), room_key=room_key, exc_info=True)
+                logger.error(f"RAG search error (room_key={room_key}): {e}", exc_info=True)
                 # Continue to LLM fallback if RAG fails
             
-            # Step 3: LLM fallback (no RAG hit or RAG failed)
-            try:
-                system_prompt = self.llm_service.create_system_prompt()
+            if hit_rate and rag_documents:
+                # RAG hit - generate response with context
+                context_string = await self.rag_service.get_context_string(rag_documents)
+                system_prompt = self.llm_service.create_system_prompt(context_string)
                 messages = [
                     {"role": "system", "content": system_prompt},
+                    *history,
                     {"role": "user", "content": redacted_text}
                 ]
+                sources = [
+                    {
+                        "title": doc.get("name"),
+                        "url": doc.get("source"),
+                        "score": doc.get("score")
+                    }
+                    for doc in rag_documents
+                ]
                 
-                response_text = ""
-                error_occurred = False
-                async for chunk in self.llm_service.call_llm(
-                    messages=messages,
-                    temperature=0.2,
-                    stream=True,
-                    db=db
-                ):
-                    if chunk.get("type") == "text":
-                        response_text += chunk.get("data", "")
-                    elif chunk.get("type") == "end":
-                        break
-                    elif chunk.get("type") == "error":
-                        error_occurred = True
-                        logger.error("LLM error in fallback", error=chunk.get("data", {}).get("message"))
-                        break
+                route, model, reason = model_router.route(
+                    redacted_text,
+                    tenant=room_key,
+                    rule_confidence=rule_confidence,
+                    rag_hit=True,
+                    top_score=max(doc.get("score") or 0.0 for doc in rag_documents)
+                )
                 
-                if error_occurred or not response_text:
-                    response_text = "Üzgünüm, şu anda yanıt veremiyorum. Lütfen operatöre yönlendiriyorum."
+                # Fallback message if LLM fails
+                fallback_text = "RAG sonuçları bulundu ancak yanıt oluşturulamadı. Lütfen operatöre yönlendiriliyorsunuz."
+                started = True
+                done = None
+                async for event in self._stream_llm(
+                    messages,
+                    sources,
+                    {"source": "rag", "hit_rate": hit_rate, "route": route},
+                    fallback_text,
+                    db,
+                    tenant=room_key,
+                    model=model,
+                    route=route
+                ):
+                    if event["type"] == "done":
+                        done = event["data"]
+                    yield event
+                logger.info(f"RAG hit (documents={len(rag_documents)}, hit_rate={hit_rate}, model={model}, route_reason={reason}, room_key={room_key})")
                 
-                logger.info("LLM fallback used", room_key=room_key, has_response=bool(response_text))
-                return {
-                    "text": response_text,
-                    "sources": [],
-                    "context": {"source": "llm_fallback", "rag_hit": False}
-                }
-            except Exception as e:
-                logger.error("LLM fallback error", error=str(e), room_key=room_key, exc_info=True)
-                # Final fallback
-                return {
-                    "text": "Üzgünüm, şu anda sistemde bir sorun var. Lütfen daha sonra tekrar deneyin veya operatöre başvurun.",
-                    "sources": [],
-                    "context": {"source": "error_fallback"}
-                }
+                # Only complete generated answers are reused
+                if (cache_query and done and done["text"] != fallback_text
+                        and not done["context"].get("incomplete")):
+                    await semantic_cache.store(db, room_key, redacted_text, *cache_query, done["text"], sources)
+                return
+            
+            # Step 4: LLM fallback (no RAG hit or RAG failed)
+            system_prompt = self.llm_service.create_system_prompt()
+            messages = [
+                {"role": "system", "content": system_prompt},
+                *history,
+                {"role": "user", "content": redacted_text}
+            ]
+            
+            route, model, reason = model_router.route(
+                redacted_text,
+                tenant=room_key,
+                rule_confidence=rule_confidence,
+                rag_hit=False
+            )
+            
+            started = True
+            async for event in self._stream_llm(
+                messages,
+                [],
+                {"source": "llm_fallback", "rag_hit": False, "route": route},
+                "Üzgünüm, şu anda yanıt veremiyorum. Lütfen operatöre yönlendiriyorum.",
+                db,
+                tenant=room_key,
+                model=model,
+                route=route
+            ):
+                yield event
+            logger.info(f"LLM fallback used (model={model}, route_reason={reason}, room_key={room_key})")
         
         except Exception as e:
-            logger.error("Orchestrator process_message error", error=str(e), room_key=room_key, exc_info=True)
-            return {
-                "text": "Üzgünüm, bir hata oluştu. Lütfen daha sonra tekrar deneyin.",
-                "sources": [],
-                "context": {"source": "error"}
-            }
-
+            logger.error(f"Orchestrator stream_message error (room_key={room_key}): {e}", exc_info=True)
+            if not started:
+                async for event in self._reply(
+                    "Üzgünüm, bir hata oluştu. Lütfen daha sonra tekrar deneyin.",
+                    [],
+                    {"source": "error"}
+                ):
+                    yield event
+            else:
+                raise
+        finally:
+            # Speculative work left unused (e.g. the stream was closed early)
+            cancel_tasks(embedding_task, keyword_task)
+    
+    async def _keyword_search(self, query: str, embedding_model: str):
+        """Keyword search on its own session, so it can run alongside the request session"""
+        async with AsyncSessionLocal() as session:
+            return await self.rag_service.keyword_search(
+                query, limit=10, db=session, embedding_model=embedding_model
+            )
+    
+    async def _reply(self, text: str, sources: List[Dict], context: Dict) -> AsyncGenerator[Dict, None]:
+        """Events for a reply that is already complete"""
+        yield {"type": "start", "data": {"sources": sources, "context": context}}
+        yield {"type": "delta", "data": text}
+        yield {"type": "done", "data": {"text": text, "sources": sources, "context": context}}
+    
+    async def _stream_llm(
+        self,
+        messages: List[Dict[str, str]],
+        sources: List[Dict],
+        context: Dict,
+        fallback_text: str,
+        db: Optional[AsyncSession],
+        tenant: Optional[str] = None,
+        model: Optional[str] = None,
+        route: Optional[str] = None
+    ) -> AsyncGenerator[Dict, None]:
+        """Events for an LLM reply, forwarding text deltas as they arrive"""
+        yield {"type": "start", "data": {"sources": sources, "context": context}}
+        
+        response_text = ""
+        error_occurred = False
+        async for chunk in self.llm_service.call_llm(
+            messages=messages,
+            temperature=0.2,
+            stream=True,
+            db=db,
+            tenant=tenant,
+            model=model,
+            route=route
+        ):
+            if chunk.get("type") == "text":
+                delta = chunk.get("data", "")
+                if delta:
+                    response_text += delta
+                    yield {"type": "delta", "data": delta}
+            elif chunk.get("type") == "end":
+                break
+            elif chunk.get("type") == "error":
+                error_occurred = True
+                logger.error(f"LLM error (source={context.get('source')}): {chunk.get('data', {}).get('message')}")
+                break
+        
+        if not response_text:
+            response_text = fallback_text
+            yield {"type": "delta", "data": fallback_text}
+        elif error_occurred:
+            # Text already sent cannot be retracted; flag the reply as cut short
+            context = {**context, "incomplete": True}
+        
+        yield {"type": "done", "data": {"text": response_text, "sources": sources, "context": context}}
@@ -6,17 +6,27 @@ from datetime import datetime
 import time
 import re
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, text
+from sqlalchemy import select, text, bindparam
 from openai import AsyncOpenAI
+from pgvector.sqlalchemy import Vector
 
 from app.config import settings
-from app.models.kb_document import KBDocument, DocumentStatus
-from app.models.rag_metrics import RAGMetrics
 from app.core.database import get_db
 from app.core.logging import get_logger
+from app.services.language import detect_language, get_text_search_config
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_versions import get_active_embedding_model
+from app.services.circuit_breaker import get_circuit_breaker
+from app.services.telemetry import telemetry_writer
+from app.core.tokens import count_tokens, split_tokens
+from app.monitoring.prometheus import rag_requests_total, rag_response_time, rag_hit_rate, labelled
 
 logger = get_logger(__name__)
 
+# Joins the matched chunks of a document in search results and LLM context
+CHUNK_SEPARATOR = "\n...\n"
+
 
 class HybridRAGService:
     """Hybrid RAG System with Semantic + Keyword Search"""
@@ -27,86 +37,136 @@ class HybridRAGService:
         self.max_documents = settings.RAG_MAX_DOCUMENTS
         self.semantic_weight = settings.RAG_HYBRID_WEIGHTS["semantic"]
         self.keyword_weight = settings.RAG_HYBRID_WEIGHTS["keyword"]
+        self.max_chunks_per_document = settings.RAG_MAX_CHUNKS_PER_DOCUMENT
+        self.retrieval_mode = settings.RAG_RETRIEVAL_MODE
+        self.embedding_batcher = EmbeddingBatcher(self.get_embeddings)
+        # Searches / hits in this process, for the rag_hit_rate gauge
+        self._searches = 0
+        self._hits = 0
+    
+    def _observe(self, status: str, start_time: float):
+        """Record a search in the RAG Prometheus metrics (status: hit, miss, error)"""
+        labelled(rag_requests_total, status).inc()
+        rag_response_time.observe(time.time() - start_time)
+        if status != "error":
+            self._searches += 1
+            self._hits += status == "hit"
+            rag_hit_rate.set(self._hits / self._searches)
     
-    async def get_embedding(self, text: str) -> List[float]:
-        """Get embedding vector for text"""
+    async def get_embedding(self, text: str, model: Optional[str] = None) -> List[float]:
+        """Get embedding vector for text (served from the embedding cache when possible)"""
+        model = model or settings.RAG_EMBEDDING_MODEL
         try:
-            logger.debug("Generating embedding", model=settings.RAG_EMBEDDING_MODEL, text_length=len(text))
-            response = await self.openai_client.embeddings.create(
-                model=settings.RAG_EMBEDDING_MODEL,
-                input=text
-            )
-            embedding = response.data[0].embedding
-            logger.debug("Embedding generated", dimensions=len(embedding))
+            cached = await embedding_cache.get(text, model)
+            if cached is not None:
+                return cached
+            
+            logger.debug(f"Generating embedding (model={model}, text_length={len(text)})")
+            # Concurrent callers are coalesced into one batched API request
+            embedding = await self.embedding_batcher.embed(text, model)
+            logger.debug(f"Embedding generated (dimensions={len(embedding)})")
+            await embedding_cache.set(text, embedding, model)
             return embedding
         except Exception as e:
-            logger.error("Error generating embedding", error=str(e), exc_info=True)
+            logger.error(f"Error generating embedding: {e}", exc_info=True)
             return []
     
+    async def get_embeddings(self, texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+        """Get embedding vectors for several texts in one API call"""
+        if not texts:
+            return []
+        model = model or settings.RAG_EMBEDDING_MODEL
+        logger.debug(f"Generating embeddings (model={model}, count={len(texts)})")
+        extra_body = None
+        if model.startswith("text-embedding-3"):
+            # v3 models can shorten their output to the stored vector(N) size
+            extra_body = {"dimensions": settings.RAG_EMBEDDING_DIMENSIONS}
+        response = await get_circuit_breaker(f"embedding:{model}").call(
+            self.openai_client.embeddings.create,
+            model=model,
+            input=texts,
+            extra_body=extra_body
+        )
+        # API returns items with an index; keep the input order
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    
+    def _group_by_document(self, rows, score_column: str, limit: int) -> List[Tuple[Dict, float]]:
+        """
+        Group chunk rows (sorted by score, best first) back to their documents
+        Document score is its best chunk score
+        """
+        documents: Dict[str, Tuple[Dict, float]] = {}
+        for row in rows:
+            score = float(getattr(row, score_column) or 0.0)
+            doc_id = str(row.document_id)
+            if doc_id not in documents:
+                documents[doc_id] = ({
+                    "id": doc_id,
+                    "name": row.name,
+                    "source": row.source,
+                    "metadata": row.metadata or {},
+                    "chunks": []
+                }, score)
+            doc, _ = documents[doc_id]
+            if len(doc["chunks"]) < self.max_chunks_per_document:
+                doc["chunks"].append({
+                    "id": str(row.chunk_id),
+                    "index": row.chunk_index,
+                    "content": row.content,
+                    "score": score
+                })
+        return list(documents.values())[:limit]
+    
     async def semantic_search(
         self,
         query_embedding: List[float],
         limit: int = 10,
         filters: Optional[Dict] = None,
-        db: AsyncSession = None
-    ) -> List[Tuple[KBDocument, float]]:
-        """Semantic search using pgvector cosine similarity"""
+        db: AsyncSession = None,
+        embedding_model: Optional[str] = None
+    ) -> List[Tuple[Dict, float]]:
+        """Semantic search over document chunks using pgvector cosine similarity"""
         if not db or not query_embedding:
             return []
         
         try:
-            # Convert embedding to PostgreSQL array format
-            # Note: pgvector requires vector type, but we store as ARRAY
-            # We'll cast ARRAY to vector in the query
-            embedding_array = query_embedding
-            
-            # Use raw SQL for pgvector similarity search
+            # Only chunks of the query's embedding version are comparable
+            embedding_model = embedding_model or await get_active_embedding_model(db)
             # Cosine distance operator: <=> (returns 0-2, where 0 = identical)
             # Convert distance to similarity: 1 - (distance / 2)
-            # Since we store as ARRAY, we need to cast to vector for pgvector operations
+            # The inner ORDER BY must be the bare `embedding <=> :embedding` expression
+            # so the HNSW index (idx_kb_chunks_embedding) can serve it
             sql_query = text("""
                 SELECT 
-                    id, name, source, content, size, status, 
-                    metadata, created_at, updated_at,
-                    1 - ((embedding::vector <=> :embedding::vector) / 2.0) as similarity
-                FROM kb_documents
-                WHERE status = 'indexed' 
-                AND embedding IS NOT NULL
-                AND array_length(embedding, 1) > 0
-                ORDER BY embedding::vector <=> :embedding::vector
-                LIMIT :limit
-            """)
-            
-            # Convert embedding to string format for PostgreSQL
-            embedding_str = "[" + ",".join(map(str, embedding_array)) + "]"
+                    c.id AS chunk_id, c.document_id, c.chunk_index, c.content,
+                    d.name, d.source, d.metadata,
+                    1 - (c.distance / 2.0) AS similarity
+                FROM (
+                    SELECT id, document_id, chunk_index, content,
+                           embedding <=> :embedding AS distance
+                    FROM kb_chunks
+                    WHERE embedding IS NOT NULL AND embedding_model = :embedding_model
+                    ORDER BY embedding <=> :embedding
+                    LIMIT :chunk_limit
+                ) c
+                JOIN kb_documents d ON d.id = c.document_id
+                ORDER BY c.distance
+            """).bindparams(
+                bindparam("embedding", type_=Vector(settings.RAG_EMBEDDING_DIMENSIONS))
+            )
             
             result = await db.execute(
                 sql_query,
                 {
-                    "embedding": embedding_str,
-                    "limit": limit
+                    "embedding": query_embedding,
+                    "embedding_model": embedding_model,
+                    "chunk_limit": limit * self.max_chunks_per_document
                 }
             )
             
-            documents = []
-            for row in result:
-                doc = KBDocument(
-                    id=row.id,
-                    name=row.name,
-                    source=row.source,
-                    content=row.content,
-                    size=row.size,
-                    status=DocumentStatus.INDEXED,
-                    metadata=row.metadata,
-                    created_at=row.created_at,
-                    updated_at=row.updated_at
-                )
-                similarity = float(row.similarity) if row.similarity else 0.0
-                documents.append((doc, similarity))
-            
-            return documents
+            return self._group_by_document(result, "similarity", limit)
         except Exception as e:
-            logger.error("Semantic search error", error=str(e), exc_info=True)
+            logger.error(f"Semantic search error: {e}", exc_info=True)
             return []
     
     async def keyword_search(
@@ -114,84 +174,180 @@ class HybridRAGService:
         query: str,
         limit: int = 10,
         filters: Optional[Dict] = None,
-        db: AsyncSession = None
-    ) -> List[Tuple[KBDocument, float]]:
-        """Keyword search using PostgreSQL full-text search (BM25-like)"""
+        db: AsyncSession = None,
+        embedding_model: Optional[str] = None
+    ) -> List[Tuple[Dict, float]]:
+        """Keyword search over document chunks using PostgreSQL full-text search (BM25-like)"""
         if not db or not query:
             return []
         
         try:
-            # Use PostgreSQL full-text search
+            # Each embedding version has its own copy of the chunks; search one of them
+            embedding_model = embedding_model or await get_active_embedding_model(db)
+            # search_vector is a stored, per-language tsvector with a GIN index
+            # (idx_kb_chunks_search_vector); the query is parsed with the config
+            # of its own detected language so stems line up with the documents
+            search_config = get_text_search_config(detect_language(query))
             sql_query = text("""
                 SELECT 
-                    id, name, source, content, size, status, 
-                    metadata, created_at, updated_at,
-                    ts_rank(
-                        to_tsvector('english', COALESCE(content, '')),
-                        plainto_tsquery('english', :query)
-                    ) as score
-                FROM kb_documents
-                WHERE status = 'indexed'
-                AND to_tsvector('english', COALESCE(content, '')) @@ plainto_tsquery('english', :query)
+                    c.id AS chunk_id, c.document_id, c.chunk_index, c.content,
+                    d.name, d.source, d.metadata,
+                    ts_rank(c.search_vector, q.query) AS score
+                FROM kb_chunks c
+                JOIN kb_documents d ON d.id = c.document_id,
+                     websearch_to_tsquery(CAST(:config AS regconfig), :query) AS q(query)
+                WHERE c.search_vector @@ q.query AND c.embedding_model = :embedding_model
                 ORDER BY score DESC
-                LIMIT :limit
+                LIMIT :chunk_limit
             """)
             
             result = await db.execute(
                 sql_query,
                 {
                     "query": query,
-                    "limit": limit
+                    "config": search_config,
+                    "embedding_model": embedding_model,
+                    "chunk_limit": limit * self.max_chunks_per_document
                 }
             )
             
-            documents = []
-            for row in result:
-                doc = KBDocument(
-                    id=row.id,
-                    name=row.name,
-                    source=row.source,
-                    content=row.content,
-                    size=row.size,
-                    status=DocumentStatus.INDEXED,
-                    metadata=row.metadata,
-                    created_at=row.created_at,
-                    updated_at=row.updated_at
+            # Normalize score to 0-1 range
+            # ts_rank typically returns 0-10, normalize to 0-1
+            return [
+                (doc, min(1.0, score / 10.0))
+                for doc, score in self._group_by_document(result, "score", limit)
+            ]
+        except Exception as e:
+            logger.error(f"Keyword search error: {e}", exc_info=True)
+            return []
+    
+    async def fused_search(
+        self,
+        query: str,
+        query_embedding: List[float],
+        limit: int = 5,
+        db: AsyncSession = None,
+        embedding_model: Optional[str] = None
+    ) -> List[Tuple[Dict, float]]:
+        """
+        Hybrid search in a single round-trip with reciprocal-rank fusion (RRF)
+        
+        Semantic and keyword candidates are computed as CTEs and fused server-side:
+            score = w_semantic / (k + rank_semantic) + w_keyword / (k + rank_keyword)
+        normalized so a chunk ranked first by both searches scores 1.0.
+        Only ids, scores and a bounded snippet per chunk leave the database.
+        """
+        if not db or not query_embedding:
+            return []
+        
+        try:
+            embedding_model = embedding_model or await get_active_embedding_model(db)
+            sql_query = text("""
+                WITH params AS (
+                    SELECT 
+                        CAST(:semantic_weight AS float8) AS semantic_weight,
+                        CAST(:keyword_weight AS float8) AS keyword_weight,
+                        CAST(:rrf_k AS float8) AS rrf_k
+                ),
+                semantic AS (
+                    SELECT id, document_id, similarity,
+                           row_number() OVER (ORDER BY similarity DESC) AS rank
+                    FROM (
+                        SELECT id, document_id,
+                               1 - ((embedding <=> :embedding) / 2.0) AS similarity
+                        FROM kb_chunks
+                        WHERE embedding IS NOT NULL AND embedding_model = :embedding_model
+                        ORDER BY embedding <=> :embedding
+                        LIMIT :candidates
+                    ) nearest
+                    WHERE similarity >= :min_similarity
+                ),
+                keyword AS (
+                    SELECT id, document_id,
+                           row_number() OVER (ORDER BY ts_rank(search_vector, q.query) DESC) AS rank
+                    FROM kb_chunks, websearch_to_tsquery(CAST(:config AS regconfig), :query) AS q(query)
+                    WHERE search_vector @@ q.query AND embedding_model = :embedding_model
+                    ORDER BY ts_rank(search_vector, q.query) DESC
+                    LIMIT :candidates
+                ),
+                fused AS (
+                    SELECT 
+                        COALESCE(s.id, k.id) AS chunk_id,
+                        COALESCE(s.document_id, k.document_id) AS document_id,
+                        (
+                            COALESCE(p.semantic_weight / (p.rrf_k + s.rank), 0) +
+                            COALESCE(p.keyword_weight / (p.rrf_k + k.rank), 0)
+                        ) / ((p.semantic_weight + p.keyword_weight) / (p.rrf_k + 1)) AS score
+                    FROM semantic s
+                    FULL OUTER JOIN keyword k ON k.id = s.id
+                    CROSS JOIN params p
+                ),
+                ranked AS (
+                    SELECT chunk_id, document_id, score,
+                           row_number() OVER (PARTITION BY document_id ORDER BY score DESC) AS chunk_rank,
+                           max(score) OVER (PARTITION BY document_id) AS document_score
+                    FROM fused
                 )
-                # Normalize score to 0-1 range
-                # ts_rank typically returns 0-10, normalize to 0-1
-                score = float(row.score) if row.score else 0.0
-                score = min(1.0, score / 10.0)  # Normalize
-                documents.append((doc, score))
+                SELECT 
+                    r.chunk_id, r.document_id, c.chunk_index,
+                    left(c.content, :snippet_chars) AS content,
+                    d.name, d.source, d.metadata,
+                    r.score
+                FROM ranked r
+                JOIN kb_chunks c ON c.id = r.chunk_id
+                JOIN kb_documents d ON d.id = r.document_id
+                WHERE r.chunk_rank <= :chunks_per_document
+                ORDER BY r.document_score DESC, r.score DESC
+            """).bindparams(
+                bindparam("embedding", type_=Vector(settings.RAG_EMBEDDING_DIMENSIONS))
+            )
+            
+            result = await db.execute(
+                sql_query,
+                {
+                    "embedding": query_embedding,
+                    "embedding_model": embedding_model,
+                    "query": query,
+                    "config": get_text_search_config(detect_language(query)),
+                    "candidates": settings.RAG_FUSION_CANDIDATES,
+                    "min_similarity": self.min_similarity,
+                    "semantic_weight": self.semantic_weight,
+                    "keyword_weight": self.keyword_weight,
+                    "rrf_k": settings.RAG_RRF_K,
+                    "snippet_chars": settings.RAG_SNIPPET_CHARS,
+                    "chunks_per_document": self.max_chunks_per_document
+                }
+            )
             
-            return documents
+            return self._group_by_document(result, "score", limit)
         except Exception as e:
-            logger.error("Keyword search error", error=str(e), exc_info=True)
+            logger.error(f"Fused search error: {e}", exc_info=True)
             return []
     
     def hybrid_score(
         self,
-        semantic_results: List[Tuple[KBDocument, float]],
-        keyword_results: List[Tuple[KBDocument, float]]
-    ) -> List[Tuple[KBDocument, float]]:
+        semantic_results: List[Tuple[Dict, float]],
+        keyword_results: List[Tuple[Dict, float]]
+    ) -> List[Tuple[Dict, float]]:
         """Combine semantic and keyword results with weighted scoring"""
-        doc_scores: Dict[str, Tuple[KBDocument, float]] = {}
-        
-        # Add semantic results (score is already similarity 0-1)
-        for doc, score in semantic_results:
-            doc_id = str(doc.id)
-            if doc_id not in doc_scores:
-                doc_scores[doc_id] = (doc, 0.0)
-            current_doc, current_score = doc_scores[doc_id]
-            doc_scores[doc_id] = (doc, current_score + score * self.semantic_weight)
+        doc_scores: Dict[str, Tuple[Dict, float]] = {}
         
-        # Add keyword results (score is normalized to 0-1)
-        for doc, score in keyword_results:
-            doc_id = str(doc.id)
-            if doc_id not in doc_scores:
-                doc_scores[doc_id] = (doc, 0.0)
-            current_doc, current_score = doc_scores[doc_id]
-            doc_scores[doc_id] = (doc, current_score + score * self.keyword_weight)
+        for results, weight in (
+            (semantic_results, self.semantic_weight),  # score is already similarity 0-1
+            (keyword_results, self.keyword_weight),  # score is normalized to 0-1
+        ):
+            for doc, score in results:
+                doc_id = doc["id"]
+                if doc_id not in doc_scores:
+                    doc_scores[doc_id] = (doc, 0.0)
+                current_doc, current_score = doc_scores[doc_id]
+                if current_doc is not doc:
+                    # Same document found by both searches: merge matched passages
+                    seen = {chunk["id"] for chunk in current_doc["chunks"]}
+                    current_doc["chunks"].extend(
+                        chunk for chunk in doc["chunks"] if chunk["id"] not in seen
+                    )
+                doc_scores[doc_id] = (current_doc, current_score + score * weight)
         
         # Sort by score and return
         results = sorted(doc_scores.values(), key=lambda x: x[1], reverse=True)
@@ -201,98 +357,148 @@ class HybridRAGService:
         self,
         query: str,
         context: Optional[Dict] = None,
-        db: AsyncSession = None
+        db: AsyncSession = None,
+        query_embedding: Optional[List[float]] = None,
+        embedding_model: Optional[str] = None,
+        keyword_results: Optional[List[Tuple[Dict, float]]] = None
     ) -> Tuple[List[Dict], bool]:
         """
         Hybrid RAG search
+        query_embedding (with its embedding_model) and, in sequential mode,
+        keyword_results may already have been computed by the caller.
         Returns: (documents, hit_rate)
         """
         start_time = time.time()
         
         try:
-            logger.info("RAG search started", query=query[:100], room_key=context.get("room_key") if context else None)
+            room_key = context.get("room_key") if context else None
+            logger.info(f"RAG search started (query={query[:100]!r}, room_key={room_key})")
             
-            # Get query embedding
-            query_embedding = await self.get_embedding(query)
+            # Get query embedding with the active embedding version
+            if query_embedding is None:
+                embedding_model = await get_active_embedding_model(db) if db else settings.RAG_EMBEDDING_MODEL
+                query_embedding = await self.get_embedding(query, embedding_model)
             
             if not query_embedding:
                 logger.warning("Failed to generate embedding for query")
+                self._observe("error", start_time)
                 return [], False
             
-            # Semantic search
-            semantic_results = await self.semantic_search(
-                query_embedding, 
-                limit=10,
-                db=db
-            )
-            
-            # Keyword search
-            keyword_results = await self.keyword_search(
-                query, 
-                limit=10,
-                db=db
-            )
-            
-            # Hybrid scoring
-            combined_results = self.hybrid_score(semantic_results, keyword_results)
-            
-            # Apply threshold
-            filtered_results = [
-                (doc, score) for doc, score in combined_results
-                if score >= self.min_similarity
-            ]
-            
-            # Limit results
-            final_results = filtered_results[:self.max_documents]
+            if self.retrieval_mode == "fused":
+                # One statement: both candidate sets + reciprocal-rank fusion in SQL
+                # (RAG_MIN_SIMILARITY gates semantic candidates inside the query)
+                final_results = await self.fused_search(
+                    query,
+                    query_embedding,
+                    limit=self.max_documents,
+                    db=db,
+                    embedding_model=embedding_model
+                )
+            else:
+                # Semantic search
+                semantic_results = await self.semantic_search(
+                    query_embedding, 
+                    limit=10,
+                    db=db,
+                    embedding_model=embedding_model
+                )
+                
+                # Keyword search
+                if keyword_results is None:
+                    keyword_results = await self.keyword_search(
+                        query, 
+                        limit=10,
+                        db=db,
+                        embedding_model=embedding_model
+                    )
+                
+                # Hybrid scoring
+                combined_results = self.hybrid_score(semantic_results, keyword_results)
+                
+                # Apply threshold
+                filtered_results = [
+                    (doc, score) for doc, score in combined_results
+                    if score >= self.min_similarity
+                ]
+                
+                # Limit results
+                final_results = filtered_results[:self.max_documents]
             
             # Calculate metrics
             response_time_ms = (time.time() - start_time) * 1000
             hit_rate = len(final_results) > 0
+            self._observe("hit" if hit_rate else "miss", start_time)
             similarity_scores = [score for _, score in final_results]
             
             # Format results
             documents = [
                 {
-                    "id": str(doc.id),
-                    "name": doc.name,
-                    "source": doc.source,
-                    "content": doc.content[:500],  # Truncate
+                    "id": doc["id"],
+                    "name": doc["name"],
+                    "source": doc["source"],
+                    "content": CHUNK_SEPARATOR.join(
+                        chunk["content"] for chunk in sorted(doc["chunks"], key=lambda c: c["index"])
+                    ),
                     "score": score,
-                    "metadata": doc.metadata or {}
+                    "metadata": doc["metadata"],
+                    "chunks": [chunk["id"] for chunk in doc["chunks"]]
                 }
                 for doc, score in final_results
             ]
             
-            # Save metrics
-            if db:
-                try:
-                    metrics = RAGMetrics(
-                        query_text=query,
-                        retrieved_documents=len(final_results),
-                        similarity_scores=similarity_scores,
-                        response_time_ms=response_time_ms,
-                        hit_rate=hit_rate
-                    )
-                    db.add(metrics)
-                    await db.commit()
-                    logger.info("RAG metrics saved", hit_rate=hit_rate, documents=len(final_results), response_time_ms=response_time_ms)
-                except Exception as e:
-                    logger.error("Error saving RAG metrics", error=str(e), exc_info=True)
-                    await db.rollback()
+            # Save metrics (written behind, off the request session)
+            telemetry_writer.record(
+                "rag_metrics",
+                query_text=query[:1000],
+                retrieved_documents=len(final_results),
+                similarity_scores=similarity_scores,
+                response_time_ms=response_time_ms,
+                hit_rate=hit_rate
+            )
             
-            logger.info("RAG search completed", hit_rate=hit_rate, documents=len(documents), response_time_ms=response_time_ms)
+            logger.info(f"RAG search completed (hit_rate={hit_rate}, documents={len(documents)}, response_time_ms={response_time_ms})")
             return documents, hit_rate
             
         except Exception as e:
             # Log error and return empty results
-            logger.error("RAG search error", error=str(e), exc_info=True)
+            logger.error(f"RAG search error: {e}", exc_info=True)
+            self._observe("error", start_time)
             return [], False
     
-    async def get_context_string(self, documents: List[Dict]) -> str:
-        """Convert retrieved documents to context string"""
+    async def get_context_string(self, documents: List[Dict], max_tokens: Optional[int] = None) -> str:
+        """
+        Convert retrieved documents to context string within a token budget
+        Documents are added in rank order; the first one that does not fit is
+        cut at a chunk boundary (hard-cut only if its first chunk alone is too
+        long) and the rest are left out.
+        """
+        max_tokens = max_tokens or settings.RAG_CONTEXT_MAX_TOKENS
         context_parts = []
+        used = 0
         for i, doc in enumerate(documents, 1):
-            context_parts.append(f"[{i}] {doc['name']}\n{doc['content']}\nSource: {doc['source']}")
+            header = f"[{i}] {doc['name']}\n"
+            footer = f"\nSource: {doc['source']}"
+            separator_tokens = count_tokens("\n\n") if context_parts else 0
+            available = max_tokens - used - separator_tokens - count_tokens(header + footer)
+            if available <= 0:
+                break
+            
+            content = doc['content']
+            if count_tokens(content) > available:
+                kept = []
+                for chunk in content.split(CHUNK_SEPARATOR):
+                    candidate = CHUNK_SEPARATOR.join(kept + [chunk])
+                    if count_tokens(candidate) > available:
+                        break
+                    kept.append(chunk)
+                content = CHUNK_SEPARATOR.join(kept) if kept else split_tokens(content, available)[0]
+                context_parts.append(header + content + footer)
+                logger.debug(f"RAG context truncated (documents={i}, max_tokens={max_tokens})")
+                break
+            
+            part = header + content + footer
+            context_parts.append(part)
+            used += separator_tokens + count_tokens(part)
         return "\n\n".join(context_parts)
 
 
@@ -1,55 +1,209 @@
 """
 Rule Service - Rule Engine with Regex/Keyword Matching
 """
-from typing import Dict, Optional
+from typing import Dict, Iterable, NamedTuple, Optional, Pattern, Tuple
+import asyncio
 import re
+import time
+import redis.asyncio as redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.config import settings
 from app.models.rule import Rule
-from app.core.database import get_db
+from app.core.database import get_db, AsyncSessionLocal
+from app.core.logging import get_logger
+from app.monitoring.prometheus import rule_matches_total, rule_engine_reloads_total, rule_engine_rules, labelled
+
+logger = get_logger(__name__)
+
+# Redis client for rule set versioning / invalidation
+_redis_rules: Optional[redis.Redis] = None
+
+RULES_VERSION_KEY = "rules:version"
+RULES_CHANGED_CHANNEL = "rules:changed"
+
+REGEX_CONFIDENCE = 0.95
+KEYWORD_CONFIDENCE = 0.85
+
+
+async def get_redis_rules():
+    """Get Redis client for rule invalidation"""
+    global _redis_rules
+    if _redis_rules is None:
+        _redis_rules = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_rules
+
+
+async def publish_rules_changed() -> Optional[int]:
+    """
+    Bump the rule set version and tell every worker to reload
+    Call after committing changes to the rules table.
+    """
+    try:
+        redis_client = await get_redis_rules()
+        version = await redis_client.incr(RULES_VERSION_KEY)
+        await redis_client.publish(RULES_CHANGED_CHANNEL, version)
+        return version
+    except Exception as e:
+        logger.warning(f"Failed to publish rules change: {e}")
+        return None
+
+
+class CompiledRule(NamedTuple):
+    rule_id: str
+    pattern: Optional[Pattern]  # None: key is not a valid regex, matched as a keyword
+    keyword: str  # lowercased key
+    response: str
+    action: str
+
+
+def compile_rules(rules: Iterable) -> Tuple[CompiledRule, ...]:
+    """Precompile rule keys in priority order (invalid regexes become keyword rules)"""
+    compiled = []
+    for rule in rules:
+        try:
+            pattern = re.compile(rule.key, re.IGNORECASE)
+        except re.error:
+            pattern = None
+        compiled.append(CompiledRule(str(rule.id), pattern, rule.key.lower(), rule.value, rule.action))
+    return tuple(compiled)
+
+
+def match_compiled(rules: Tuple[CompiledRule, ...], text: str) -> Optional[Dict]:
+    """First rule (by order) matching the text"""
+    lowered = None
+    for rule in rules:
+        if rule.pattern is not None:
+            if rule.pattern.search(text) is None:
+                continue
+            confidence = REGEX_CONFIDENCE
+        else:
+            if lowered is None:
+                lowered = text.lower()
+            if rule.keyword not in lowered:
+                continue
+            confidence = KEYWORD_CONFIDENCE
+        return {
+            "rule_id": rule.rule_id,
+            "response": rule.response,
+            "confidence": confidence,
+            "action": rule.action
+        }
+    return None
+
+
+class RuleEngine:
+    """
+    In-memory compiled rule set shared by every RuleService in the process
+
+    Rules are loaded from Postgres once and matched without a database query.
+    The set is reloaded (and swapped in as one tuple, so a match never sees a
+    half-built set) when a "rules changed" message arrives on Redis pub/sub,
+    or when the rules:version counter differs from the loaded one; the counter
+    is checked every RULES_VERSION_CHECK_INTERVAL seconds in the background in
+    case a pub/sub message was missed.
+    """
+
+    def __init__(self, check_interval: float = None):
+        self.check_interval = check_interval or settings.RULES_VERSION_CHECK_INTERVAL
+        self.rules: Tuple[CompiledRule, ...] = ()
+        self.version: Optional[str] = None
+        self._loaded = False
+        self._checked_at = 0.0
+        self._checking = False
+        self._check_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def _current_version(self) -> Optional[str]:
+        try:
+            redis_client = await get_redis_rules()
+            return await redis_client.get(RULES_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to read rules version: {e}")
+            return None
+
+    async def reload(self, trigger: str, version: Optional[str] = None):
+        """Load and compile the rules table, then swap it in"""
+        async with self._lock:
+            if trigger == "startup" and self._loaded:
+                # Another caller finished the first load while we waited
+                return
+            version = version if version is not None else await self._current_version()
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(select(Rule).order_by(Rule.order.asc()))
+                    rules = compile_rules(result.scalars().all())
+            except Exception as e:
+                logger.error(f"Failed to load rules: {e}")
+                return
+            self.rules, self.version, self._loaded = rules, version, True
+            self._checked_at = time.monotonic()
+            labelled(rule_engine_reloads_total, trigger).inc()
+            rule_engine_rules.set(len(rules))
+            logger.info(f"Loaded {len(rules)} rules (version {version}, trigger {trigger})")
+
+    async def _check_version(self):
+        try:
+            version = await self._current_version()
+            self._checked_at = time.monotonic()
+            if version is not None and version != self.version:
+                await self.reload("version", version)
+        finally:
+            self._checking = False
+
+    async def get_rules(self) -> Tuple[CompiledRule, ...]:
+        """Current compiled rules (loaded on first use, version checked in the background)"""
+        if not self._loaded:
+            await self.reload("startup")
+        elif time.monotonic() - self._checked_at >= self.check_interval and not self._checking:
+            self._checking = True
+            self._check_task = asyncio.create_task(self._check_version())
+        return self.rules
+
+    async def run_listener(self):
+        """Reload whenever a rules change is published (reconnects after Redis errors)"""
+        while True:
+            pubsub = None
+            try:
+                redis_client = await get_redis_rules()
+                pubsub = redis_client.pubsub()
+                await pubsub.subscribe(RULES_CHANGED_CHANNEL)
+                # Changes published while we were not subscribed
+                await self.reload("startup" if not self._loaded else "version")
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=self.check_interval)
+                    if message is not None:
+                        await self.reload("pubsub", message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Rules change listener error: {e}")
+                await asyncio.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.unsubscribe()
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+
+rule_engine = RuleEngine()
 
 
 class RuleService:
     """Rule engine service"""
-    
+
     async def match_rule(
         self,
         text: str,
         db: Optional[AsyncSession] = None
     ) -> Optional[Dict]:
         """
-        Match text against rules
-        Returns: {rule_id, response, confidence} or None
+        Match text against rules (in-memory compiled set; db is not needed)
+        Returns: {rule_id, response, confidence, action} or None
         """
-        if not db:
-            return None
-        
-        # Get all rules ordered by priority
-        result = await db.execute(
-            select(Rule).order_by(Rule.order.asc())
-        )
-        rules = result.scalars().all()
-        
-        for rule in rules:
-            # Try regex match
-            try:
-                if re.search(rule.key, text, re.IGNORECASE):
-                    return {
-                        "rule_id": str(rule.id),
-                        "response": rule.value,
-                        "confidence": 0.95,
-                        "action": rule.action
-                    }
-            except re.error:
-                # Invalid regex, try keyword match
-                if rule.key.lower() in text.lower():
-                    return {
-                        "rule_id": str(rule.id),
-                        "response": rule.value,
-                        "confidence": 0.85,
-                        "action": rule.action
-                    }
-        
-        return None
-
+        result = match_compiled(await rule_engine.get_rules(), text)
+        labelled(rule_matches_total, "matched" if result else "no_match").inc()
+        return result
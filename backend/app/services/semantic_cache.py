@@ -0,0 +1,200 @@
+"""
+Semantic Cache - RAG answers served by query embedding similarity
+"""
+from typing import Dict, List, Optional, Set
+from datetime import datetime, timedelta, timezone
+import asyncio
+import uuid
+import redis.asyncio as redis
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import text, bindparam, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging import get_logger
+from app.models.semantic_cache import SemanticCacheEntry
+from app.monitoring.prometheus import semantic_cache_lookups_total
+
+logger = get_logger(__name__)
+
+# Redis client for the knowledge base version
+_redis_semantic: Optional[redis.Redis] = None
+
+# Random token replaced whenever the knowledge base changes; entries of other versions are stale
+KB_VERSION_KEY = "kb:version"
+
+
+async def get_redis_semantic():
+    """Get Redis client for the semantic cache"""
+    global _redis_semantic
+    if _redis_semantic is None:
+        _redis_semantic = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_semantic
+
+
+def bump_kb_version(redis_client):
+    """Mark the knowledge base as changed (sync client, used by indexing workers)"""
+    try:
+        redis_client.set(KB_VERSION_KEY, uuid.uuid4().hex)
+    except Exception as e:
+        logger.warning(f"Failed to bump knowledge base version: {e}")
+
+
+async def get_kb_version() -> str:
+    """Current knowledge base version (a fresh one if Redis lost it, which invalidates all entries)"""
+    redis_client = await get_redis_semantic()
+    version = await redis_client.get(KB_VERSION_KEY)
+    if version is None:
+        await redis_client.set(KB_VERSION_KEY, uuid.uuid4().hex, nx=True)
+        version = await redis_client.get(KB_VERSION_KEY)
+    return version
+
+
+class SemanticCache:
+    """
+    Semantic answer cache in front of the RAG + LLM path
+
+    Entries are (tenant, query embedding, answer, sources, embedding model,
+    knowledge base version) rows in llm_semantic_cache with an HNSW index on
+    the embedding. A lookup returns the nearest entry of the same tenant,
+    embedding model and knowledge base version if its cosine similarity is at
+    least LLM_SEMANTIC_CACHE_THRESHOLD. Entries expire after
+    LLM_SEMANTIC_CACHE_TTL seconds; the evictor also drops stale versions and
+    the least recently hit entries beyond LLM_SEMANTIC_CACHE_MAX_ENTRIES per tenant.
+    """
+
+    def __init__(self, threshold: float = None, ttl: int = None, max_entries: int = None):
+        self.threshold = threshold or settings.LLM_SEMANTIC_CACHE_THRESHOLD
+        self.ttl = ttl or settings.LLM_SEMANTIC_CACHE_TTL
+        self.max_entries = max_entries or settings.LLM_SEMANTIC_CACHE_MAX_ENTRIES
+        # Hit updates in flight (the event loop only keeps weak references to tasks)
+        self._hit_tasks: Set[asyncio.Task] = set()
+
+    async def lookup(
+        self,
+        db: AsyncSession,
+        tenant: str,
+        embedding: List[float],
+        embedding_model: str,
+        kb_version: str
+    ) -> Optional[Dict]:
+        """Cached {"answer", "sources", "similarity"} for a query embedding, or None"""
+        # Bare `embedding <=> :embedding` ordering so the HNSW index serves the scan.
+        # The other predicates filter its candidates, so with many tenants or stale
+        # versions the nearest ef_search rows may all be filtered out: widen the
+        # candidate list and let pgvector keep scanning until a row qualifies.
+        # SET LOCAL lasts until the end of the caller's transaction only.
+        await db.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.LLM_SEMANTIC_CACHE_EF_SEARCH)}"))
+        if settings.LLM_SEMANTIC_CACHE_ITERATIVE_SCAN:
+            await db.execute(text("SET LOCAL hnsw.iterative_scan = relaxed_order"))
+        sql_query = text("""
+            SELECT id, answer, sources, 1 - (embedding <=> :embedding) AS similarity
+            FROM llm_semantic_cache
+            WHERE tenant = :tenant
+              AND embedding_model = :embedding_model
+              AND kb_version = :kb_version
+              AND expires_at > now()
+            ORDER BY embedding <=> :embedding
+            LIMIT 1
+        """).bindparams(
+            bindparam("embedding", type_=Vector(settings.RAG_EMBEDDING_DIMENSIONS))
+        )
+        result = await db.execute(sql_query, {
+            "embedding": embedding,
+            "tenant": tenant,
+            "embedding_model": embedding_model,
+            "kb_version": kb_version
+        })
+        row = result.first()
+        if row is None or row.similarity < self.threshold:
+            semantic_cache_lookups_total.labels(result="miss").inc()
+            return None
+
+        # Recorded in the background in its own session: the caller's transaction is not ours to commit
+        task = asyncio.create_task(self._record_hit(row.id))
+        self._hit_tasks.add(task)
+        task.add_done_callback(self._hit_tasks.discard)
+        semantic_cache_lookups_total.labels(result="hit").inc()
+        return {"answer": row.answer, "sources": row.sources or [], "similarity": float(row.similarity)}
+
+    async def _record_hit(self, entry_id):
+        """Bump hit_count / last_hit_at (used by the evictor to keep recently hit entries)"""
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(SemanticCacheEntry)
+                    .where(SemanticCacheEntry.id == entry_id)
+                    .values(hit_count=SemanticCacheEntry.hit_count + 1, last_hit_at=func.now())
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to record semantic cache hit: {e}")
+
+    async def store(
+        self,
+        db: AsyncSession,
+        tenant: str,
+        query: str,
+        embedding: List[float],
+        embedding_model: str,
+        kb_version: str,
+        answer: str,
+        sources: List[Dict]
+    ):
+        """Cache a RAG answer"""
+        try:
+            db.add(SemanticCacheEntry(
+                tenant=tenant,
+                query=query,
+                embedding=embedding,
+                embedding_model=embedding_model,
+                kb_version=kb_version,
+                answer=answer,
+                sources=sources,
+                expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+            ))
+            await db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to store semantic cache entry: {e}")
+            await db.rollback()
+
+    async def evict(self, db: AsyncSession) -> int:
+        """Delete expired entries, entries of old knowledge base versions and per-tenant overflow"""
+        kb_version = await get_kb_version()
+        result = await db.execute(
+            text("DELETE FROM llm_semantic_cache WHERE expires_at <= now() OR kb_version <> :kb_version"),
+            {"kb_version": kb_version}
+        )
+        deleted = result.rowcount
+        result = await db.execute(text("""
+            DELETE FROM llm_semantic_cache
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, row_number() OVER (PARTITION BY tenant ORDER BY last_hit_at DESC) AS rank
+                    FROM llm_semantic_cache
+                ) ranked
+                WHERE rank > :max_entries
+            )
+        """), {"max_entries": self.max_entries})
+        deleted += result.rowcount
+        await db.commit()
+        if deleted:
+            logger.info(f"Evicted {deleted} semantic cache entries")
+        return deleted
+
+    async def run_evictor(self, session_factory, interval: Optional[float] = None):
+        """Evict every interval seconds (one worker per interval)"""
+        interval = interval or settings.LLM_SEMANTIC_CACHE_EVICT_INTERVAL
+        while True:
+            try:
+                redis_client = await get_redis_semantic()
+                if await redis_client.set("llm:semantic:evict:lock", "1", nx=True, ex=max(1, int(interval) - 1)):
+                    async with session_factory() as db:
+                        await self.evict(db)
+            except Exception as e:
+                logger.warning(f"Semantic cache eviction failed: {e}")
+            await asyncio.sleep(interval)
+
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,359 @@
+"""
+Singleflight - Coalesce identical in-flight LLM requests (in process and across workers)
+"""
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+import asyncio
+import json
+import uuid
+import redis.asyncio as redis
+
+from app.config import settings
+from app.core.logging import get_logger
+from app.monitoring.prometheus import llm_coalesced_requests_total
+
+logger = get_logger(__name__)
+
+# Redis client for cross-worker flights
+_redis_flight: Optional[redis.Redis] = None
+
+# Release the lock only if we still hold it
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+TERMINAL_EVENTS = ("end", "error")
+
+
+async def get_redis_flight():
+    """Get Redis client for singleflight coordination"""
+    global _redis_flight
+    if _redis_flight is None:
+        _redis_flight = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_flight
+
+
+class FlightAbandoned(Exception):
+    """The worker leading a flight stopped publishing before the end event"""
+
+
+def follower_event(event: Dict) -> Dict:
+    """Event as seen by a coalesced caller: the upstream cost is the leader's"""
+    if event.get("type") != "end":
+        return event
+    return {"type": "end", "data": {**event.get("data", {}), "cost": 0.0, "coalesced": True}}
+
+
+class Flight:
+    """
+    One in-flight call: events are buffered so callers that join late replay
+    them from the start, then wait for new ones until the end/error event
+    """
+
+    def __init__(self):
+        self.events: List[Dict] = []
+        self.done = False
+        self.consumers = 0
+        self.task: Optional[asyncio.Task] = None
+        # Led for other workers too: the leader decides when to stop the upstream call
+        self.shared = False
+        self._changed = asyncio.Event()
+
+    def publish(self, event: Dict):
+        self.events.append(event)
+        self._wake()
+
+    def close(self):
+        self.done = True
+        self._wake()
+
+    def _wake(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def follow(self) -> AsyncIterator[Dict]:
+        self.consumers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(self.events):
+                    yield self.events[index]
+                    index += 1
+                if self.done:
+                    return
+                await self._changed.wait()
+        finally:
+            self.consumers -= 1
+            # Nobody is listening any more: stop the upstream call
+            if self.consumers == 0 and not self.done and self.task and not self.shared:
+                self.task.cancel()
+
+
+class FlightPublisher:
+    """
+    Mirrors a flight led by this worker to Redis, off the streaming path
+
+    The leader hands events over with add() (no I/O). Until another worker has
+    registered as a follower ({key}:flight:{token}:followers) the only Redis
+    traffic is a check of that counter every poll_interval; from then on the
+    backlog and every later event are written to the list and the channel,
+    one pipeline per batch. close() writes what is left and releases the lock.
+    """
+
+    def __init__(self, redis_client, key: str, token: str, ttl: int, poll_interval: float):
+        self.redis = redis_client
+        self.key = key
+        self.token = token
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.followers = 0
+        self._messages: List[str] = []
+        self._written = 0
+        self._closed = False
+        self._wake = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    def add(self, event: Dict):
+        self._messages.append(json.dumps({"seq": len(self._messages), "event": event}, ensure_ascii=False))
+        if self.followers:
+            self._wake.set()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+
+    async def followed(self) -> bool:
+        """Whether a worker follows the flight (asks Redis if none was seen yet)"""
+        if not self.followers:
+            try:
+                await self._sync()
+            except Exception as e:
+                logger.warning(f"Singleflight follower check failed for {self.key}: {e}")
+        return self.followers > 0
+
+    async def _sync(self):
+        """Refresh the follower count and, when followed, write the pending events"""
+        while True:
+            pending = self._messages[self._written:] if self.followers else []
+            pipe = self.redis.pipeline()
+            pipe.get(f"{self.key}:flight:{self.token}:followers")
+            if pending:
+                pipe.rpush(f"{self.key}:flight:{self.token}:events", *pending)
+                pipe.expire(f"{self.key}:flight:{self.token}:events", self.ttl)
+                for message in pending:
+                    pipe.publish(f"{self.key}:flight:{self.token}", message)
+            results = await pipe.execute()
+            self._written += len(pending)
+            self.followers = int(results[0] or 0)
+            if not self.followers or self._written == len(self._messages):
+                return
+
+    async def _run(self):
+        try:
+            while not self._closed:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                try:
+                    await self._sync()
+                except Exception as e:
+                    logger.warning(f"Singleflight publish failed for {self.key}: {e}")
+            # Events added while the last sync was running
+            await self._sync()
+        except Exception as e:
+            logger.warning(f"Singleflight publish failed for {self.key}: {e}")
+        finally:
+            try:
+                await self.redis.eval(RELEASE_SCRIPT, 1, f"{self.key}:flight:lock", self.token)
+            except Exception as e:
+                logger.warning(f"Singleflight lock release failed for {self.key}: {e}")
+
+
+class SingleFlight:
+    """
+    Request coalescing for LLM calls keyed by the LLM cache key
+
+    Within a process, concurrent callers with the same key share one Flight.
+    Across workers, the first worker to take the Redis lock {key}:flight:lock
+    calls upstream; its events go to local callers first and are mirrored
+    (with sequence numbers) by a FlightPublisher to the Redis list
+    {key}:flight:{token}:events and the channel {key}:flight:{token} once
+    another worker follows. token is the lock value, so every flight has its
+    own list and channel. Other workers read the token from the lock,
+    subscribe, register as followers, replay the list and then follow the
+    channel. If the leader goes quiet for LLM_SINGLEFLIGHT_IDLE_TIMEOUT seconds
+    before anything was received, the follower calls upstream itself. A leader
+    whose own callers have left keeps streaming while another worker follows.
+    """
+
+    def __init__(
+        self,
+        use_redis: bool = True,
+        lock_ttl: int = None,
+        idle_timeout: float = None,
+        poll_interval: float = None
+    ):
+        self.use_redis = use_redis
+        self.lock_ttl = lock_ttl or settings.LLM_SINGLEFLIGHT_LOCK_TTL
+        self.idle_timeout = idle_timeout or settings.LLM_SINGLEFLIGHT_IDLE_TIMEOUT
+        self.poll_interval = poll_interval or settings.LLM_SINGLEFLIGHT_POLL_INTERVAL
+        self._flights: Dict[str, Flight] = {}
+        # Publishers finishing in the background (the event loop only keeps weak references)
+        self._publishers: Set[asyncio.Task] = set()
+
+    async def run(self, key: str, call: Callable[[], AsyncIterator[Dict]]) -> AsyncIterator[Dict]:
+        """Yield the events of call(), sharing one call among identical concurrent requests"""
+        flight = self._flights.get(key)
+        owner = flight is None
+        if owner:
+            flight = Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._drive(key, flight, call))
+        else:
+            llm_coalesced_requests_total.labels(scope="local").inc()
+
+        async for event in flight.follow():
+            yield event if owner else follower_event(event)
+
+    async def _drive(self, key: str, flight: Flight, call: Callable[[], AsyncIterator[Dict]]):
+        """Feed the flight from upstream (leader) or from another worker's flight"""
+        try:
+            async for event in self._source(key, flight, call):
+                flight.publish(event)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Singleflight error for {key}: {e}")
+            flight.publish({"type": "error", "data": {"message": str(e)}})
+        finally:
+            flight.close()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def _source(self, key: str, flight: Flight, call: Callable[[], AsyncIterator[Dict]]) -> AsyncIterator[Dict]:
+        if not self.use_redis:
+            async for event in call():
+                yield event
+            return
+
+        token = uuid.uuid4().hex
+        leader_token = None
+        try:
+            redis_client = await get_redis_flight()
+            for _ in range(3):
+                if await redis_client.set(f"{key}:flight:lock", token, nx=True, ex=self.lock_ttl):
+                    break
+                leader_token = await redis_client.get(f"{key}:flight:lock")
+                if leader_token is not None:
+                    break
+                # The flight holding the lock just ended: try to lead the next one
+        except Exception as e:
+            # Redis down: no cross-worker coalescing
+            logger.warning(f"Singleflight lock failed, calling upstream: {e}")
+            async for event in call():
+                yield event
+            return
+
+        if leader_token is None:
+            async for event in self._lead(key, token, flight, call):
+                yield event
+            return
+
+        llm_coalesced_requests_total.labels(scope="remote").inc()
+        received = False
+        try:
+            async for event in self._follow_remote(key, leader_token):
+                received = True
+                yield follower_event(event)
+        except FlightAbandoned:
+            if received:
+                yield {"type": "error", "data": {"message": "Coalesced request was abandoned by its leader"}}
+                return
+            logger.warning(f"Singleflight leader for {key} is gone, calling upstream")
+            async for event in call():
+                yield event
+
+    async def _lead(
+        self, key: str, token: str, flight: Flight, call: Callable[[], AsyncIterator[Dict]]
+    ) -> AsyncIterator[Dict]:
+        """Call upstream; events reach local callers before they are mirrored for other workers"""
+        redis_client = await get_redis_flight()
+        flight.shared = True
+        publisher = FlightPublisher(redis_client, key, token, self.lock_ttl, self.poll_interval)
+        self._publishers.add(publisher.task)
+        publisher.task.add_done_callback(self._publishers.discard)
+        events = call()
+        try:
+            async for event in events:
+                yield event
+                publisher.add(event)
+                if flight.consumers == 0 and not await publisher.followed():
+                    # Nobody on this or any other worker is listening: stop the upstream call
+                    publisher.add({"type": "error", "data": {"message": "Request cancelled"}})
+                    return
+        except asyncio.CancelledError:
+            publisher.add({"type": "error", "data": {"message": "Request cancelled"}})
+            raise
+        finally:
+            await events.aclose()
+            publisher.close()
+
+    async def _follow_remote(self, key: str, token: str) -> AsyncIterator[Dict]:
+        """Replay and follow the flight another worker leads under token"""
+        redis_client = await get_redis_flight()
+        pubsub = redis_client.pubsub()
+        # Subscribe before reading the backlog so no event falls in between
+        await pubsub.subscribe(f"{key}:flight:{token}")
+        followers_key = f"{key}:flight:{token}:followers"
+        registered = False
+        try:
+            # Tell the leader to start mirroring its events to Redis
+            pipe = redis_client.pipeline()
+            pipe.incr(followers_key)
+            pipe.expire(followers_key, self.lock_ttl)
+            await pipe.execute()
+            registered = True
+
+            last_seq = -1
+            for raw in await redis_client.lrange(f"{key}:flight:{token}:events", 0, -1):
+                message = json.loads(raw)
+                last_seq = message["seq"]
+                yield message["event"]
+                if message["event"].get("type") in TERMINAL_EVENTS:
+                    return
+            if last_seq < 0 and await redis_client.get(f"{key}:flight:lock") != token:
+                # The flight ended before we registered: nothing will be published
+                raise FlightAbandoned(key)
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.idle_timeout
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise FlightAbandoned(key)
+                raw = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if raw is None:
+                    continue
+                message = json.loads(raw["data"])
+                if message["seq"] <= last_seq:
+                    continue
+                last_seq = message["seq"]
+                deadline = loop.time() + self.idle_timeout
+                yield message["event"]
+                if message["event"].get("type") in TERMINAL_EVENTS:
+                    return
+        finally:
+            try:
+                if registered:
+                    await redis_client.decr(followers_key)
+                await pubsub.unsubscribe()
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+
+singleflight = SingleFlight()
@@ -59,20 +59,20 @@ class StorageService:
             if self.bucket_name:
                 try:
                     self.s3_client.head_bucket(Bucket=self.bucket_name)
-                    logger.info("S3 storage initialized successfully", bucket=self.bucket_name)
+                    logger.info(f"S3 storage initialized successfully (bucket={self.bucket_name})")
                 except ClientError as e:
                     error_code = e.response['Error']['Code']
                     if error_code == '404':
                         # Bucket doesn't exist, create it
                         try:
                             self.s3_client.create_bucket(Bucket=self.bucket_name)
-                            logger.info("S3 bucket created", bucket=self.bucket_name)
+                            logger.info(f"S3 bucket created (bucket={self.bucket_name})")
                         except Exception as create_error:
-                            logger.error("Failed to create S3 bucket", bucket=self.bucket_name, error=str(create_error))
+                            logger.error(f"Failed to create S3 bucket (bucket={self.bucket_name}): {create_error}")
                     else:
-                        logger.error("Failed to access S3 bucket", bucket=self.bucket_name, error=str(e))
+                        logger.error(f"Failed to access S3 bucket (bucket={self.bucket_name}): {e}")
         except Exception as e:
-            logger.error("Failed to initialize S3 client", error=str(e))
+            logger.error(f"Failed to initialize S3 client: {e}")
             self.s3_client = None
     
     def is_available(self) -> bool:
@@ -131,11 +131,11 @@ class StorageService:
                 'original_name': file_name
             }
             
-            logger.info("File uploaded successfully", file_key=file_key, size=len(file_content))
+            logger.info(f"File uploaded successfully (file_key={file_key}, size={len(file_content)})")
             return result
         
         except Exception as e:
-            logger.error("Failed to upload file", file_name=file_name, error=str(e), exc_info=True)
+            logger.error(f"Failed to upload file (file_name={file_name}): {e}", exc_info=True)
             return None
     
     def delete_file(self, file_key: str) -> bool:
@@ -145,10 +145,10 @@ class StorageService:
         
         try:
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=file_key)
-            logger.info("File deleted successfully", file_key=file_key)
+            logger.info(f"File deleted successfully (file_key={file_key})")
             return True
         except Exception as e:
-            logger.error("Failed to delete file", file_key=file_key, error=str(e))
+            logger.error(f"Failed to delete file (file_key={file_key}): {e}")
             return False
     
     def get_file_url(self, file_key: str, expires_in: int = 3600) -> Optional[str]:
@@ -164,7 +164,7 @@ class StorageService:
             )
             return url
         except Exception as e:
-            logger.error("Failed to generate file URL", file_key=file_key, error=str(e))
+            logger.error(f"Failed to generate file URL (file_key={file_key}): {e}")
             return None
     
     def get_file(self, file_key: str) -> Optional[bytes]:
@@ -176,7 +176,7 @@ class StorageService:
             response = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
             return response['Body'].read()
         except Exception as e:
-            logger.error("Failed to download file", file_key=file_key, error=str(e))
+            logger.error(f"Failed to download file (file_key={file_key}): {e}")
             return None
 
 
@@ -0,0 +1,81 @@
+"""
+Streaming Utilities - Coalesce token deltas into client frames
+"""
+from typing import AsyncGenerator, AsyncIterator, Dict, List
+import asyncio
+import contextlib
+import time
+
+_END = object()
+
+
+async def coalesce_deltas(
+    events: AsyncIterator[Dict],
+    interval_ms: float
+) -> AsyncGenerator[Dict, None]:
+    """
+    Merge consecutive {"type": "delta"} events so at most one delta is emitted
+    per interval_ms. The first delta is emitted immediately (time-to-first-token
+    is not delayed), buffered text is flushed when the interval elapses even if
+    the source stalls, and any other event flushes the buffer before it is passed on.
+    """
+    if interval_ms <= 0:
+        async for event in events:
+            yield event
+        return
+
+    interval = interval_ms / 1000
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(_END)
+
+    task = asyncio.create_task(pump())
+    buffer: List[str] = []
+    last_flush = None
+
+    def flush() -> Dict:
+        nonlocal buffer, last_flush
+        event = {"type": "delta", "data": "".join(buffer)}
+        buffer, last_flush = [], time.monotonic()
+        return event
+
+    try:
+        while True:
+            timeout = None
+            if buffer:
+                timeout = max(0.0, last_flush + interval - time.monotonic())
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield flush()
+                continue
+
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                if buffer:
+                    yield flush()
+                raise item
+            if item.get("type") == "delta":
+                buffer.append(item.get("data", ""))
+                if last_flush is None or time.monotonic() - last_flush >= interval:
+                    yield flush()
+            else:
+                if buffer:
+                    yield flush()
+                yield item
+
+        if buffer:
+            yield flush()
+    finally:
+        task.cancel()
+        # Let the pump unwind (closing the source) before the caller moves on
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
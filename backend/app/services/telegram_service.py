@@ -55,7 +55,7 @@ class TelegramService:
                 response.raise_for_status()
                 return response.json()
         except Exception as e:
-            logger.error("Error sending Telegram message", error=str(e))
+            logger.error(f"Error sending Telegram message: {e}")
             return None
     
     async def send_photo(self, chat_id: int, photo_url: str, caption: Optional[str] = None):
@@ -79,7 +79,7 @@ class TelegramService:
                 response.raise_for_status()
                 return response.json()
         except Exception as e:
-            logger.error("Error sending Telegram photo", error=str(e))
+            logger.error(f"Error sending Telegram photo: {e}")
             return None
     
     async def send_document(self, chat_id: int, document_url: str, caption: Optional[str] = None):
@@ -103,7 +103,7 @@ class TelegramService:
                 response.raise_for_status()
                 return response.json()
         except Exception as e:
-            logger.error("Error sending Telegram document", error=str(e))
+            logger.error(f"Error sending Telegram document: {e}")
             return None
     
     async def send_typing(self, chat_id: int):
@@ -118,7 +118,7 @@ class TelegramService:
                     json={"chat_id": chat_id, "action": "typing"}
                 )
         except Exception as e:
-            logger.error("Error sending typing indicator", error=str(e))
+            logger.error(f"Error sending typing indicator: {e}")
     
     async def get_file(self, file_id: str) -> Optional[Dict]:
         """Get file information from Telegram"""
@@ -134,7 +134,7 @@ class TelegramService:
                 response.raise_for_status()
                 return response.json().get("result")
         except Exception as e:
-            logger.error("Error getting file info", file_id=file_id, error=str(e))
+            logger.error(f"Error getting file info (file_id={file_id}): {e}")
             return None
     
     async def process_update(self, update: Dict, db: Optional[AsyncSession] = None):
@@ -203,7 +203,7 @@ class TelegramService:
                 )
         
         except Exception as e:
-            logger.error("Error processing Telegram update", error=str(e), exc_info=True)
+            logger.error(f"Error processing Telegram update: {e}", exc_info=True)
     
     async def handle_text_message(
         self,
@@ -240,7 +240,7 @@ class TelegramService:
             await self.send_message(chat_id, response_text, reply_to_message_id=message_id)
         
         except Exception as e:
-            logger.error("Error processing text message", error=str(e), exc_info=True)
+            logger.error(f"Error processing text message: {e}", exc_info=True)
             await self.send_message(
                 chat_id, 
                 "Üzgünüm, bir hata oluştu. Lütfen daha sonra tekrar deneyin.",
@@ -385,7 +385,7 @@ class TelegramService:
                 )
         
         except Exception as e:
-            logger.error("Error processing voice message", error=str(e), exc_info=True)
+            logger.error(f"Error processing voice message: {e}", exc_info=True)
             await self.send_message(
                 chat_id,
                 "Ses mesajı işlenirken bir hata oluştu. Lütfen daha sonra tekrar deneyin."
@@ -406,9 +406,9 @@ class TelegramService:
                         json={"callback_query_id": query_id}
                     )
             except Exception as e:
-                logger.error("Error answering callback query", error=str(e))
+                logger.error(f"Error answering callback query: {e}")
         
         # Process callback data
         # TODO: Implement callback handling
-        logger.info("Callback query received", data=data)
+        logger.info(f"Callback query received (data={data})")
 
@@ -0,0 +1,137 @@
+"""
+Telemetry Writer - Write-behind buffer for llm_usage / rag_metrics rows
+"""
+from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+from datetime import datetime, timezone
+import asyncio
+import time
+import uuid
+
+from app.config import settings
+from app.core.logging import get_logger
+from app.monitoring.prometheus import telemetry_rows_total, telemetry_flush_duration
+
+logger = get_logger(__name__)
+
+# COPY column order per table
+TABLE_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "llm_usage": (
+        "id", "model", "route", "tenant", "prompt_tokens", "completion_tokens",
+        "total_tokens", "cost_usd", "latency_ms", "created_at"
+    ),
+    "rag_metrics": (
+        "id", "query_text", "retrieved_documents", "similarity_scores",
+        "response_time_ms", "hit_rate", "created_at"
+    ),
+}
+
+
+class TelemetryWriter:
+    """
+    Write-behind buffer for telemetry rows
+
+    Hot paths call record() with plain values, which only puts a row on a
+    bounded in-memory queue (no database round-trip, no commit on the
+    caller's session). run() drains the queue and writes the rows with one
+    COPY per table every flush_interval_ms or as soon as flush_rows rows are
+    waiting. Rows are stamped with their event time when recorded. When the
+    queue is full rows are dropped and counted; stop() flushes what is left.
+    """
+
+    def __init__(self, queue_size: int = None, flush_interval_ms: float = None, flush_rows: int = None):
+        self.queue_size = queue_size or settings.TELEMETRY_QUEUE_SIZE
+        self.flush_interval = (flush_interval_ms or settings.TELEMETRY_FLUSH_INTERVAL_MS) / 1000
+        self.flush_rows = flush_rows or settings.TELEMETRY_FLUSH_ROWS
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._session_factory = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        return self._queue
+
+    def record(self, table: str, **fields):
+        """Queue a row for the table (never blocks; drops the row if the queue is full)"""
+        row = {"id": uuid.uuid4(), "created_at": datetime.now(timezone.utc), **fields}
+        try:
+            self.queue.put_nowait((table, tuple(row.get(column) for column in TABLE_COLUMNS[table])))
+        except asyncio.QueueFull:
+            telemetry_rows_total.labels(table=table, result="dropped").inc()
+
+    def start(self, session_factory):
+        """Start the background flush task"""
+        self._session_factory = session_factory
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the flush task and write the rows still queued"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while not self.queue.empty():
+            await self.flush(self._drain())
+
+    def _drain(self) -> List[Tuple[str, tuple]]:
+        batch = []
+        while len(batch) < self.flush_rows and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def run(self):
+        """Flush every flush_interval or when flush_rows rows are queued"""
+        batch: List[Tuple[str, tuple]] = []
+        try:
+            while True:
+                batch.append(await self.queue.get())
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.flush_rows:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                rows, batch = batch, []
+                await self.flush(rows)
+        except asyncio.CancelledError:
+            # Rows collected but not yet flushed go out with the shutdown flush
+            await self.flush(batch)
+            raise
+
+    async def flush(self, batch: List[Tuple[str, tuple]]):
+        """Write a batch with one COPY per table in a single transaction"""
+        if not batch or self._session_factory is None:
+            return
+        per_table = defaultdict(list)
+        for table, values in batch:
+            per_table[table].append(values)
+
+        start = time.time()
+        try:
+            async with self._session_factory() as db:
+                connection = await db.connection()
+                raw_connection = await connection.get_raw_connection()
+                for table, rows in per_table.items():
+                    await raw_connection.driver_connection.copy_records_to_table(
+                        table, records=rows, columns=TABLE_COLUMNS[table], schema_name="public"
+                    )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Telemetry flush of {len(batch)} rows failed: {e}")
+            for table, rows in per_table.items():
+                telemetry_rows_total.labels(table=table, result="failed").inc(len(rows))
+            return
+        telemetry_flush_duration.observe(time.time() - start)
+        for table, rows in per_table.items():
+            telemetry_rows_total.labels(table=table, result="written").inc(len(rows))
+
+
+telemetry_writer = TelemetryWriter()
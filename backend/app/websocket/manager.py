@@ -6,11 +6,14 @@ from fastapi import WebSocket, WebSocketDisconnect
 import json
 import time
 import hashlib
+import uuid
 import redis.asyncio as redis
 from datetime import datetime, timedelta
 
 from app.config import settings
 from app.services.orchestrator import OrchestratorService
+from app.services.streaming import coalesce_deltas
+from app.monitoring.prometheus import chat_time_to_first_token, websocket_connections
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -40,6 +43,8 @@ class WebSocketManager:
             self.active_connections[room_key] = set()
         self.active_connections[room_key].add(websocket)
         
+        if websocket not in self.connection_metadata:
+            websocket_connections.inc()
         self.connection_metadata[websocket] = {
             "room_key": room_key,
             "connected_at": datetime.utcnow(),
@@ -61,13 +66,14 @@ class WebSocketManager:
             self.active_connections[room_key].discard(websocket)
         if websocket in self.connection_metadata:
             del self.connection_metadata[websocket]
+            websocket_connections.dec()
     
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """Send message to specific WebSocket"""
         try:
             await websocket.send_json(message)
         except Exception as e:
-            logger.error("Error sending WebSocket message", error=str(e), exc_info=True)
+            logger.error(f"Error sending WebSocket message: {e}", exc_info=True)
             # Remove disconnected websocket
             if websocket in self.connection_metadata:
                 room_key = self.connection_metadata[websocket].get("room_key", "default")
@@ -83,7 +89,7 @@ class WebSocketManager:
             try:
                 await websocket.send_json(message)
             except Exception as e:
-                logger.error("Error broadcasting WebSocket message", error=str(e), room_key=room_key, exc_info=True)
+                logger.error(f"Error broadcasting WebSocket message (room_key={room_key}): {e}", exc_info=True)
                 disconnected.add(websocket)
         
         # Remove disconnected connections
@@ -107,6 +113,7 @@ class WebSocketManager:
         
         # Handle client message
         if message_type == "client.message":
+            received_at = time.perf_counter()
             text = data.get("text", "")
             if not text:
                 return
@@ -123,7 +130,7 @@ class WebSocketManager:
                 await redis_conn.setex(dedup_key, 300, "1")  # 5 minutes TTL
             except Exception as e:
                 # If Redis fails, continue without deduplication
-                logger.warning("Redis deduplication error", error=str(e), exc_info=True)
+                logger.warning(f"Redis deduplication error: {e}", exc_info=True)
             
             # Send typing indicator
             await self.send_personal_message({
@@ -131,6 +138,12 @@ class WebSocketManager:
                 "is_typing": True
             }, websocket)
             
+            # Streaming clients get server.start / server.delta / server.done frames
+            if data.get("stream"):
+                await self.stream_response(websocket, text, room_key, received_at)
+                metadata["last_ping"] = time.time()
+                return
+            
             # Process message through orchestrator
             try:
                 response = await self.orchestrator.process_message(
@@ -149,7 +162,7 @@ class WebSocketManager:
                 }, websocket)
                 
             except Exception as e:
-                logger.error("Error processing WebSocket message", error=str(e), room_key=room_key, exc_info=True)
+                logger.error(f"Error processing WebSocket message (room_key={room_key}): {e}", exc_info=True)
                 await self.send_personal_message({
                     "type": "server.error",
                     "message": "Bir hata oluştu. Lütfen tekrar deneyin.",
@@ -166,6 +179,74 @@ class WebSocketManager:
         # Update last ping
         metadata["last_ping"] = time.time()
     
+    async def stream_response(self, websocket: WebSocket, text: str, room_key: str, received_at: float):
+        """
+        Stream the reply as it is generated:
+            server.start  {message_id, sources, context}  (sources up front)
+            server.delta  {message_id, delta}              (coalesced every WS_STREAM_FLUSH_MS)
+            server.done   {message_id, message, sources, context}
+        """
+        message_id = uuid.uuid4().hex
+        source = "unknown"
+        first_delta = True
+        frames = coalesce_deltas(
+            self.orchestrator.stream_message(text=text, room_key=room_key),
+            settings.WS_STREAM_FLUSH_MS
+        )
+        try:
+            async for event in frames:
+                if event["type"] == "start":
+                    source = event["data"]["context"].get("source", "unknown")
+                    frame = {
+                        "type": "server.start",
+                        "message_id": message_id,
+                        "sources": event["data"]["sources"],
+                        "context": event["data"]["context"]
+                    }
+                elif event["type"] == "delta":
+                    if first_delta:
+                        first_delta = False
+                        ttft = time.perf_counter() - received_at
+                        chat_time_to_first_token.labels(channel="websocket", source=source).observe(ttft)
+                        logger.info(f"First token sent (room_key={room_key}, source={source}, ttft_ms={round(ttft * 1000)})")
+                    frame = {
+                        "type": "server.delta",
+                        "message_id": message_id,
+                        "delta": event["data"]
+                    }
+                else:
+                    frame = {
+                        "type": "server.done",
+                        "message_id": message_id,
+                        "message": event["data"]["text"],
+                        "sources": event["data"]["sources"],
+                        "context": event["data"]["context"],
+                        "timestamp": datetime.utcnow().isoformat()
+                    }
+                
+                await self.send_personal_message(frame, websocket)
+                if websocket not in self.connection_metadata:
+                    # Client went away; stop generating
+                    break
+        
+        except Exception as e:
+            logger.error(f"Error streaming WebSocket response (room_key={room_key}): {e}", exc_info=True)
+            await self.send_personal_message({
+                "type": "server.error",
+                "message_id": message_id,
+                "message": "Bir hata oluştu. Lütfen tekrar deneyin.",
+                "code": "PROCESSING_ERROR"
+            }, websocket)
+        
+        finally:
+            # Also cancels the LLM stream if the client went away
+            await frames.aclose()
+            # Stop typing indicator
+            await self.send_personal_message({
+                "type": "server.typing",
+                "is_typing": False
+            }, websocket)
+    
     async def check_timeouts(self):
         """Check for idle connections and timeouts"""
         current_time = time.time()
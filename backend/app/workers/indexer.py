@@ -8,15 +8,26 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from rq import Worker, Queue, Connection
+from rq import Worker, Queue, Connection, Retry, get_current_job
 from redis import Redis
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import select
+from sqlalchemy import select, update, delete, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import argparse
 import asyncio
+import time
 
 from app.config import settings
 from app.models.kb_document import KBDocument, DocumentStatus
+from app.models.kb_chunk import KBChunk
+from app.models.kb_embedding import KBEmbedding
 from app.services.rag_service import rag_service
+from app.services.chunking import split_text
+from app.services.bulk_ingest import record_ingest_progress
+from app.services.embedding_versions import get_indexing_models
+from app.services.semantic_cache import bump_kb_version
+from app.services.circuit_breaker import CircuitOpenError, TRANSIENT_ERRORS
 from app.core.logging import setup_logging, get_logger
 
 # Setup logging
@@ -27,10 +38,227 @@ logger = get_logger(__name__)
 redis_conn = Redis.from_url(settings.REDIS_URL)
 indexer_queue = Queue("indexer", connection=redis_conn)
 
+# Embeddings API request limits: inputs per request and a token budget per request
+MAX_INPUTS_PER_REQUEST = 2048
+
+
+def token_batches(chunks: List[Dict], max_tokens: int, max_items: int = MAX_INPUTS_PER_REQUEST) -> List[List[Dict]]:
+    """Pack chunks into embedding request batches bounded by total tokens and input count"""
+    batches: List[List[Dict]] = []
+    current: List[Dict] = []
+    current_tokens = 0
+    for chunk in chunks:
+        if current and (current_tokens + chunk["token_count"] > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(chunk)
+        current_tokens += chunk["token_count"]
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def embed_chunks(
+    chunks: List[Dict],
+    max_batch_tokens: Optional[int] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    model: Optional[str] = None
+) -> List[List[float]]:
+    """Embed chunk contents in batched API calls sized by token count, keeping input order"""
+    max_batch_tokens = max_batch_tokens or settings.INDEXER_MAX_BATCH_TOKENS
+    semaphore = semaphore or asyncio.Semaphore(1)
+    
+    async def embed_batch(batch: List[Dict]) -> List[List[float]]:
+        async with semaphore:
+            return await rag_service.get_embeddings([chunk["content"] for chunk in batch], model)
+    
+    results = await asyncio.gather(*(embed_batch(batch) for batch in token_batches(chunks, max_batch_tokens)))
+    embeddings = [embedding for batch in results for embedding in batch]
+    if len(embeddings) != len(chunks):
+        raise Exception("Failed to generate embeddings")
+    return embeddings
+
+
+async def resolve_embeddings(
+    db: AsyncSession,
+    chunks: List[Dict],
+    max_batch_tokens: Optional[int] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    model: Optional[str] = None
+) -> Tuple[List[List[float]], int]:
+    """
+    Get embeddings for chunks, reusing the (content_hash, model) embedding store
+    and calling the API only for content that was never embedded with this model
+    Returns: (embeddings in chunk order, number of reused embeddings)
+    """
+    model = model or settings.RAG_EMBEDDING_MODEL
+    hashes = list({chunk["content_hash"] for chunk in chunks})
+    known: Dict[str, List[float]] = {}
+    if hashes:
+        result = await db.execute(
+            select(KBEmbedding.content_hash, KBEmbedding.embedding)
+            .where(KBEmbedding.model == model)
+            .where(KBEmbedding.content_hash.in_(hashes))
+        )
+        known = {row.content_hash: row.embedding for row in result}
+    
+    # Each distinct missing text is embedded once, even if repeated across documents
+    missing: Dict[str, Dict] = {}
+    for chunk in chunks:
+        if chunk["content_hash"] not in known:
+            missing.setdefault(chunk["content_hash"], chunk)
+    
+    if missing:
+        new_embeddings = await embed_chunks(list(missing.values()), max_batch_tokens, semaphore, model)
+        rows = [
+            {"content_hash": content_hash, "model": model, "embedding": embedding}
+            for content_hash, embedding in zip(missing.keys(), new_embeddings)
+        ]
+        await db.execute(pg_insert(KBEmbedding).values(rows).on_conflict_do_nothing())
+        known.update((row["content_hash"], row["embedding"]) for row in rows)
+    
+    reused = sum(1 for chunk in chunks if chunk["content_hash"] not in missing)
+    return [known[chunk["content_hash"]] for chunk in chunks], reused
+
+
+async def resolve_version_embeddings(
+    db: AsyncSession,
+    chunks: List[Dict],
+    models: List[str],
+    max_batch_tokens: Optional[int] = None,
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> Tuple[Dict[str, List[List[float]]], int]:
+    """
+    Get embeddings for chunks with every live embedding version (active + building)
+    Returns: ({model: embeddings in chunk order}, number of reused embeddings)
+    """
+    embeddings: Dict[str, List[List[float]]] = {}
+    reused = 0
+    for model in models:
+        embeddings[model], model_reused = await resolve_embeddings(db, chunks, max_batch_tokens, semaphore, model)
+        reused += model_reused
+    return embeddings, reused
+
+
+def chunk_rows(
+    doc_id,
+    search_config: str,
+    chunks: List[Dict],
+    embeddings: List[List[float]],
+    model: str
+) -> List[Dict]:
+    """kb_chunks rows for one document and embedding version"""
+    return [
+        {
+            "document_id": doc_id,
+            "chunk_index": chunk["index"],
+            "content": chunk["content"],
+            "token_count": chunk["token_count"],
+            "content_hash": chunk["content_hash"],
+            "embedding": embedding,
+            "embedding_model": model,
+            "search_config": search_config
+        }
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
+
+
+async def write_chunks(db: AsyncSession, documents: List[Tuple]):
+    """
+    Replace the chunks of several documents (all embedding versions) and mark them indexed
+    documents: [(doc_id, search_config, chunks, {model: embeddings}), ...]
+    One DELETE, one multi-row INSERT and one UPDATE regardless of batch size
+    """
+    if not documents:
+        return
+    doc_ids = [doc_id for doc_id, _, _, _ in documents]
+    rows = [
+        row
+        for doc_id, search_config, chunks, embeddings in documents
+        for model, model_embeddings in embeddings.items()
+        for row in chunk_rows(doc_id, search_config, chunks, model_embeddings, model)
+    ]
+    await db.execute(delete(KBChunk).where(KBChunk.document_id.in_(doc_ids)))
+    if rows:
+        await db.execute(insert(KBChunk), rows)
+    await db.execute(
+        update(KBDocument)
+        .where(KBDocument.id.in_(doc_ids))
+        .values(status=DocumentStatus.INDEXED)
+    )
+
+
+async def index_rows(
+    db: AsyncSession,
+    documents: List,
+    max_batch_tokens: Optional[int] = None,
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> Tuple[int, int, int, int]:
+    """
+    Chunk, embed and write a set of claimed document rows (id, content, search_config)
+    in the caller's transaction. Documents without indexable content are marked FAILED.
+    Returns (indexed, chunks, reused embeddings, failed); raises on embedding API errors.
+    """
+    chunked = [(doc, split_text(doc.content)) for doc in documents]
+    empty_ids = [doc.id for doc, chunks in chunked if not chunks]
+    chunked = [(doc, chunks) for doc, chunks in chunked if chunks]
+    all_chunks = [chunk for _, chunks in chunked for chunk in chunks]
+    
+    models = await get_indexing_models(db)
+    embeddings, reused = await resolve_version_embeddings(db, all_chunks, models, max_batch_tokens, semaphore)
+    
+    written = []
+    offset = 0
+    for doc, chunks in chunked:
+        written.append((doc.id, doc.search_config, chunks, {
+            model: model_embeddings[offset:offset + len(chunks)]
+            for model, model_embeddings in embeddings.items()
+        }))
+        offset += len(chunks)
+    
+    await write_chunks(db, written)
+    if empty_ids:
+        await db.execute(
+            update(KBDocument)
+            .where(KBDocument.id.in_(empty_ids))
+            .values(status=DocumentStatus.FAILED)
+        )
+    return len(written), len(all_chunks), reused, len(empty_ids)
+
+
+async def isolate_failures(
+    db: AsyncSession,
+    documents: List,
+    process: Callable[[List], Awaitable],
+    on_error: Callable[[object, Exception], Awaitable]
+) -> List:
+    """
+    Run process(documents) in a savepoint. If it fails with a non-transient error
+    the rows are split in halves and retried down to single documents, so one bad
+    document does not hold back the rest of its batch; on_error(doc, error) is
+    awaited for each document that fails on its own. Transient errors (API
+    outage, open circuit) are raised for the caller to retry the whole batch.
+    Returns the results of the successful process calls.
+    """
+    try:
+        async with db.begin_nested():
+            return [await process(documents)]
+    except (CircuitOpenError,) + TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        if len(documents) == 1:
+            await on_error(documents[0], e)
+            return []
+        middle = len(documents) // 2
+        return (
+            await isolate_failures(db, documents[:middle], process, on_error)
+            + await isolate_failures(db, documents[middle:], process, on_error)
+        )
+
 
 async def index_document(doc_id: str):
     """
-    Index a document: Generate embedding and update database
+    Index a document: Split into chunks, embed them and update database
     """
     # Create database session
     database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
@@ -45,39 +273,34 @@ async def index_document(doc_id: str):
         doc = result.scalar_one_or_none()
         
         if not doc:
-            logger.warning("Document not found", doc_id=doc_id)
+            logger.warning(f"Document not found (doc_id={doc_id})")
             return
         
         if doc.status == DocumentStatus.INDEXED:
-            logger.info("Document already indexed", doc_id=doc_id)
+            logger.info(f"Document already indexed (doc_id={doc_id})")
             return
         
         try:
-            # Generate embedding
-            logger.info("Generating embedding for document", doc_id=doc_id, content_length=len(doc.content))
-            embedding = await rag_service.get_embedding(doc.content)
+            # Split into token-bounded passages so long documents stay under the
+            # embedding model's input limit and search returns small passages
+            chunks = split_text(doc.content)
+            if not chunks:
+                raise Exception("Document has no indexable content")
             
-            if not embedding:
-                raise Exception("Failed to generate embedding")
+            logger.info(f"Generating embeddings for document (doc_id={doc_id}, content_length={len(doc.content)}, chunks={len(chunks)})")
+            models = await get_indexing_models(db)
+            embeddings, reused = await resolve_version_embeddings(db, chunks, models)
             
-            # Update document with embedding (as array)
-            # PostgreSQL will handle the conversion to vector type if pgvector extension is active
-            from sqlalchemy import update
-            await db.execute(
-                update(KBDocument)
-                .where(KBDocument.id == doc_id)
-                .values(
-                    embedding=embedding,
-                    status=DocumentStatus.INDEXED
-                )
-            )
+            # Replace previous passages of this document
+            await write_chunks(db, [(doc.id, doc.search_config, chunks, embeddings)])
             
             await db.commit()
-            logger.info("Document indexed successfully", doc_id=doc_id, embedding_dim=len(embedding))
+            bump_kb_version(redis_conn)
+            logger.info(f"Document indexed successfully (doc_id={doc_id}, chunks={len(chunks)}, reused_embeddings={reused})")
             
         except Exception as e:
-            logger.error("Error indexing document", doc_id=doc_id, error=str(e), exc_info=True)
-            from sqlalchemy import update
+            logger.error(f"Error indexing document (doc_id={doc_id}): {e}", exc_info=True)
+            await db.rollback()
             await db.execute(
                 update(KBDocument)
                 .where(KBDocument.id == doc_id)
@@ -89,23 +312,276 @@ async def index_document(doc_id: str):
     await engine.dispose()
 
 
+def last_job_attempt() -> bool:
+    """Whether the running RQ job has no retries left (True outside an RQ job)"""
+    job = get_current_job()
+    return job is None or not job.retries_left
+
+
+async def index_documents(doc_ids: List[str], ingest_job_id: Optional[str] = None):
+    """
+    Index a batch of documents in one job (bulk ingest path)
+    
+    Rows already claimed by another indexer are skipped; documents that are no
+    longer pending were handled elsewhere. A document that fails on its own is
+    isolated from the rest of the batch and left pending for the job's next
+    attempt (enqueue_documents retries the job up to INDEXER_MAX_ATTEMPTS
+    times); on the last attempt it is marked FAILED. Transient API failures
+    leave the whole batch pending. Bulk ingest progress counters are updated
+    with what each attempt completed.
+    """
+    database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+    engine = create_async_engine(database_url)
+    AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(KBDocument.id, KBDocument.content, KBDocument.search_config)
+                .where(KBDocument.id.in_(doc_ids), KBDocument.status == DocumentStatus.PENDING)
+                .with_for_update(skip_locked=True)
+            )
+            documents = result.all()
+            if not documents:
+                await db.rollback()
+                return
+            
+            give_up = last_job_attempt()
+            retrying = []
+            given_up = 0
+            
+            async def index(rows):
+                return await index_rows(db, rows)
+            
+            async def on_error(doc, error):
+                nonlocal given_up
+                if not give_up:
+                    logger.error(f"Indexing document {doc.id} failed, will retry: {error}")
+                    retrying.append(doc.id)
+                    return
+                logger.error(f"Indexing document {doc.id} failed on the last attempt, marking it FAILED: {error}")
+                await db.execute(
+                    update(KBDocument)
+                    .where(KBDocument.id == doc.id)
+                    .values(status=DocumentStatus.FAILED)
+                )
+                given_up += 1
+            
+            try:
+                results = await isolate_failures(db, documents, index, on_error)
+            except Exception as e:
+                # Transient API failure: release the row locks, documents stay pending
+                logger.error(f"Embedding batch of {len(documents)} documents failed, will retry: {e}", exc_info=True)
+                await db.rollback()
+                raise
+            await db.commit()
+            indexed, chunks, reused, failed = (sum(column) for column in zip((0, 0, 0, 0), *results))
+            failed += given_up
+            if indexed:
+                bump_kb_version(redis_conn)
+            
+            logger.info(
+                f"Indexed document batch: {indexed} documents, {chunks} chunks "
+                f"({reused} embeddings reused), {failed} failed, {len(retrying)} to retry"
+            )
+            if ingest_job_id:
+                record_ingest_progress(redis_conn, ingest_job_id, indexed=indexed, failed=failed)
+            if retrying:
+                # Let RQ retry the job; only the documents still pending are claimed again
+                raise Exception(f"{len(retrying)} documents failed to index: {retrying}")
+    finally:
+        await engine.dispose()
+
+
+class BatchIndexer:
+    """
+    Long-lived, async-native indexer
+    
+    Keeps one database engine and one OpenAI HTTP client for its lifetime.
+    Each of `concurrency` loops claims up to `batch_size` pending documents
+    (FOR UPDATE SKIP LOCKED, so loops and processes never share work), embeds
+    all of their chunks in token-sized batched API calls and writes the result
+    back in a single transaction. Transient API failures leave the batch pending;
+    a document that fails on its own `max_attempts` times is marked FAILED.
+    """
+    
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        max_attempts: Optional[int] = None
+    ):
+        self.batch_size = batch_size or settings.INDEXER_BATCH_SIZE
+        self.concurrency = concurrency or settings.INDEXER_CONCURRENCY
+        self.max_batch_tokens = max_batch_tokens or settings.INDEXER_MAX_BATCH_TOKENS
+        self.poll_interval = settings.INDEXER_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.max_attempts = max_attempts or settings.INDEXER_MAX_ATTEMPTS
+        
+        database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+        self.engine = create_async_engine(database_url, pool_size=self.concurrency + 1, pool_pre_ping=True)
+        self.session_factory = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.stats = {"documents": 0, "chunks": 0, "reused": 0, "failed": 0, "api_errors": 0}
+        self.attempts: Dict = {}  # document id -> failed attempts so far
+    
+    async def _document_failed(self, db: AsyncSession, doc, error: Exception) -> int:
+        """Count a failed attempt for a document; mark it FAILED when out of attempts"""
+        attempts = self.attempts.get(doc.id, 0) + 1
+        if attempts < self.max_attempts:
+            self.attempts[doc.id] = attempts
+            logger.error(f"Indexing document {doc.id} failed (attempt {attempts}/{self.max_attempts}), will retry: {error}")
+            return 0
+        self.attempts.pop(doc.id, None)
+        logger.error(f"Indexing document {doc.id} failed {attempts} times, marking it FAILED: {error}")
+        await db.execute(
+            update(KBDocument)
+            .where(KBDocument.id == doc.id)
+            .values(status=DocumentStatus.FAILED)
+        )
+        return 1
+    
+    async def process_batch(self, semaphore: asyncio.Semaphore) -> int:
+        """
+        Claim and index one batch of pending documents
+        Returns number claimed, or -1 if none of them could be indexed or given up on
+        """
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(KBDocument.id, KBDocument.content, KBDocument.search_config)
+                .where(KBDocument.status == DocumentStatus.PENDING)
+                .order_by(KBDocument.created_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            documents = result.all()
+            if not documents:
+                await db.rollback()
+                return 0
+            
+            retrying = set()
+            given_up = 0
+            
+            async def index(rows):
+                return await index_rows(db, rows, self.max_batch_tokens, semaphore)
+            
+            async def on_error(doc, error):
+                nonlocal given_up
+                self.stats["api_errors"] += 1
+                if await self._document_failed(db, doc, error):
+                    given_up += 1
+                else:
+                    retrying.add(doc.id)
+            
+            try:
+                results = await isolate_failures(db, documents, index, on_error)
+            except Exception as e:
+                # Transient API failure: release the row locks, documents stay pending
+                logger.error(f"Embedding batch failed, will retry: {e}", exc_info=True)
+                self.stats["api_errors"] += 1
+                await db.rollback()
+                return -1
+            await db.commit()
+            indexed, chunks, reused, failed = (sum(column) for column in zip((0, 0, 0, 0), *results))
+            failed += given_up
+            if indexed:
+                bump_kb_version(redis_conn)
+        
+        for doc in documents:
+            if doc.id not in retrying:
+                self.attempts.pop(doc.id, None)
+        self.stats["documents"] += indexed
+        self.stats["chunks"] += chunks
+        self.stats["reused"] += reused
+        self.stats["failed"] += failed
+        logger.info(
+            f"Indexed batch: {indexed} documents, {chunks} chunks "
+            f"({reused} embeddings reused), {failed} failed, {len(retrying)} to retry"
+        )
+        if not indexed and not failed:
+            return -1
+        return len(documents)
+    
+    async def _loop(self, semaphore: asyncio.Semaphore, once: bool):
+        failed_cycles = 0
+        while True:
+            claimed = await self.process_batch(semaphore)
+            if claimed > 0:
+                failed_cycles = 0
+                continue
+            if claimed == 0 and once:
+                return
+            if claimed < 0:
+                failed_cycles += 1
+                if once and failed_cycles >= self.max_attempts:
+                    # Embedding API still failing: leave the rest pending for the next run
+                    logger.error(f"Giving up after {failed_cycles} failed batches in a row")
+                    return
+            await asyncio.sleep(self.poll_interval)
+    
+    async def run(self, once: bool = False):
+        """Index pending documents until stopped (or until none are left if once=True)"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start_time = time.time()
+        try:
+            await asyncio.gather(*(self._loop(semaphore, once) for _ in range(self.concurrency)))
+        finally:
+            await self.engine.dispose()
+            elapsed = time.time() - start_time
+            logger.info(
+                f"Batch indexer stopped: {self.stats['documents']} documents, {self.stats['chunks']} chunks "
+                f"({self.stats['reused']} embeddings reused), {self.stats['failed']} failed in {elapsed:.1f}s"
+            )
+
+
 def index_document_sync(doc_id: str):
     """Synchronous wrapper for index_document"""
     asyncio.run(index_document(doc_id))
 
 
+def index_documents_sync(doc_ids: List[str], ingest_job_id: Optional[str] = None):
+    """Synchronous wrapper for index_documents"""
+    asyncio.run(index_documents(doc_ids, ingest_job_id))
+
+
 def enqueue_document(doc_id: str, path: str = None):
     """
     Enqueue a document for indexing
     """
     job = indexer_queue.enqueue(index_document_sync, doc_id)
-    logger.info("Document enqueued for indexing", doc_id=doc_id, job_id=job.id)
+    logger.info(f"Document enqueued for indexing (doc_id={doc_id}, job_id={job.id})")
+    return job.id
+
+
+def enqueue_documents(doc_ids: List[str], ingest_job_id: Optional[str] = None):
+    """
+    Enqueue a batch of documents as a single indexing job
+    """
+    job = indexer_queue.enqueue(
+        index_documents_sync,
+        doc_ids,
+        ingest_job_id,
+        retry=Retry(max=max(settings.INDEXER_MAX_ATTEMPTS - 1, 1), interval=settings.INDEXER_RETRY_INTERVAL)
+    )
+    logger.info(f"Document batch enqueued for indexing (documents={len(doc_ids)}, job_id={job.id})")
     return job.id
 
 
 if __name__ == "__main__":
-    # Start RQ worker
-    with Connection(redis_conn):
-        worker = Worker([indexer_queue])
-        worker.work()
+    parser = argparse.ArgumentParser(description="Knowledge base indexer")
+    parser.add_argument("--batch", action="store_true", help="Run the long-lived batch indexer instead of an RQ worker")
+    parser.add_argument("--once", action="store_true", help="Batch mode: exit when no pending documents are left")
+    parser.add_argument("--batch-size", type=int, default=None, help="Documents claimed per cycle")
+    parser.add_argument("--concurrency", type=int, default=None, help="Concurrent batches / embedding requests")
+    args = parser.parse_args()
+    
+    if args.batch:
+        indexer = BatchIndexer(batch_size=args.batch_size, concurrency=args.concurrency)
+        asyncio.run(indexer.run(once=args.once))
+    else:
+        # Start RQ worker
+        with Connection(redis_conn):
+            worker = Worker([indexer_queue])
+            # The scheduler requeues retried bulk jobs after INDEXER_RETRY_INTERVAL
+            worker.work(with_scheduler=True)
 
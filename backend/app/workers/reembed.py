@@ -0,0 +1,433 @@
+"""
+Re-embedding Worker - Build a new embedding version in the background, then flip to it
+
+    python -m app.workers.reembed --model text-embedding-3-large   # build, activate, clean up
+    python -m app.workers.reembed --status                         # coverage per version
+
+While the new version is built the active version keeps serving queries, and
+the indexer embeds new / changed documents with both. Activation is a single
+transaction on kb_embedding_versions; API processes pick it up within
+RAG_EMBEDDING_VERSION_REFRESH seconds, after which the retired version's chunks
+are deleted.
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import select, update, func, text, and_, exists
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, Iterable, Optional, Set
+import argparse
+import asyncio
+import time
+import uuid
+import redis.asyncio as redis
+
+from app.config import settings
+from app.models.kb_document import KBDocument, DocumentStatus
+from app.models.kb_chunk import KBChunk
+from app.models.kb_embedding_version import KBEmbeddingVersion
+from app.services.rag_service import rag_service
+from app.services.chunking import split_text
+from app.services.embedding_versions import ACTIVE, BUILDING, RETIRED
+from app.workers.indexer import resolve_embeddings, chunk_rows, isolate_failures
+from app.core.logging import setup_logging, get_logger
+
+# Setup logging
+setup_logging(level="INFO", json_format=False)
+logger = get_logger(__name__)
+
+CLEANUP_BATCH = 5000
+
+# Redis client for documents skipped by a build (read again by a standalone --activate)
+_redis_reembed: Optional[redis.Redis] = None
+
+
+async def get_redis_reembed():
+    """Get Redis client for re-embedding state"""
+    global _redis_reembed
+    if _redis_reembed is None:
+        _redis_reembed = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_reembed
+
+
+def missing_version(model: str):
+    """Indexed documents that have no chunks for the given embedding version yet"""
+    return and_(
+        KBDocument.status == DocumentStatus.INDEXED,
+        ~exists().where(and_(KBChunk.document_id == KBDocument.id, KBChunk.embedding_model == model))
+    )
+
+
+class ReembedJob:
+    """
+    Re-embed the knowledge base with `model` in batches
+
+    Loops claim indexed documents that have no chunks for the target version
+    (FOR UPDATE SKIP LOCKED, so they never collide with each other or with the
+    indexer), embed their chunks through the (content_hash, model) store and
+    insert them as the target version. Throughput and ETA are logged every
+    `report_interval` seconds. Documents without chunks, and documents that fail
+    on their own `max_attempts` times, are skipped; the skip list is kept in
+    Redis (reembed:{model}:skipped) so activation in a later process sees it.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        report_interval: float = 30,
+        max_attempts: Optional[int] = None
+    ):
+        self.model = model
+        self.batch_size = batch_size or settings.INDEXER_BATCH_SIZE
+        self.concurrency = concurrency or settings.INDEXER_CONCURRENCY
+        self.max_batch_tokens = max_batch_tokens or settings.INDEXER_MAX_BATCH_TOKENS
+        self.report_interval = report_interval
+        self.max_attempts = max_attempts or settings.INDEXER_MAX_ATTEMPTS
+        self.skipped_key = f"reembed:{model}:skipped"
+
+        database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+        self.engine = create_async_engine(database_url, pool_size=self.concurrency + 1, pool_pre_ping=True)
+        self.session_factory = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.stats = {"documents": 0, "chunks": 0, "tokens": 0, "reused": 0, "skipped": 0, "api_errors": 0}
+        self.remaining = 0
+        self.attempts: Dict = {}  # document id -> failed attempts so far
+        self._skipped: Set = set()  # Documents without chunks or out of attempts
+        self._started_at = 0.0
+
+    async def register(self):
+        """Register the target version as building (dimension-checked against the vector column)"""
+        probe = await rag_service.get_embeddings(["dimension check"], self.model)
+        if len(probe[0]) != settings.RAG_EMBEDDING_DIMENSIONS:
+            raise ValueError(
+                f"{self.model} returns {len(probe[0])}-dimensional vectors, "
+                f"kb_chunks.embedding is vector({settings.RAG_EMBEDDING_DIMENSIONS})"
+            )
+
+        async with self.session_factory() as db:
+            current = await db.scalar(
+                select(KBEmbeddingVersion.status).where(KBEmbeddingVersion.model == self.model)
+            )
+            if current == ACTIVE:
+                raise ValueError(f"{self.model} is already the active embedding version")
+            await db.execute(
+                pg_insert(KBEmbeddingVersion)
+                .values(model=self.model, status=BUILDING)
+                .on_conflict_do_update(index_elements=["model"], set_={"status": BUILDING})
+            )
+            await db.commit()
+        # A new build retries documents skipped by earlier ones
+        await self._clear_skipped()
+
+    async def skip(self, doc_ids: Iterable, reason: str):
+        """Leave documents out of this version (and out of the activation check)"""
+        doc_ids = [doc_id for doc_id in doc_ids if doc_id not in self._skipped]
+        if not doc_ids:
+            return
+        self._skipped.update(doc_ids)
+        self.stats["skipped"] += len(doc_ids)
+        logger.warning(f"Skipping {len(doc_ids)} documents for {self.model}: {reason}")
+        try:
+            redis_client = await get_redis_reembed()
+            await redis_client.sadd(self.skipped_key, *(str(doc_id) for doc_id in doc_ids))
+        except Exception as e:
+            logger.warning(f"Failed to record skipped documents: {e}")
+
+    async def load_skipped(self) -> Set:
+        """Documents skipped by this job or by an earlier build of the same version"""
+        try:
+            redis_client = await get_redis_reembed()
+            stored = await redis_client.smembers(self.skipped_key)
+        except Exception as e:
+            logger.warning(f"Failed to read skipped documents: {e}")
+            stored = set()
+        return self._skipped | {uuid.UUID(doc_id) for doc_id in stored}
+
+    async def _clear_skipped(self):
+        try:
+            redis_client = await get_redis_reembed()
+            await redis_client.delete(self.skipped_key)
+        except Exception as e:
+            logger.warning(f"Failed to clear skipped documents: {e}")
+
+    def _missing(self, skipped: Set):
+        condition = missing_version(self.model)
+        if skipped:
+            condition = and_(condition, KBDocument.id.notin_(skipped))
+        return condition
+
+    async def count_remaining(self) -> int:
+        """Documents still missing the target version, not counting skipped ones"""
+        async with self.session_factory() as db:
+            return await db.scalar(
+                select(func.count()).select_from(KBDocument).where(self._missing(self._skipped))
+            )
+
+    async def _document_failed(self, doc, error: Exception) -> bool:
+        """Count a failed attempt for a document; skip it when out of attempts"""
+        self.stats["api_errors"] += 1
+        attempts = self.attempts.get(doc.id, 0) + 1
+        if attempts < self.max_attempts:
+            self.attempts[doc.id] = attempts
+            logger.error(f"Re-embedding document {doc.id} failed (attempt {attempts}/{self.max_attempts}), will retry: {error}")
+            return False
+        self.attempts.pop(doc.id, None)
+        await self.skip([doc.id], f"failed {attempts} times: {error}")
+        return True
+
+    async def _embed(self, db: AsyncSession, chunked, semaphore: asyncio.Semaphore):
+        """Embed and insert the target version's chunks of [(doc, chunks), ...]"""
+        all_chunks = [chunk for _, chunks in chunked for chunk in chunks]
+        embeddings, reused = await resolve_embeddings(
+            db, all_chunks, self.max_batch_tokens, semaphore, self.model
+        )
+        rows = []
+        offset = 0
+        for doc, chunks in chunked:
+            rows.extend(chunk_rows(doc.id, doc.search_config, chunks, embeddings[offset:offset + len(chunks)], self.model))
+            offset += len(chunks)
+        if rows:
+            await db.execute(pg_insert(KBChunk).values(rows).on_conflict_do_nothing())
+        return len(chunked), len(all_chunks), sum(chunk["token_count"] for chunk in all_chunks), reused
+
+    async def process_batch(self, semaphore: asyncio.Semaphore) -> int:
+        """
+        Claim and re-embed one batch of documents
+        Returns number claimed, or -1 if none of them could be embedded or skipped
+        """
+        async with self.session_factory() as db:
+            query = (
+                select(KBDocument.id, KBDocument.content, KBDocument.search_config)
+                .where(self._missing(self._skipped))
+                .order_by(KBDocument.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            documents = (await db.execute(query)).all()
+            if not documents:
+                await db.rollback()
+                return 0
+
+            chunked = [(doc, split_text(doc.content)) for doc in documents]
+            empty = [doc.id for doc, chunks in chunked if not chunks]
+            chunked = [(doc, chunks) for doc, chunks in chunked if chunks]
+            retrying = set()
+            given_up = 0
+
+            async def on_error(item, error):
+                nonlocal given_up
+                doc, _ = item
+                if await self._document_failed(doc, error):
+                    given_up += 1
+                else:
+                    retrying.add(doc.id)
+
+            try:
+                results = await isolate_failures(
+                    db, chunked, lambda items: self._embed(db, items, semaphore), on_error
+                )
+            except Exception as e:
+                # Transient API failure: release the row locks and retry later
+                logger.error(f"Re-embedding batch failed, will retry: {e}", exc_info=True)
+                self.stats["api_errors"] += 1
+                await db.rollback()
+                return -1
+            await db.commit()
+
+        await self.skip(empty, "no indexable content")
+        for doc in documents:
+            if doc.id not in retrying:
+                self.attempts.pop(doc.id, None)
+        done, chunks, tokens, reused = (sum(column) for column in zip((0, 0, 0, 0), *results))
+        self.stats["documents"] += done
+        self.stats["chunks"] += chunks
+        self.stats["tokens"] += tokens
+        self.stats["reused"] += reused
+        self.remaining = max(0, self.remaining - done - given_up - len(empty))
+        if not done and not given_up and not empty:
+            return -1
+        return len(documents)
+
+    def progress(self) -> Dict:
+        """Throughput since start and ETA for the remaining documents"""
+        elapsed = max(time.time() - self._started_at, 1e-6)
+        docs_per_second = self.stats["documents"] / elapsed
+        return {
+            **self.stats,
+            "remaining": self.remaining,
+            "elapsed_seconds": round(elapsed, 1),
+            "documents_per_second": round(docs_per_second, 2),
+            "chunks_per_second": round(self.stats["chunks"] / elapsed, 2),
+            "tokens_per_second": round(self.stats["tokens"] / elapsed, 1),
+            "eta_seconds": round(self.remaining / docs_per_second) if docs_per_second else None
+        }
+
+    def _report(self):
+        p = self.progress()
+        eta = f"{p['eta_seconds'] / 60:.1f} min" if p["eta_seconds"] is not None else "unknown"
+        logger.info(
+            f"Re-embedding {self.model}: {p['documents']} done, {p['remaining']} remaining, "
+            f"{p['documents_per_second']} docs/s, {p['tokens_per_second']} tokens/s, "
+            f"{p['reused']} embeddings reused, ETA {eta}"
+        )
+
+    async def _loop(self, semaphore: asyncio.Semaphore) -> bool:
+        """Process batches until none are left (True) or the API keeps failing (False)"""
+        failed_cycles = 0
+        while True:
+            claimed = await self.process_batch(semaphore)
+            if claimed == 0:
+                return True
+            if claimed > 0:
+                failed_cycles = 0
+                continue
+            failed_cycles += 1
+            if failed_cycles >= self.max_attempts:
+                return False
+            await asyncio.sleep(settings.INDEXER_POLL_INTERVAL)
+
+    async def _reporter(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self._report()
+
+    async def activate(self) -> bool:
+        """Atomically make the target version active and retire the previous one"""
+        async with self.session_factory() as db:
+            # Serialize with concurrent activations
+            await db.execute(select(KBEmbeddingVersion.model).with_for_update())
+            skipped = await self.load_skipped()
+            remaining = await db.scalar(
+                select(func.count()).select_from(KBDocument).where(self._missing(skipped))
+            )
+            if remaining > 0:
+                await db.rollback()
+                logger.warning(f"Not activating {self.model}: {remaining} documents still missing")
+                return False
+            await db.execute(
+                update(KBEmbeddingVersion).where(KBEmbeddingVersion.status == ACTIVE).values(status=RETIRED)
+            )
+            await db.execute(
+                update(KBEmbeddingVersion)
+                .where(KBEmbeddingVersion.model == self.model)
+                .values(status=ACTIVE, activated_at=func.now())
+            )
+            await db.commit()
+        if skipped:
+            logger.warning(f"Embedding version {self.model} has no chunks for {len(skipped)} skipped documents")
+        await self._clear_skipped()
+        logger.info(f"Embedding version {self.model} is now active")
+        return True
+
+    async def cleanup(self) -> int:
+        """Delete chunks of retired versions in batches. Returns number deleted."""
+        deleted = 0
+        while True:
+            async with self.session_factory() as db:
+                result = await db.execute(text("""
+                    DELETE FROM kb_chunks
+                    WHERE id IN (
+                        SELECT c.id FROM kb_chunks c
+                        JOIN kb_embedding_versions v ON v.model = c.embedding_model
+                        WHERE v.status = 'retired'
+                        LIMIT :batch
+                    )
+                """), {"batch": CLEANUP_BATCH})
+                await db.commit()
+            if result.rowcount == 0:
+                break
+            deleted += result.rowcount
+        logger.info(f"Deleted {deleted} chunks of retired embedding versions")
+        return deleted
+
+    async def run(self, activate: bool = True) -> Dict:
+        """Build the target version; optionally activate it and clean up the old one"""
+        try:
+            await self.register()
+            self.remaining = await self.count_remaining()
+            logger.info(f"Re-embedding {self.remaining} documents with {self.model}")
+            self._started_at = time.time()
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            reporter = asyncio.create_task(self._reporter())
+            try:
+                # Documents indexed with only the old version while we ran are
+                # picked up by the next pass
+                while True:
+                    finished = await asyncio.gather(*(self._loop(semaphore) for _ in range(self.concurrency)))
+                    if not all(finished):
+                        logger.error(f"Embedding API keeps failing, stopping; run again to resume {self.model}")
+                        activate = False
+                        break
+                    self.remaining = await self.count_remaining()
+                    if self.remaining <= 0:
+                        break
+            finally:
+                reporter.cancel()
+            self._report()
+
+            if activate and await self.activate():
+                # Let API processes drop their cached active version before deleting
+                await asyncio.sleep(settings.RAG_EMBEDDING_VERSION_REFRESH * 2)
+                await self.cleanup()
+            return self.progress()
+        finally:
+            await self.engine.dispose()
+
+
+async def show_status():
+    """Print coverage of each embedding version"""
+    database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+    engine = create_async_engine(database_url)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        async with session_factory() as db:
+            total = await db.scalar(
+                select(func.count()).select_from(KBDocument).where(KBDocument.status == DocumentStatus.INDEXED)
+            )
+            versions = (await db.execute(
+                select(KBEmbeddingVersion).order_by(KBEmbeddingVersion.created_at)
+            )).scalars().all()
+            print(f"{total} indexed documents")
+            for version in versions:
+                covered = await db.scalar(
+                    select(func.count(func.distinct(KBChunk.document_id))).where(KBChunk.embedding_model == version.model)
+                )
+                tokens = await db.scalar(
+                    select(func.coalesce(func.sum(KBChunk.token_count), 0)).where(KBChunk.embedding_model == version.model)
+                )
+                print(f"{version.model:<32} {version.status:<9} {covered:>9} documents  {tokens:>12} tokens")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed the knowledge base with a new embedding model")
+    parser.add_argument("--model", help="Target embedding model")
+    parser.add_argument("--no-activate", action="store_true", help="Build the version but keep the current one active")
+    parser.add_argument("--activate", action="store_true", help="Only activate an already built version")
+    parser.add_argument("--cleanup", action="store_true", help="Only delete chunks of retired versions")
+    parser.add_argument("--status", action="store_true", help="Show embedding version coverage")
+    parser.add_argument("--batch-size", type=int, default=None, help="Documents claimed per cycle")
+    parser.add_argument("--concurrency", type=int, default=None, help="Concurrent batches / embedding requests")
+    args = parser.parse_args()
+
+    if args.status:
+        asyncio.run(show_status())
+        sys.exit(0)
+    if not args.model and not args.cleanup:
+        parser.error("--model is required")
+
+    job = ReembedJob(args.model or settings.RAG_EMBEDDING_MODEL, batch_size=args.batch_size, concurrency=args.concurrency)
+    if args.cleanup:
+        asyncio.run(job.cleanup())
+    elif args.activate:
+        sys.exit(0 if asyncio.run(job.activate()) else 1)
+    else:
+        print(asyncio.run(job.run(activate=not args.no_activate)))
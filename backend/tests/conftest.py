@@ -2,11 +2,14 @@
 Pytest Configuration
 """
 import pytest
+import pytest_asyncio
+import redis.asyncio as redis
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.database import Base, get_db
 from app.main import app
+from app.config import settings
 import os
 
 # Test database URL
@@ -51,3 +54,20 @@ def auth_headers():
     # TODO: Create test token
     return {"Authorization": "Bearer test-token"}
 
+
+
+@pytest_asyncio.fixture
+async def redis_client():
+    """
+    Redis for tests that run Lua scripts or pub/sub: the server at REDIS_URL when
+    reachable, otherwise fakeredis (with Lua support). Tests use their own keys.
+    """
+    client = redis.from_url(settings.REDIS_URL, decode_responses=True, socket_connect_timeout=1)
+    try:
+        await client.ping()
+    except Exception:
+        await client.aclose()
+        fakeredis = pytest.importorskip("fakeredis")
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield client
+    await client.aclose()
@@ -0,0 +1,71 @@
+"""
+Bulk Ingest Tests
+"""
+import uuid
+import pytest
+
+from app.services import bulk_ingest
+from app.services.bulk_ingest import BulkIngest, get_ingest_job, iter_ndjson, valid_job_id
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(chunks, max_line_bytes=1024):
+    return [item async for item in iter_ndjson(stream(*chunks), max_line_bytes=max_line_bytes)]
+
+
+@pytest.mark.asyncio
+async def test_records_split_across_chunks():
+    """Test that lines split across body chunks are reassembled"""
+    results = await collect([b'{"name": "a"}\n{"na', b'me": "b"}\n', b'{"name": "c"}'])
+    assert results == [
+        (1, {"name": "a"}, None),
+        (2, {"name": "b"}, None),
+        (3, {"name": "c"}, None),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_invalid_lines_are_reported_with_line_numbers():
+    """Test that bad lines yield errors and blank lines are skipped"""
+    results = await collect([b'{"name": "a"}\n\nnot json\n[1, 2]\n'])
+    assert results[0] == (1, {"name": "a"}, None)
+    assert results[1][0] == 3 and results[1][1] is None and results[1][2].startswith("Invalid JSON")
+    assert results[2] == (4, None, "Record must be a JSON object")
+
+
+@pytest.mark.asyncio
+async def test_oversized_line_is_skipped():
+    """Test that a line over the limit is rejected without buffering it"""
+    results = await collect([b'{"name": "', b"x" * 64, b"x" * 64, b'"}\n{"name": "b"}\n'], max_line_bytes=32)
+    assert results == [
+        (1, None, "Line exceeds 32 bytes"),
+        (2, {"name": "b"}, None),
+    ]
+
+
+def test_client_job_ids_are_validated():
+    assert valid_job_id("import-2024_01")
+    assert valid_job_id(uuid.uuid4().hex)
+    assert not valid_job_id("short")
+    assert not valid_job_id("kb:ingest:other")
+    assert not valid_job_id("x" * 65)
+
+
+@pytest.mark.asyncio
+async def test_job_is_visible_before_the_body_is_read(redis_client, monkeypatch):
+    """Test that a client-chosen job id can be polled right after start, and is not reused"""
+    async def get_redis():
+        return redis_client
+
+    monkeypatch.setattr(bulk_ingest, "get_redis_ingest", get_redis)
+    job_id = f"test-{uuid.uuid4().hex}"
+    assert await BulkIngest(None, None, job_id=job_id).start()
+    job = await get_ingest_job(job_id)
+    assert job["status"] == "running" and job["received"] == 0
+
+    assert not await BulkIngest(None, None, job_id=job_id).start()
+    await redis_client.delete(bulk_ingest.job_key(job_id))
@@ -0,0 +1,47 @@
+"""
+Chunking Tests
+"""
+from app.core.tokens import count_tokens
+from app.services.chunking import split_text
+
+
+def test_split_text_empty():
+    """Test that empty content produces no chunks"""
+    assert split_text("") == []
+    assert split_text("   \n\n  ") == []
+
+
+def test_split_text_short_document_single_chunk():
+    """Test that a short document stays in one chunk"""
+    chunks = split_text("Kargom nerede? Siparişinizi takip sayfasından izleyebilirsiniz.", max_tokens=200)
+    assert len(chunks) == 1
+    assert chunks[0]["index"] == 0
+    assert "takip" in chunks[0]["content"]
+
+
+def test_split_text_respects_token_budget():
+    """Test that every chunk stays within the token budget"""
+    text = " ".join(f"Sentence number {i} describes step {i} of the setup." for i in range(200))
+    chunks = split_text(text, max_tokens=50, overlap_tokens=10)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk["token_count"] <= 50
+    assert [chunk["index"] for chunk in chunks] == list(range(len(chunks)))
+
+
+def test_split_text_overlap():
+    """Test that consecutive chunks share trailing sentences"""
+    text = " ".join(f"Sentence {i} is here." for i in range(50))
+    chunks = split_text(text, max_tokens=30, overlap_tokens=10)
+    for previous, current in zip(chunks, chunks[1:]):
+        last_sentence = previous["content"].split(". ")[-1]
+        assert last_sentence in current["content"]
+
+
+def test_split_text_hard_splits_long_sentence():
+    """Test that a single sentence longer than the budget is split"""
+    text = "kelime " * 500
+    chunks = split_text(text, max_tokens=40, overlap_tokens=0)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert count_tokens(chunk["content"]) <= 40
@@ -0,0 +1,174 @@
+"""
+Circuit Breaker Tests
+"""
+import asyncio
+import time
+import uuid
+import httpx
+import openai
+import pytest
+
+from app.services import circuit_breaker as cb
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, DistributedCircuitBreaker
+
+
+async def failing():
+    raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+
+
+async def rejected():
+    raise ValueError("bad request")
+
+
+async def ok():
+    return "ok"
+
+
+@pytest.fixture
+def use_redis(redis_client, monkeypatch):
+    async def get_redis():
+        return redis_client
+
+    monkeypatch.setattr(cb, "get_redis_circuit", get_redis)
+    return redis_client
+
+
+def breaker(**kwargs):
+    options = dict(window_seconds=60, min_requests=4, failure_rate=0.5, recovery_timeout=60, half_open_probes=2)
+    options.update(kwargs)
+    return DistributedCircuitBreaker(f"test:{uuid.uuid4().hex}", **options)
+
+
+async def recovery_due(redis_client, circuit):
+    """Put the circuit in OPEN with its recovery timeout already elapsed"""
+    await redis_client.hset(circuit.key, mapping={"state": cb.OPEN, "opened_at": time.time() - 61})
+
+
+@pytest.mark.asyncio
+async def test_local_breaker_opens_and_recovers():
+    """Test the in-process breaker opens after the threshold and closes on a successful probe"""
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    for _ in range(2):
+        with pytest.raises(openai.APIConnectionError):
+            await breaker.call(failing)
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(ok)
+
+    breaker.last_failure_time = time.time() - 61
+    assert await breaker.call(ok) == "ok"
+    assert breaker.state == cb.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_local_state_without_redis(monkeypatch):
+    """Test that calls go through the in-process breaker when Redis is unreachable"""
+    async def no_redis():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(cb, "get_redis_circuit", no_redis)
+    breaker = DistributedCircuitBreaker("test:fallback", recovery_timeout=60)
+    breaker.local.failure_threshold = 1
+    assert await breaker.call(ok) == "ok"
+    with pytest.raises(openai.APIConnectionError):
+        await breaker.call(failing)
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(ok)
+
+
+@pytest.mark.asyncio
+async def test_known_open_circuit_rejects_without_redis(monkeypatch):
+    """Test that a worker that saw the circuit open rejects locally until recovery is due"""
+    async def unexpected():
+        raise AssertionError("Redis should not be consulted")
+
+    monkeypatch.setattr(cb, "get_redis_circuit", unexpected)
+    breaker = DistributedCircuitBreaker("test:open")
+    breaker._open_until = time.time() + 30
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(ok)
+
+
+@pytest.mark.asyncio
+async def test_opens_on_failure_rate(use_redis):
+    """Test that the circuit opens once the window has min_requests calls at the failure rate"""
+    circuit = breaker()
+    assert await circuit.call(ok) == "ok"
+    assert await circuit.call(ok) == "ok"
+    with pytest.raises(openai.APIConnectionError):
+        await circuit.call(failing)
+    assert await use_redis.hget(circuit.key, "state") != cb.OPEN
+
+    with pytest.raises(openai.APIConnectionError):
+        await circuit.call(failing)
+    assert await use_redis.hget(circuit.key, "state") == cb.OPEN
+    # Another worker sees the shared state
+    with pytest.raises(CircuitOpenError):
+        await DistributedCircuitBreaker(circuit.name).call(ok)
+
+
+@pytest.mark.asyncio
+async def test_non_transient_errors_do_not_count(use_redis):
+    """Test that rejected requests (bad request, auth...) never open the circuit"""
+    circuit = breaker()
+    for _ in range(6):
+        with pytest.raises(ValueError):
+            await circuit.call(rejected)
+    assert await use_redis.hget(circuit.key, "state") != cb.OPEN
+    assert await use_redis.zcard(f"{circuit.key}:calls") == 0
+
+
+@pytest.mark.asyncio
+async def test_half_open_admits_limited_probes(use_redis):
+    """Test that HALF_OPEN lets at most half_open_probes calls through at a time"""
+    circuit = breaker()
+    await recovery_due(use_redis, circuit)
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return "ok"
+
+    probes = [asyncio.create_task(circuit.call(slow)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    assert await use_redis.hget(circuit.key, "state") == cb.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        await circuit.call(ok)
+    release.set()
+    assert await asyncio.gather(*probes) == ["ok", "ok"]
+
+
+@pytest.mark.asyncio
+async def test_closes_after_probe_successes(use_redis):
+    """Test that half_open_probes successful probes close the circuit"""
+    circuit = breaker()
+    await recovery_due(use_redis, circuit)
+    assert await circuit.call(ok) == "ok"
+    assert await use_redis.hget(circuit.key, "state") == cb.HALF_OPEN
+    assert await circuit.call(ok) == "ok"
+    assert await use_redis.hget(circuit.key, "state") == cb.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_failed_probe_reopens(use_redis):
+    circuit = breaker()
+    await recovery_due(use_redis, circuit)
+    with pytest.raises(openai.APIConnectionError):
+        await circuit.call(failing)
+    assert await use_redis.hget(circuit.key, "state") == cb.OPEN
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_releases_slot(use_redis):
+    """Test that a cancelled probe frees its slot without deciding the circuit state"""
+    circuit = breaker(half_open_probes=1)
+    await recovery_due(use_redis, circuit)
+    probe = asyncio.create_task(circuit.call(asyncio.sleep, 10))
+    await asyncio.sleep(0.05)
+    assert await use_redis.hget(circuit.key, "probes") == "1"
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    assert await use_redis.hget(circuit.key, "probes") == "0"
+    assert await use_redis.hget(circuit.key, "state") == cb.HALF_OPEN
+    assert await circuit.call(ok) == "ok"
+    assert await use_redis.hget(circuit.key, "state") == cb.CLOSED
@@ -0,0 +1,71 @@
+"""
+Embedding Batcher Tests
+"""
+import asyncio
+import pytest
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+class RecordingEmbedder:
+    """Embeds text as [len(text)] and records each batched call"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, texts, model):
+        self.calls.append((list(texts), model))
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_call():
+    """Test that requests inside the window are sent as one batch"""
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, window_ms=20, max_batch_size=10)
+    results = await asyncio.gather(*(batcher.embed(text, "m1") for text in ["a", "bb", "ccc"]))
+    assert results == [[1.0], [2.0], [3.0]]
+    assert embedder.calls == [(["a", "bb", "ccc"], "m1")]
+
+
+@pytest.mark.asyncio
+async def test_max_batch_size_flushes_early():
+    """Test that a full batch is dispatched without waiting for the window"""
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, window_ms=10_000, max_batch_size=2)
+    results = await asyncio.wait_for(asyncio.gather(batcher.embed("a", "m1"), batcher.embed("bb", "m1")), timeout=1)
+    assert results == [[1.0], [2.0]]
+
+
+@pytest.mark.asyncio
+async def test_duplicate_texts_embedded_once():
+    """Test that identical texts in one batch are sent once"""
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, window_ms=20, max_batch_size=10)
+    results = await asyncio.gather(batcher.embed("same", "m1"), batcher.embed("same", "m1"))
+    assert results == [[4.0], [4.0]]
+    assert embedder.calls == [(["same"], "m1")]
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_every_caller():
+    """Test that a failed batch fails all waiting callers"""
+    async def failing(texts, model):
+        raise RuntimeError("upstream down")
+
+    batcher = EmbeddingBatcher(failing, window_ms=5, max_batch_size=10)
+    results = await asyncio.gather(batcher.embed("a", "m1"), batcher.embed("b", "m1"), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_close_sends_queued_requests():
+    """Test that close() dispatches the pending batch and waits for it"""
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, window_ms=10_000, max_batch_size=10)
+    request = asyncio.create_task(batcher.embed("a", "m1"))
+    await asyncio.sleep(0)
+    await batcher.close()
+    assert embedder.calls == [(["a"], "m1")]
+    assert not batcher._tasks
+    assert await request == [1.0]
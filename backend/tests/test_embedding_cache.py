@@ -0,0 +1,45 @@
+"""
+Embedding Cache Tests
+"""
+import pytest
+
+from app.services.embedding_cache import EmbeddingCache, pack_embedding, unpack_embedding
+
+
+def test_pack_roundtrip():
+    """Test float32 packing keeps values (within float32 precision)"""
+    embedding = [0.125, -0.5, 0.333333]
+    data = pack_embedding(embedding)
+    assert len(data) == 4 * len(embedding)
+    assert unpack_embedding(data) == pytest.approx(embedding, rel=1e-6)
+
+
+@pytest.mark.asyncio
+async def test_local_hit_with_normalized_text():
+    """Test that whitespace/case variants share one entry"""
+    cache = EmbeddingCache(max_size=10, ttl=60, use_redis=False)
+    await cache.set("Kargom  nerede?", [1.0, 2.0], model="m1")
+    assert await cache.get("kargom nerede?", model="m1") == [1.0, 2.0]
+    assert cache.stats["local_hit"] == 1
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction():
+    """Test that the local tier is bounded"""
+    cache = EmbeddingCache(max_size=2, ttl=60, use_redis=False)
+    await cache.set("a", [1.0], model="m1")
+    await cache.set("b", [2.0], model="m1")
+    await cache.get("a", model="m1")
+    await cache.set("c", [3.0], model="m1")
+    assert await cache.get("b", model="m1") is None
+    assert await cache.get("a", model="m1") == [1.0]
+
+
+@pytest.mark.asyncio
+async def test_model_change_invalidates():
+    """Test that vectors from another embedding model are never served"""
+    cache = EmbeddingCache(max_size=10, ttl=60, use_redis=False)
+    await cache.set("a", [1.0], model="m1")
+    assert await cache.get("a", model="m2") is None
+    assert await cache.get("a", model="m1") is None
+    assert cache.stats["miss"] == 2
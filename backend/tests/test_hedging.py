@@ -0,0 +1,78 @@
+"""
+Hedging Tests
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+from app.services.hedging import race_streams
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text, tool_calls=None))])
+
+
+class FakeStream:
+    """Async chunk iterator shaped like an OpenAI stream"""
+
+    def __init__(self, texts, delay):
+        self.texts = texts
+        self.delay = delay
+        self.closed = False
+        self.response = SimpleNamespace(aclose=self.aclose)
+
+    async def aclose(self):
+        self.closed = True
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for text in self.texts:
+            await asyncio.sleep(self.delay)
+            yield chunk(text)
+
+
+def opener(stream, error=None):
+    async def create():
+        if error:
+            raise error
+        return stream
+    return create
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged():
+    """Test that no hedge is fired when the primary streams before the deadline"""
+    primary, hedge = FakeStream(["a"], 0.001), FakeStream(["b"], 0.001)
+    fired = []
+    winner, stream, first, losers = await race_streams(opener(primary), opener(hedge), 0.5, fired.append)
+    assert (winner, stream, losers, fired) == (0, primary, [], [])
+    assert first[0].choices[0].delta.content == "a"
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_loses_to_hedge():
+    """Test that the hedge wins against a slow primary, which is closed"""
+    primary, hedge = FakeStream(["a"], 0.5), FakeStream(["b"], 0.001)
+    fired = []
+    winner, stream, first, losers = await race_streams(opener(primary), opener(hedge), 0.02, fired.append)
+    assert (winner, stream, losers, fired) == (1, hedge, [0], ["fired"])
+    assert primary.closed
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back():
+    """Test that a failing primary triggers the hedge immediately"""
+    hedge = FakeStream(["b"], 0.001)
+    fired = []
+    winner, stream, _, losers = await race_streams(
+        opener(None, RuntimeError("boom")), opener(hedge), 10, fired.append
+    )
+    assert (winner, stream, losers, fired) == (1, hedge, [], ["fallback"])
+
+
+@pytest.mark.asyncio
+async def test_all_attempts_failing_raises():
+    with pytest.raises(RuntimeError):
+        await race_streams(opener(None, RuntimeError("a")), opener(None, RuntimeError("b")), 0.01)
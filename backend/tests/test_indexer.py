@@ -0,0 +1,97 @@
+"""
+Batch Indexer Tests
+"""
+from types import SimpleNamespace
+import httpx
+import openai
+import pytest
+
+from app.workers.indexer import BatchIndexer, isolate_failures
+
+
+class FakeSession:
+    """Counts savepoints; a failing block rolls its savepoint back"""
+
+    def __init__(self):
+        self.savepoints = 0
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+    def begin_nested(self):
+        session = self
+
+        class Savepoint:
+            async def __aenter__(self):
+                session.savepoints += 1
+
+            async def __aexit__(self, *exc_info):
+                return False
+
+        return Savepoint()
+
+
+def docs(*ids):
+    return [SimpleNamespace(id=doc_id) for doc_id in ids]
+
+
+def processor(bad=(), error=ValueError("invalid input")):
+    async def process(rows):
+        if any(row.id in bad for row in rows):
+            raise error
+        return [row.id for row in rows]
+    return process
+
+
+@pytest.mark.asyncio
+async def test_bad_document_is_isolated():
+    """Test that a failing batch is split until the bad document fails on its own"""
+    failed = []
+
+    async def on_error(doc, error):
+        failed.append(doc.id)
+
+    results = await isolate_failures(FakeSession(), docs(1, 2, 3, 4, 5), processor(bad={4}), on_error)
+    assert sorted(doc_id for result in results for doc_id in result) == [1, 2, 3, 5]
+    assert failed == [4]
+
+
+@pytest.mark.asyncio
+async def test_healthy_batch_is_processed_once():
+    session = FakeSession()
+
+    async def on_error(doc, error):
+        raise AssertionError("no document should fail")
+
+    assert await isolate_failures(session, docs(1, 2, 3), processor(), on_error) == [[1, 2, 3]]
+    assert session.savepoints == 1
+
+
+@pytest.mark.asyncio
+async def test_transient_error_fails_the_whole_batch():
+    """Test that API outages are not blamed on documents"""
+    error = openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+    session = FakeSession()
+
+    async def on_error(doc, error):
+        raise AssertionError("transient errors must not count against documents")
+
+    with pytest.raises(openai.APITimeoutError):
+        await isolate_failures(session, docs(1, 2, 3), processor(bad={2}, error=error), on_error)
+    assert session.savepoints == 1
+
+
+@pytest.mark.asyncio
+async def test_document_is_marked_failed_after_max_attempts():
+    indexer = BatchIndexer(concurrency=1, max_attempts=3)
+    session = FakeSession()
+    doc = SimpleNamespace(id="doc-1")
+    try:
+        for _ in range(2):
+            assert await indexer._document_failed(session, doc, ValueError("bad")) == 0
+        assert session.statements == []
+        assert await indexer._document_failed(session, doc, ValueError("bad")) == 1
+        assert len(session.statements) == 1 and "doc-1" not in indexer.attempts
+    finally:
+        await indexer.engine.dispose()
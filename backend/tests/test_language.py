@@ -0,0 +1,29 @@
+"""
+Language Detection Tests
+"""
+from app.services.language import detect_language, get_text_search_config
+
+
+def test_detect_turkish():
+    """Test Turkish detection from letters and stopwords"""
+    assert detect_language("Kargom nerede kaldı?") == "tr"
+    assert detect_language("Siparişimi nasıl iptal ederim") == "tr"
+
+
+def test_detect_english():
+    """Test English detection from stopwords"""
+    assert detect_language("Where is my order and how can I cancel it?") == "en"
+
+
+def test_detect_falls_back_to_default():
+    """Test that weak signals return the configured default"""
+    assert detect_language("") == "tr"
+    assert detect_language("ok", default="en") == "en"
+
+
+def test_text_search_config():
+    """Test language to text search configuration mapping"""
+    assert get_text_search_config("tr") == "turkish"
+    assert get_text_search_config("en") == "english"
+    assert get_text_search_config("de") == "simple"
+    assert get_text_search_config(None) == "simple"
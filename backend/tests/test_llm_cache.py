@@ -0,0 +1,36 @@
+"""
+LLM Cache Tests
+"""
+import pytest
+
+from app.services.llm_cache import LLMResponseCache, replay_chunks
+
+
+def test_replay_chunks_roundtrip():
+    """Test that replayed deltas rebuild the cached text exactly"""
+    content = "Siparişiniz kargoya verildi, takip numarası 12345 ile kontrol edebilirsiniz."
+    chunks = replay_chunks(content, chunk_chars=16)
+    assert "".join(chunks) == content
+    assert all(len(chunk) <= 16 for chunk in chunks)
+    assert replay_chunks("", chunk_chars=16) == []
+
+
+def test_key_includes_model_and_max_tokens():
+    """Test that answers from another model or token limit are never served"""
+    messages = [{"role": "user", "content": "merhaba"}]
+    key = LLMResponseCache.key(messages, 0.2, "gpt-4-turbo", 512)
+    assert key == LLMResponseCache.key(messages, 0.2, "gpt-4-turbo", 512)
+    assert key != LLMResponseCache.key(messages, 0.2, "gpt-3.5-turbo", 512)
+    assert key != LLMResponseCache.key(messages, 0.2, "gpt-4-turbo", 256)
+
+
+@pytest.mark.asyncio
+async def test_local_tier_lru():
+    """Test local hits and that the local tier is bounded"""
+    cache = LLMResponseCache(max_size=2, ttl=60, use_redis=False)
+    await cache.set("a", {"content": "A"})
+    await cache.set("b", {"content": "B"})
+    assert (await cache.get("a"))["content"] == "A"
+    await cache.set("c", {"content": "C"})
+    assert await cache.get("b") is None
+    assert cache.stats == {"local_hit": 1, "redis_hit": 0, "miss": 1}
@@ -0,0 +1,31 @@
+"""
+Prometheus Instrumentation Tests
+"""
+from app.monitoring import prometheus
+from app.monitoring.prometheus import (
+    labelled,
+    observe_stage_timings,
+    orchestrator_requests_total,
+    orchestrator_stage_duration,
+    tenant_label,
+)
+
+
+def test_tenant_label_is_bounded(monkeypatch):
+    monkeypatch.setattr(prometheus, "_tenant_labels", set())
+    monkeypatch.setattr(prometheus.settings, "METRICS_MAX_TENANT_LABELS", 2)
+    assert [tenant_label(t) for t in ("a", "b", "c", "a", None)] == ["a", "b", "other", "a", "none"]
+
+
+def test_labelled_memoizes_children():
+    assert labelled(orchestrator_requests_total, "rule", "x") is labelled(orchestrator_requests_total, "rule", "x")
+
+
+def test_observe_stage_timings():
+    """Test that every stage and the request count are recorded under the reply path"""
+    requests = labelled(orchestrator_requests_total, "rag", tenant_label("metrics-test"))
+    before = requests._value.get()
+    observe_stage_timings({"rules": 0.5, "total": 120.0}, "rag", "metrics-test")
+    assert requests._value.get() == before + 1
+    rules = labelled(orchestrator_stage_duration, "rules", "rag")
+    assert rules._sum.get() >= 0.0005
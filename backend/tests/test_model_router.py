@@ -0,0 +1,24 @@
+"""
+Model Router Tests
+"""
+from app.services.model_router import ModelRouter, model_pricing, FAST, PREMIUM
+
+
+def test_routes():
+    """Test the routing signals"""
+    router = ModelRouter(fast_model="cheap", premium_model="premium", enabled=True)
+    assert router.route("merhaba")[:2] == (FAST, "cheap")
+    assert router.route("iade süresi nedir", rag_hit=True, top_score=0.9)[2] == "confident_rag_hit"
+    assert router.route("iade süresi nedir", rag_hit=True, top_score=0.3)[0] == PREMIUM
+    assert router.route("iade", rule_confidence=0.85)[2] == "near_rule_match"
+    assert router.route("kelime " * 300, rag_hit=True, top_score=0.99)[2] == "long_query"
+    assert router.route("Siparişimi iptal edip yerine farklı bedende yenisini nasıl alabilirim acaba?")[2] == "no_rag_hit"
+
+
+def test_disabled_router_uses_premium():
+    router = ModelRouter(fast_model="cheap", premium_model="premium", enabled=False)
+    assert router.route("merhaba")[:2] == (PREMIUM, "premium")
+
+
+def test_unknown_model_priced_as_default():
+    assert model_pricing("gpt-3.5-turbo")["prompt"] < model_pricing("unknown-model")["prompt"]
@@ -0,0 +1,48 @@
+"""
+Re-embedding Worker Tests
+"""
+from types import SimpleNamespace
+import uuid
+import pytest
+import pytest_asyncio
+
+from app.workers import reembed
+from app.workers.reembed import ReembedJob
+
+
+@pytest_asyncio.fixture
+async def job(redis_client, monkeypatch):
+    async def get_redis():
+        return redis_client
+
+    monkeypatch.setattr(reembed, "get_redis_reembed", get_redis)
+    job = ReembedJob(f"test-model-{uuid.uuid4().hex}", concurrency=1, max_attempts=2)
+    yield job
+    await redis_client.delete(job.skipped_key)
+    await job.engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_document_is_skipped_after_max_attempts(job):
+    doc = SimpleNamespace(id=uuid.uuid4())
+    assert await job._document_failed(doc, ValueError("bad")) is False
+    assert doc.id not in job._skipped
+    assert await job._document_failed(doc, ValueError("bad")) is True
+    assert doc.id in job._skipped and doc.id not in job.attempts
+
+
+@pytest.mark.asyncio
+async def test_skips_are_visible_to_a_standalone_activation(job):
+    """Test that a later process (--activate) sees the documents a build skipped"""
+    skipped = [uuid.uuid4(), uuid.uuid4()]
+    await job.skip(skipped, "no indexable content")
+    await job.skip(skipped[:1], "no indexable content")
+    assert job.stats["skipped"] == 2
+
+    activation = ReembedJob(job.model, concurrency=1)
+    try:
+        assert await activation.load_skipped() == set(skipped)
+        await activation._clear_skipped()
+        assert await activation.load_skipped() == set()
+    finally:
+        await activation.engine.dispose()
@@ -0,0 +1,143 @@
+"""
+Rule Engine Tests
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+from app.services import rule_service
+from app.services.rule_service import (
+    compile_rules, match_compiled, RuleEngine, RULES_VERSION_KEY, REGEX_CONFIDENCE, KEYWORD_CONFIDENCE
+)
+
+
+def rule(rule_id, key, value="yanıt", action="reply"):
+    return SimpleNamespace(id=rule_id, key=key, value=value, action=action)
+
+
+def test_rules_match_in_order_case_insensitive():
+    rules = compile_rules([rule(1, r"kargo\s+nerede", "kargo"), rule(2, "kargo", "genel")])
+    result = match_compiled(rules, "KARGO nerede kaldı?")
+    assert result["rule_id"] == "1" and result["response"] == "kargo"
+    assert result["confidence"] == REGEX_CONFIDENCE
+    assert match_compiled(rules, "kargom gelmedi")["rule_id"] == "2"
+
+
+def test_invalid_regex_is_matched_as_keyword():
+    rules = compile_rules([rule(1, "iade (süresi")])
+    assert rules[0].pattern is None
+    assert match_compiled(rules, "IADE (Süresi ne kadar")["confidence"] == KEYWORD_CONFIDENCE
+
+
+def test_no_match():
+    assert match_compiled(compile_rules([rule(1, "fatura")]), "merhaba") is None
+    assert match_compiled((), "merhaba") is None
+
+
+class FakeRulesTable:
+    """Session factory returning the current rows of a fake rules table"""
+
+    def __init__(self, *rows):
+        self.rows = list(rows)
+        self.loads = 0
+        self.gate = None  # asyncio.Event holding loads back until set
+        self.error = None
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, query):
+        self.loads += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        rows = list(self.rows)
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: rows))
+
+
+@pytest.fixture
+def rules_table(redis_client, monkeypatch):
+    table = FakeRulesTable(rule(1, "kargo", "v1"))
+
+    async def get_redis():
+        return redis_client
+
+    monkeypatch.setattr(rule_service, "AsyncSessionLocal", table)
+    monkeypatch.setattr(rule_service, "get_redis_rules", get_redis)
+    return table
+
+
+@pytest.mark.asyncio
+async def test_reload_swaps_complete_rule_set(rules_table):
+    """Test that matches keep using the old set until the new one is fully loaded"""
+    engine = RuleEngine(check_interval=60)
+    await engine.reload("startup")
+    old_rules = engine.rules
+
+    rules_table.rows = [rule(2, "fatura", "v2"), rule(3, "kargo", "v2")]
+    rules_table.gate = asyncio.Event()
+    reload = asyncio.create_task(engine.reload("pubsub", "2"))
+    await asyncio.sleep(0)
+    assert await engine.get_rules() is old_rules
+    assert match_compiled(await engine.get_rules(), "kargo")["response"] == "v1"
+
+    rules_table.gate.set()
+    await reload
+    assert engine.version == "2"
+    assert [compiled.rule_id for compiled in await engine.get_rules()] == ["2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_failed_reload_keeps_previous_rules(rules_table):
+    engine = RuleEngine(check_interval=60)
+    await engine.reload("startup", "1")
+    rules_table.error = RuntimeError("database down")
+    await engine.reload("pubsub", "2")
+    assert engine.version == "1"
+    assert match_compiled(engine.rules, "kargo")["rule_id"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_version_check_reloads_only_on_change(rules_table, redis_client):
+    """Test that the rules:version counter triggers a reload only when it moved"""
+    await redis_client.set(RULES_VERSION_KEY, 5)
+    engine = RuleEngine(check_interval=60)
+    await engine.get_rules()
+    assert (engine.version, rules_table.loads) == ("5", 1)
+
+    engine._checking = True
+    await engine._check_version()
+    assert rules_table.loads == 1 and not engine._checking
+
+    rules_table.rows = [rule(2, "iade", "v6")]
+    await redis_client.set(RULES_VERSION_KEY, 6)
+    engine._checking = True
+    await engine._check_version()
+    assert (engine.version, rules_table.loads) == ("6", 2)
+    assert match_compiled(engine.rules, "iade")["response"] == "v6"
+
+
+@pytest.mark.asyncio
+async def test_get_rules_checks_version_in_background(rules_table, redis_client):
+    """Test that a stale engine schedules a version check without blocking the match"""
+    await redis_client.set(RULES_VERSION_KEY, 1)
+    engine = RuleEngine(check_interval=60)
+    await engine.get_rules()
+
+    await redis_client.set(RULES_VERSION_KEY, 2)
+    rules_table.rows = [rule(2, "iade")]
+    engine._checked_at -= 61
+    assert match_compiled(await engine.get_rules(), "kargo")["rule_id"] == "1"
+    for _ in range(100):
+        if engine.version == "2":
+            break
+        await asyncio.sleep(0.01)
+    assert engine.version == "2"
+    assert match_compiled(await engine.get_rules(), "kargo") is None
@@ -0,0 +1,241 @@
+"""
+Singleflight Tests
+"""
+import asyncio
+import json
+import uuid
+import pytest
+
+from app.services import singleflight as sf
+from app.services.singleflight import SingleFlight
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_upstream_call():
+    """Test that identical concurrent requests fan out one call's events"""
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        for delta in ("Mer", "haba"):
+            await asyncio.sleep(0.01)
+            yield {"type": "text", "data": delta}
+        yield {"type": "end", "data": {"content": "Merhaba", "cost": 0.01}}
+
+    flights = SingleFlight(use_redis=False)
+    leader, follower = await asyncio.gather(
+        collect(flights.run("k", call)),
+        collect(flights.run("k", call))
+    )
+    assert calls == 1
+    assert [e["data"] for e in leader[:2]] == [e["data"] for e in follower[:2]] == ["Mer", "haba"]
+    assert leader[-1]["data"]["cost"] == 0.01
+    assert follower[-1]["data"]["cost"] == 0.0
+    assert follower[-1]["data"]["coalesced"] is True
+
+    # Finished flights are not reused
+    await collect(flights.run("k", call))
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_upstream_cancelled_when_all_callers_leave():
+    """Test that the shared call stops once nobody is listening"""
+    cancelled = asyncio.Event()
+
+    async def call():
+        try:
+            yield {"type": "text", "data": "a"}
+            await asyncio.sleep(10)
+            yield {"type": "end", "data": {}}
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    flights = SingleFlight(use_redis=False)
+    events = flights.run("k", call)
+    assert (await events.__anext__())["data"] == "a"
+    await events.aclose()
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+
+@pytest.fixture
+def workers(redis_client, monkeypatch):
+    """Two SingleFlight instances sharing one Redis, as two worker processes would"""
+    async def get_redis():
+        return redis_client
+
+    monkeypatch.setattr(sf, "get_redis_flight", get_redis)
+    return SingleFlight(idle_timeout=0.3), SingleFlight(idle_timeout=0.3)
+
+
+def upstream(*texts, delay=0.01, gate=None):
+    """Fake LLM call counting its invocations; waits for gate (if any) after the first event"""
+    async def call():
+        call.count += 1
+        for index, text in enumerate(texts):
+            if index == 1 and gate is not None:
+                await gate.wait()
+            await asyncio.sleep(delay)
+            yield {"type": "text", "data": text}
+        yield {"type": "end", "data": {"content": "".join(texts), "cost": 0.01}}
+    call.count = 0
+    return call
+
+
+@pytest.mark.asyncio
+async def test_workers_share_one_upstream_call(workers):
+    """Test that the lock makes one worker lead and the other follow through Redis"""
+    first, second = workers
+    key = f"test:{uuid.uuid4().hex}"
+    call = upstream("Mer", "haba")
+    leader, follower = await asyncio.gather(
+        collect(first.run(key, call)),
+        collect(second.run(key, call))
+    )
+    assert call.count == 1
+    assert [e["data"] for e in follower[:2]] == ["Mer", "haba"]
+    assert leader[-1]["data"]["cost"] == 0.01
+    assert follower[-1]["data"] == {"content": "Merhaba", "cost": 0.0, "coalesced": True}
+
+
+@pytest.mark.asyncio
+async def test_new_flight_does_not_replay_previous_events(workers, redis_client):
+    """Test that events of a finished flight are not replayed to the next flight's followers"""
+    first, second = workers
+    key = f"test:{uuid.uuid4().hex}"
+    await collect(first.run(key, upstream("eski")))
+    await wait_for_release(redis_client, key)
+
+    call = upstream("yeni", delay=0.05)
+    leader, follower = await asyncio.gather(
+        collect(first.run(key, call)),
+        collect(second.run(key, call))
+    )
+    assert call.count == 1
+    assert follower[-1]["data"]["content"] == "yeni"
+
+
+async def wait_for_follower(redis_client, key, token):
+    for _ in range(200):
+        if int(await redis_client.get(f"{key}:flight:{token}:followers") or 0):
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"nobody follows {key}:flight:{token}")
+
+
+async def wait_for_release(redis_client, key):
+    for _ in range(200):
+        if await redis_client.get(f"{key}:flight:lock") is None:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{key}:flight:lock was not released")
+
+
+async def push(redis_client, key, token, *events, start=0):
+    for seq, event in enumerate(events, start):
+        await redis_client.rpush(f"{key}:flight:{token}:events", json.dumps({"seq": seq, "event": event}))
+
+
+@pytest.mark.asyncio
+async def test_leader_keeps_streaming_for_remote_followers(workers, redis_client):
+    """Test that the leader's caller leaving does not cut off followers on other workers"""
+    first, second = workers
+    key = f"test:{uuid.uuid4().hex}"
+    gate = asyncio.Event()
+    call = upstream("Mer", "haba", gate=gate)
+
+    events = first.run(key, call)
+    assert (await events.__anext__())["data"] == "Mer"
+    token = await redis_client.get(f"{key}:flight:lock")
+    follower = asyncio.create_task(collect(second.run(key, call)))
+    await wait_for_follower(redis_client, key, token)
+
+    await events.aclose()
+    gate.set()
+    result = await asyncio.wait_for(follower, 2)
+    assert call.count == 1
+    # "Mer" replayed from the list, the rest followed on the channel
+    assert [e["data"] for e in result[:2]] == ["Mer", "haba"]
+    assert result[-1]["data"]["coalesced"] is True
+
+
+@pytest.mark.asyncio
+async def test_unfollowed_flight_is_not_published(workers, redis_client):
+    """Test that a leader nobody follows writes no events to Redis"""
+    first, _ = workers
+    key = f"test:{uuid.uuid4().hex}"
+    result = await collect(first.run(key, upstream("a", "b")))
+    assert result[-1]["type"] == "end"
+    await wait_for_release(redis_client, key)
+    assert await redis_client.keys(f"{key}:flight:*") == []
+
+
+@pytest.mark.asyncio
+async def test_leader_stops_when_nobody_listens(workers, redis_client):
+    first, _ = workers
+    key = f"test:{uuid.uuid4().hex}"
+    gate = asyncio.Event()
+    finished = []
+
+    async def call():
+        yield {"type": "text", "data": "a"}
+        await gate.wait()
+        for text in ("b", "c"):
+            await asyncio.sleep(0.01)
+            yield {"type": "text", "data": text}
+        finished.append(True)
+        yield {"type": "end", "data": {}}
+
+    events = first.run(key, call)
+    await events.__anext__()
+    await events.aclose()
+    gate.set()
+    await wait_for_release(redis_client, key)
+    assert finished == []
+    assert await redis_client.keys(f"{key}:flight:*") == []
+
+
+@pytest.mark.asyncio
+async def test_follower_skips_events_already_replayed(workers, redis_client):
+    """Test that channel messages already read from the list are not yielded twice"""
+    _, second = workers
+    key, token = f"test:{uuid.uuid4().hex}", "leader"
+    await push(redis_client, key, token, {"type": "text", "data": "a"}, {"type": "text", "data": "b"})
+
+    follower = asyncio.create_task(collect(second._follow_remote(key, token)))
+    await wait_for_follower(redis_client, key, token)
+    for seq, event in ((1, {"type": "text", "data": "b"}), (2, {"type": "end", "data": {}})):
+        await redis_client.publish(f"{key}:flight:{token}", json.dumps({"seq": seq, "event": event}))
+    result = await asyncio.wait_for(follower, 2)
+    assert [e["type"] for e in result] == ["text", "text", "end"]
+    assert [e["data"] for e in result[:2]] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_silent_leader_is_replaced(workers, redis_client):
+    """Test that a follower calls upstream itself when the leader never publishes"""
+    _, second = workers
+    key = f"test:{uuid.uuid4().hex}"
+    await redis_client.set(f"{key}:flight:lock", "dead-leader", ex=60)
+    call = upstream("kendi")
+    result = await collect(second.run(key, call))
+    assert call.count == 1
+    assert result[-1]["data"]["content"] == "kendi"
+
+
+@pytest.mark.asyncio
+async def test_leader_gone_mid_stream_is_an_error(workers, redis_client):
+    _, second = workers
+    key = f"test:{uuid.uuid4().hex}"
+    await redis_client.set(f"{key}:flight:lock", "dead-leader", ex=60)
+    await push(redis_client, key, "dead-leader", {"type": "text", "data": "yarım"})
+    call = upstream("kendi")
+    result = await collect(second.run(key, call))
+    assert call.count == 0
+    assert [e["type"] for e in result] == ["text", "error"]
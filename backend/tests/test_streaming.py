@@ -0,0 +1,97 @@
+"""
+Streaming Tests
+"""
+import asyncio
+import pytest
+
+from app.services.streaming import coalesce_deltas
+
+
+async def events(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def delta(text):
+    return {"type": "delta", "data": text}
+
+
+@pytest.mark.asyncio
+async def test_first_delta_is_not_delayed_and_rest_is_merged():
+    """Test that the first delta passes through and later ones are coalesced"""
+    source = events([{"type": "start"}] + [delta(c) for c in "hello"] + [{"type": "done"}])
+    result = [event async for event in coalesce_deltas(source, interval_ms=1000)]
+    assert result == [{"type": "start"}, delta("h"), delta("ello"), {"type": "done"}]
+
+
+@pytest.mark.asyncio
+async def test_buffer_is_flushed_when_source_stalls():
+    """Test that buffered text is sent after the interval even without new events"""
+    async def stalling():
+        yield delta("a")
+        yield delta("b")
+        await asyncio.sleep(0.2)
+        yield {"type": "done"}
+
+    received = []
+    async for event in coalesce_deltas(stalling(), interval_ms=20):
+        received.append((event, asyncio.get_running_loop().time()))
+    assert [event for event, _ in received] == [delta("a"), delta("b"), {"type": "done"}]
+    # "b" went out on the timer, well before the stalled "done"
+    assert received[2][1] - received[1][1] > 0.1
+
+
+@pytest.mark.asyncio
+async def test_zero_interval_passes_events_through():
+    """Test that coalescing can be disabled"""
+    items = [delta("a"), delta("b")]
+    assert [event async for event in coalesce_deltas(events(items), interval_ms=0)] == items
+
+
+@pytest.mark.asyncio
+async def test_closing_stops_the_source():
+    """Test that the source is closed by the time the coalesced stream is closed"""
+    closed = []
+
+    async def endless():
+        try:
+            while True:
+                yield delta("x")
+                await asyncio.sleep(0.01)
+        finally:
+            closed.append(True)
+
+    stream = coalesce_deltas(endless(), interval_ms=20)
+    await stream.__anext__()
+    await stream.aclose()
+    assert closed == [True]
+
+
+def test_gzip_skips_event_streams():
+    """Test that SSE responses are not compressed (and so not buffered) while others are"""
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse, StreamingResponse
+    from starlette.routing import Route
+    from starlette.testclient import TestClient
+    from app.middleware.gzip import GZipMiddleware
+
+    async def endpoint(request):
+        if "text/event-stream" in request.headers.get("accept", ""):
+            async def body():
+                for i in range(3):
+                    yield f"event: delta\ndata: {i}\n\n" * 100
+            return StreamingResponse(body(), media_type="text/event-stream")
+        return PlainTextResponse("x" * 2000)
+
+    app = Starlette(routes=[Route("/", endpoint)])
+    app.add_middleware(GZipMiddleware, minimum_size=100)
+    client = TestClient(app)
+
+    plain = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert plain.headers.get("content-encoding") == "gzip"
+
+    stream = client.get("/", headers={"Accept-Encoding": "gzip", "Accept": "text/event-stream"})
+    assert "content-encoding" not in stream.headers
+    assert stream.text.count("event: delta") == 300
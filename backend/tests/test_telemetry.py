@@ -0,0 +1,55 @@
+"""
+Telemetry Writer Tests
+"""
+import asyncio
+import pytest
+
+from app.services.telemetry import TelemetryWriter, TABLE_COLUMNS
+
+
+class RecordingWriter(TelemetryWriter):
+    """Collects flushed batches instead of copying them to Postgres"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    async def flush(self, batch):
+        if batch:
+            self.batches.append(batch)
+
+
+@pytest.mark.asyncio
+async def test_rows_are_flushed_in_batches_of_flush_rows():
+    writer = RecordingWriter(queue_size=100, flush_interval_ms=1000, flush_rows=3)
+    writer.start(session_factory=None)
+    for i in range(6):
+        writer.record("rag_metrics", query_text=f"q{i}", retrieved_documents=i)
+    await asyncio.sleep(0.05)
+    await writer.stop()
+    assert [len(batch) for batch in writer.batches] == [3, 3]
+
+    table, values = writer.batches[0][0]
+    row = dict(zip(TABLE_COLUMNS[table], values))
+    assert table == "rag_metrics"
+    assert row["query_text"] == "q0" and row["id"] and row["created_at"]
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_flushed_after_interval():
+    writer = RecordingWriter(queue_size=100, flush_interval_ms=20, flush_rows=100)
+    writer.start(session_factory=None)
+    writer.record("llm_usage", model="gpt-4o-mini", cost_usd=0.001)
+    await asyncio.sleep(0.1)
+    assert len(writer.batches) == 1
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_rows_and_stop_flushes_the_rest():
+    writer = RecordingWriter(queue_size=2, flush_interval_ms=1000, flush_rows=10)
+    for i in range(5):
+        writer.record("llm_usage", model="gpt-4o-mini", latency_ms=float(i))
+    assert writer.queue.qsize() == 2
+    await writer.stop()
+    assert sum(len(batch) for batch in writer.batches) == 2
@@ -0,0 +1,22 @@
+"""
+Token Counting Tests
+"""
+from app.core.tokens import count_tokens, count_message_tokens, split_tokens, TOKENS_PER_MESSAGE, TOKENS_PER_REPLY
+
+
+def test_message_tokens_include_chat_overhead():
+    """Test that chat framing is counted on top of the message contents"""
+    messages = [
+        {"role": "system", "content": "Kısa yanıt ver."},
+        {"role": "user", "content": "Kargom nerede?"}
+    ]
+    expected = sum(count_tokens(m["content"]) for m in messages) + 2 * TOKENS_PER_MESSAGE + TOKENS_PER_REPLY
+    assert count_message_tokens(messages) == expected
+
+
+def test_split_tokens_truncates_to_budget():
+    """Test that the first piece of a split is a budget-sized prefix"""
+    text = "sipariş " * 200
+    first = split_tokens(text, 50)[0]
+    assert count_tokens(first) <= 50
+    assert text.startswith(first)
@@ -10,6 +10,7 @@ let ws = null;
 let heartbeatTimer = null;
 let lastMessageHash = '';
 let isTyping = false;
+const streams = {};  // message_id -> {el, text, sources} for replies being streamed
 let reconnectAttempts = 0;
 const maxReconnectAttempts = 5;
 const reconnectDelay = 3000;
@@ -98,6 +99,24 @@ function connectWebSocket() {
                     
                     showTyping(false);
                     await streamMessage(data.message || data.text || '', 'bot', data.sources);
+                } else if (data.type === 'server.start') {
+                    streams[data.message_id] = { el: null, text: '', sources: data.sources };
+                } else if (data.type === 'server.delta') {
+                    const stream = streams[data.message_id];
+                    if (!stream) return;
+                    if (!stream.el) {
+                        showTyping(false);
+                        stream.el = createStreamElement('bot');
+                    }
+                    stream.text += data.delta || '';
+                    stream.el.text.textContent = stream.text;
+                    scrollToBottom();
+                } else if (data.type === 'server.done') {
+                    const stream = streams[data.message_id];
+                    delete streams[data.message_id];
+                    showTyping(false);
+                    if (stream && stream.el) stream.el.div.remove();
+                    addMessage(data.message || '', 'bot', data.sources || (stream && stream.sources));
                 } else if (data.type === 'server.typing') {
                     showTyping(data.is_typing);
                 } else if (data.type === 'server.error') {
@@ -150,7 +169,7 @@ function sendWidgetMessage() {
     window.lastSend = Date.now();
 
     try {
-        ws.send(JSON.stringify({ type: 'client.message', text }));
+        ws.send(JSON.stringify({ type: 'client.message', text, stream: true }));
         addMessage(text, 'user');
         if (input) input.value = '';
         showTyping(true);
@@ -199,17 +218,21 @@ function addMessage(text, sender, sources = null) {
 }
 
 // Stream Message
-async function streamMessage(fullText, sender, sources = null) {
-    if (!messages) return;
-
+// Message bubble that is filled in while a reply streams
+function createStreamElement(sender) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `widget-message ${sender}`;
     const messageId = `stream-msg-${Date.now()}`;
     messageDiv.innerHTML = `<div class="widget-message-content" id="${messageId}"><span id="stream-text-${messageId}"></span></div>`;
     messages.appendChild(messageDiv);
     scrollToBottom();
+    return { div: messageDiv, text: document.getElementById(`stream-text-${messageId}`) };
+}
+
+async function streamMessage(fullText, sender, sources = null) {
+    if (!messages) return;
 
-    const streamTextEl = document.getElementById(`stream-text-${messageId}`);
+    const { div: messageDiv, text: streamTextEl } = createStreamElement(sender);
     if (!streamTextEl) return;
 
     let text = '';
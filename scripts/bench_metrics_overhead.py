@@ -0,0 +1,83 @@
+"""
+Benchmark: cost of the Prometheus instrumentation on the request path
+
+Times the metric operations the services perform per event (memoized
+labelled counter increments and histogram observations, gauge updates, tenant
+label lookup) and a full observe_stage_timings() call for a typical reply, and
+fails if any of them costs more than --max-us microseconds per metric event.
+Plain metric.labels(...) calls are shown for reference only.
+
+Usage:
+    python scripts/bench_metrics_overhead.py --iterations 200000 --max-us 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.monitoring.prometheus import (  # noqa: E402
+    chat_messages_total,
+    llm_tokens_total,
+    llm_time_to_first_token,
+    orchestrator_stage_duration,
+    rag_hit_rate,
+    websocket_connections,
+    observe_stage_timings,
+    tenant_label,
+    labelled,
+)
+
+# Stage timings (ms) of a typical RAG reply
+TIMINGS = {
+    "redaction": 0.08, "context": 1.9, "rules": 0.6, "embedding": 180.0, "semantic_cache": 4.1,
+    "rag_search": 12.5, "first_token": 910.0, "total": 2400.0,
+}
+# Metric events observe_stage_timings() produces for TIMINGS: one per stage + request counter + duration
+TIMINGS_EVENTS = len(TIMINGS) + 2
+
+
+def bench(name: str, func, iterations: int, events: int = 1) -> float:
+    """Microseconds per metric event"""
+    for _ in range(min(iterations, 10_000)):
+        func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    per_event = elapsed / iterations / events * 1e6
+    print(f"  {name:42s} {per_event:8.3f} us/event")
+    return per_event
+
+
+def main(args):
+    n = args.iterations
+    baseline = bench("empty call (loop overhead)", lambda: None, n)
+    print("  reference (not checked):")
+    bench("counter.labels(role).inc()", lambda: chat_messages_total.labels(role="user").inc(), n)
+    bench("histogram.labels(stage, path).observe()", lambda: orchestrator_stage_duration.labels(stage="rules", path="rag").observe(0.0006), n)
+    print("  instrumentation as used by the services:")
+    results = [
+        bench("labelled(counter, role).inc()", lambda: labelled(chat_messages_total, "user").inc(), n),
+        bench("labelled(counter, model, type).inc(n)", lambda: labelled(llm_tokens_total, "gpt-4o-mini", "prompt").inc(120), n),
+        bench("labelled(histogram, model).observe()", lambda: labelled(llm_time_to_first_token, "gpt-4o-mini").observe(0.42), n),
+        bench("labelled(histogram, stage, path).observe()", lambda: labelled(orchestrator_stage_duration, "rules", "rag").observe(0.0006), n),
+        bench("gauge.set()", lambda: rag_hit_rate.set(0.73), n),
+        bench("gauge.inc()", lambda: websocket_connections.inc(), n),
+        bench("tenant_label()", lambda: tenant_label("acme"), n),
+        bench("observe_stage_timings() (per event)", lambda: observe_stage_timings(TIMINGS, "rag", "acme"), n // 10, TIMINGS_EVENTS),
+    ]
+    worst = max(results) - baseline
+    print(f"\n  worst case: {worst:.3f} us/event (limit {args.max_us} us)")
+    if worst > args.max_us:
+        print("  FAIL: instrumentation overhead above the limit")
+        sys.exit(1)
+    print("  OK")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure Prometheus instrumentation overhead")
+    parser.add_argument("--iterations", type=int, default=200_000, help="Calls per measured operation")
+    parser.add_argument("--max-us", type=float, default=5.0, help="Max allowed microseconds per metric event")
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+"""
+Replay: historical rag_metrics queries through the orchestrator, sequential vs concurrent stages
+
+Each query is run with ORCHESTRATOR_CONCURRENT_STAGES off and on (in
+alternating order) and timed up to the first event of the reply, i.e. rules,
+query embedding, semantic cache and RAG search. The stream is closed there,
+so no LLM call is made. Embedding cache reads are bypassed so both modes pay
+for the embedding request.
+
+Requires the backend environment (DATABASE_URL, REDIS_URL, OPENAI_API_KEY).
+
+Usage:
+    python scripts/replay_orchestrator_latency.py --days 7 --limit 500
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import select
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.config import settings  # noqa: E402
+from app.core.database import AsyncSessionLocal  # noqa: E402
+from app.models.rag_metrics import RAGMetrics  # noqa: E402
+from app.services.embedding_cache import embedding_cache  # noqa: E402
+from app.services.orchestrator import OrchestratorService  # noqa: E402
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def no_cached_embedding(text, model=None):
+    return None
+
+
+async def time_to_first_event(orchestrator: OrchestratorService, query: str, concurrent: bool) -> tuple:
+    """Milliseconds until the reply starts, and the reply source"""
+    settings.ORCHESTRATOR_CONCURRENT_STAGES = concurrent
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        stream = orchestrator.stream_message(query, "replay", db=db)
+        try:
+            event = await stream.__anext__()
+        finally:
+            await stream.aclose()
+        return (time.perf_counter() - start) * 1000, event["data"]["context"].get("source")
+
+
+async def main(args):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(RAGMetrics.query_text)
+            .where(RAGMetrics.created_at >= datetime.now(timezone.utc) - timedelta(days=args.days))
+            .order_by(RAGMetrics.created_at.desc())
+            .limit(args.limit)
+        )
+        queries = [row[0] for row in result.all()]
+    if not queries:
+        print("No rag_metrics rows to replay")
+        return
+
+    embedding_cache.get = no_cached_embedding
+    orchestrator = OrchestratorService()
+    latencies = {False: [], True: []}
+    sources = {}
+    for i, query in enumerate(queries):
+        for concurrent in ((False, True) if i % 2 == 0 else (True, False)):
+            latency, source = await time_to_first_event(orchestrator, query, concurrent)
+            latencies[concurrent].append(latency)
+            sources[source] = sources.get(source, 0) + 1
+
+    print(f"Replayed {len(queries)} queries (retrieval mode: {settings.RAG_RETRIEVAL_MODE})")
+    print(f"  reply sources: {', '.join(f'{k}={v // 2}' for k, v in sorted(sources.items(), key=str))}")
+    print()
+    print(f"  {'':12s} {'mean ms':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for name, concurrent in (("sequential", False), ("concurrent", True)):
+        samples = latencies[concurrent]
+        print(
+            f"  {name:12s} {statistics.mean(samples):9.1f} {percentile(samples, 50):9.1f} "
+            f"{percentile(samples, 95):9.1f} {percentile(samples, 99):9.1f}"
+        )
+    before, after = statistics.mean(latencies[False]), statistics.mean(latencies[True])
+    print(f"\n  mean latency reduction: {before - after:.1f} ms ({1 - after / before:.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay rag_metrics queries through the orchestrator")
+    parser.add_argument("--days", type=int, default=7, help="History window in days")
+    parser.add_argument("--limit", type=int, default=500, help="Max queries to replay")
+    asyncio.run(main(parser.parse_args()))